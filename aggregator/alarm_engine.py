@@ -0,0 +1,201 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Mirrors models.NodeType, kept as plain strings so the engine does not import the database layer
+NODE_TYPES = ("BTS", "NodeB", "eNodeB", "gNodeB", "ng_eNodeB")
+
+# Rule name -> definition. A rule raises after `debounce` consecutive readings above
+# `raise_above` and clears after `debounce` consecutive readings below `clear_below`.
+# Rules on the same metric are levels of one alarm: a node has at most one of them open.
+DEFAULT_RULES: Dict[str, Dict[str, Any]] = {
+    "cpu_temp_warning": {
+        "metric": "cpu_temperature_c", "raise_above": 50.0, "clear_below": 47.0, "debounce": 2,
+        "severity": "WARNING", "label": "High CPU temp", "unit": "°C",
+    },
+    "cpu_temp_critical": {
+        "metric": "cpu_temperature_c", "raise_above": 53.0, "clear_below": 50.0, "debounce": 1,
+        "severity": "CRITICAL", "label": "High CPU temp", "unit": "°C",
+    },
+    "high_traffic": {
+        "metric": "connected_users", "raise_above": 450, "clear_below": 420, "debounce": 2,
+        "severity": "WARNING", "label": "High traffic", "unit": " users",
+    },
+}
+
+# Optional JSON overrides: {"*": {rule: {field: value}}, "gNodeB": {rule: {field: value}}}
+ALARM_RULES = os.getenv("ALARM_RULES", "")
+
+class AlarmRule:
+    __slots__ = ("name", "metric", "raise_above", "clear_below", "debounce", "severity", "label", "unit")
+
+    def __init__(self, name: str, metric: str, raise_above: float, clear_below: float, debounce: int,
+                 severity: str, label: str, unit: str = ""):
+        if clear_below > raise_above:
+            raise ValueError(f"Alarm rule '{name}': clear_below must not be above raise_above")
+        self.name = name
+        self.metric = metric
+        self.raise_above = raise_above
+        self.clear_below = clear_below
+        self.debounce = max(1, int(debounce))
+        self.severity = severity
+        self.label = label
+        self.unit = unit
+
+    def describe(self, value) -> str:
+        return f"{self.label}: {value}{self.unit}"
+
+class AlarmTransition(NamedTuple):
+    alarm_id: uuid.UUID
+    node_id: str
+    rule: str
+    severity: str
+    description: str
+    raised: bool
+    timestamp: Optional[datetime]
+
+def build_rules(overrides: str = ALARM_RULES) -> Dict[str, Tuple[AlarmRule, ...]]:
+    """Returns the rule set of every node type, applying the JSON overrides on top of DEFAULT_RULES."""
+    config = json.loads(overrides) if overrides else {}
+    common = config.get("*", {})
+
+    rules_by_type = {}
+    for node_type in NODE_TYPES:
+        rules = []
+        for name, definition in DEFAULT_RULES.items():
+            merged = {**definition, **common.get(name, {}), **config.get(node_type, {}).get(name, {})}
+            if merged.get("enabled", True):
+                merged.pop("enabled", None)
+                rules.append(AlarmRule(name, **merged))
+        rules_by_type[node_type] = tuple(rules)
+    return rules_by_type
+
+def build_ladders(rules: Tuple[AlarmRule, ...]) -> Tuple[Tuple[int, ...], ...]:
+    """Groups the indexes of the rules by metric, each group ordered from the lowest raise threshold up."""
+    by_metric: Dict[str, List[int]] = {}
+    for index, rule in enumerate(rules):
+        by_metric.setdefault(rule.metric, []).append(index)
+    return tuple(tuple(sorted(indexes, key=lambda i: rules[i].raise_above)) for indexes in by_metric.values())
+
+class AlarmEngine:
+    """
+    Keeps alarm state of every node in memory and turns readings into raise/clear
+    transitions with hysteresis and debounce. Evaluation is O(number of rules) per
+    reading; nothing is emitted while a node stays in the same state.
+
+    The rules on one metric escalate: raising a higher level (critical) clears the open
+    lower one (warning) in the same evaluation, and lower levels do not raise while a
+    higher one is open. When the higher level clears and the value is still above a lower
+    level's clear threshold, that level is raised in its place.
+    """
+
+    def __init__(self, rules_by_type: Dict[str, Tuple[AlarmRule, ...]]):
+        self.rules_by_type = rules_by_type
+        self.ladders_by_type = {node_type: build_ladders(rules) for node_type, rules in rules_by_type.items()}
+        # node_id -> one [active alarm_id or None, consecutive readings count] pair per rule
+        self.states: Dict[str, List[list]] = {}
+
+    def _state(self, node_id: str, rules: Tuple[AlarmRule, ...]) -> List[list]:
+        state = self.states.get(node_id)
+        if state is None:
+            state = self.states[node_id] = [[None, 0] for _ in rules]
+        return state
+
+    def evaluate(self, node_id: str, node_type: str, reading, timestamp: Optional[datetime] = None) -> List[AlarmTransition]:
+        rules = self.rules_by_type.get(node_type)
+        if not rules:
+            return []
+
+        state = self._state(node_id, rules)
+        transitions = []
+
+        def transition(index: int, value, raised: bool):
+            rule, slot = rules[index], state[index]
+            if raised:
+                slot[0] = uuid.uuid4()
+            transitions.append(AlarmTransition(
+                slot[0], node_id, rule.name, rule.severity, rule.describe(value), raised, timestamp
+            ))
+            if not raised:
+                slot[0] = None
+            slot[1] = 0
+
+        for ladder in self.ladders_by_type[node_type]:
+            value = getattr(reading, rules[ladder[0]].metric)
+            active = next((level for level, index in enumerate(ladder) if state[index][0] is not None), None)
+
+            # Levels above the open one count readings towards raising; the highest one due wins
+            target = None
+            for level in range(len(ladder) - 1, -1 if active is None else active, -1):
+                rule, slot = rules[ladder[level]], state[ladder[level]]
+                if value > rule.raise_above:
+                    slot[1] += 1
+                    if target is None and slot[1] >= rule.debounce:
+                        target = level
+                else:
+                    slot[1] = 0
+
+            if target is not None:
+                if active is not None:
+                    transition(ladder[active], value, False)
+                transition(ladder[target], value, True)
+                for level in range(target):
+                    state[ladder[level]][1] = 0
+                continue
+            if active is None:
+                continue
+
+            rule, slot = rules[ladder[active]], state[ladder[active]]
+            if value < rule.clear_below:
+                slot[1] += 1
+                if slot[1] >= rule.debounce:
+                    transition(ladder[active], value, False)
+                    # Hand over to the highest lower level that would not have cleared yet
+                    for level in range(active - 1, -1, -1):
+                        if value >= rules[ladder[level]].clear_below:
+                            transition(ladder[level], value, True)
+                            break
+            else:
+                slot[1] = 0
+        return transitions
+
+    def restore(self, open_alarms: Iterable[Tuple[uuid.UUID, str, str, str]],
+                timestamp: Optional[datetime] = None) -> List[AlarmTransition]:
+        """
+        Rebuilds state from (alarm_id, node_id, node_type, rule) of alarms that are not cleared yet.
+        Of several open levels of one metric only the highest is kept; clear transitions for the
+        others are returned so they can be closed in the database.
+        """
+        node_types = {}
+        for alarm_id, node_id, node_type, rule_name in open_alarms:
+            rules = self.rules_by_type.get(node_type, ())
+            for rule, slot in zip(rules, self._state(node_id, rules)):
+                if rule.name == rule_name:
+                    slot[0] = alarm_id
+                    node_types[node_id] = node_type
+
+        superseded = []
+        for node_id, node_type in node_types.items():
+            rules, state = self.rules_by_type[node_type], self.states[node_id]
+            for ladder in self.ladders_by_type[node_type]:
+                open_levels = [index for index in ladder if state[index][0] is not None]
+                for index in open_levels[:-1]:
+                    rule = rules[index]
+                    superseded.append(AlarmTransition(
+                        state[index][0], node_id, rule.name, rule.severity, rule.label, False, timestamp
+                    ))
+                    state[index][0] = None
+        return superseded
+
+    def forget(self, node_id: str):
+        self.states.pop(node_id, None)
+
+    def clear(self):
+        self.states = {}
+
+    def active_count(self) -> int:
+        return sum(1 for state in self.states.values() for slot in state if slot[0] is not None)
+
+alarm_engine = AlarmEngine(build_rules())
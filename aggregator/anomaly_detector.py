@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger("anomaly_detector")
+
+# Temperature the prediction is made for; defaults to the cpu_temp_warning alarm level
+PREDICT_THRESHOLD_C = float(os.getenv("PREDICT_THRESHOLD_C", "50"))
+# A node is reported when the projected crossing is at most this far ahead
+PREDICT_HORIZON_SEC = float(os.getenv("PREDICT_HORIZON_SEC", "60"))
+# Readings kept per node; the newest PREDICT_SLOPE_SAMPLES give the trend, the older ones the baseline
+PREDICT_WINDOW = int(os.getenv("PREDICT_WINDOW", "16"))
+PREDICT_SLOPE_SAMPLES = int(os.getenv("PREDICT_SLOPE_SAMPLES", "3"))
+PREDICT_MIN_BASELINE = int(os.getenv("PREDICT_MIN_BASELINE", "4"))
+PREDICT_EWMA_ALPHA = float(os.getenv("PREDICT_EWMA_ALPHA", "0.3"))
+# The newest reading must be this many baseline deviations above the baseline mean...
+PREDICT_MIN_Z = float(os.getenv("PREDICT_MIN_Z", "3"))
+# ...and rising at least this fast (°C per second)
+PREDICT_MIN_SLOPE = float(os.getenv("PREDICT_MIN_SLOPE", "0.05"))
+# Deviation floor, so a perfectly flat baseline does not turn every small step into a large z-score
+PREDICT_MIN_STD_C = float(os.getenv("PREDICT_MIN_STD_C", "1.0"))
+# After a prediction the node is reported again only once it cooled this far below the threshold
+PREDICT_REARM_C = float(os.getenv("PREDICT_REARM_C", "3"))
+PREDICT_INTERVAL_MS = int(os.getenv("PREDICT_INTERVAL_MS", "250"))
+
+INITIAL_CAPACITY = 1024
+
+class AnomalyDetector:
+    """
+    Predicts CPU overheating from the temperature trend of every node. The last `window`
+    readings of each node are kept in one preallocated ring buffer row per node. Observing
+    a reading only appends it to a pending list; every `interval_ms` the pending readings
+    are scattered into the ring buffers and the nodes that received them are evaluated
+    together in vectorized NumPy operations:
+
+    - EWMA of the window as the smoothed temperature
+    - slope of the newest `slope_samples` readings (least squares over their timestamps)
+    - z-score of the newest reading against the mean and deviation of the older readings
+    - projected seconds until the threshold is crossed at the current slope
+
+    A predicted_overheat event is emitted once when a node below the threshold is rising
+    significantly (z-score and slope) and would cross it within the horizon.
+    """
+
+    def __init__(self, threshold_c: float = PREDICT_THRESHOLD_C, horizon_sec: float = PREDICT_HORIZON_SEC,
+                 window: int = PREDICT_WINDOW, slope_samples: int = PREDICT_SLOPE_SAMPLES,
+                 min_baseline: int = PREDICT_MIN_BASELINE, alpha: float = PREDICT_EWMA_ALPHA,
+                 min_z: float = PREDICT_MIN_Z, min_slope: float = PREDICT_MIN_SLOPE,
+                 min_std_c: float = PREDICT_MIN_STD_C, rearm_c: float = PREDICT_REARM_C,
+                 interval_ms: int = PREDICT_INTERVAL_MS):
+        if not 2 <= slope_samples < window:
+            raise ValueError("PREDICT_SLOPE_SAMPLES must be at least 2 and smaller than PREDICT_WINDOW")
+        self.threshold_c = threshold_c
+        self.horizon_sec = horizon_sec
+        self.window = window
+        self.slope_samples = slope_samples
+        self.min_baseline = min(min_baseline, window - slope_samples)
+        self.min_z = min_z
+        self.min_slope = min_slope
+        self.min_std_c = min_std_c
+        self.rearm_c = rearm_c
+        self.interval = interval_ms / 1000.0
+        # EWMA weight of a reading by its age (0 = newest)
+        self.decay = alpha * (1.0 - alpha) ** np.arange(window)
+        self.columns = np.arange(window)
+        self._task = None
+        self._publish: Optional[Callable[[str, Dict[str, Any]], None]] = None
+
+        self.evaluations_total = 0
+        self.evaluated_nodes_total = 0
+        self.evaluated_readings_total = 0
+        self.evaluation_seconds_total = 0.0
+        self.predictions_total = 0
+        self._allocate(INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int):
+        self.slots: Dict[str, int] = {}
+        self.node_ids: List[Optional[str]] = []
+        self.free: List[int] = []
+        self.pending_slots: List[int] = []
+        self.pending_temperatures: List[float] = []
+        self.pending_timestamps: List[float] = []
+        self.temperatures = np.zeros((capacity, self.window))
+        self.timestamps = np.zeros((capacity, self.window))
+        self.heads = np.zeros(capacity, dtype=np.int64)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.predicted = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        capacity = len(self.heads) * 2
+        for name in ("temperatures", "timestamps", "heads", "counts", "predicted"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _slot(self, node_id: str) -> int:
+        if self.free:
+            slot = self.free.pop()
+            self.node_ids[slot] = node_id
+        else:
+            slot = len(self.node_ids)
+            if slot == len(self.heads):
+                self._grow()
+            self.node_ids.append(node_id)
+        self.slots[node_id] = slot
+        return slot
+
+    def observe(self, node_id: str, temperature_c: float, timestamp: float):
+        """Queues one reading (epoch seconds) of a node. It reaches the ring buffer at the next evaluation."""
+        slot = self.slots.get(node_id)
+        if slot is None:
+            slot = self._slot(node_id)
+        self.pending_slots.append(slot)
+        self.pending_temperatures.append(temperature_c)
+        self.pending_timestamps.append(timestamp)
+
+    def _apply_pending(self) -> np.ndarray:
+        """Writes the pending readings into the ring buffers in arrival order and returns the updated rows."""
+        slots = np.array(self.pending_slots, dtype=np.int64)
+        temperatures = np.array(self.pending_temperatures)
+        timestamps = np.array(self.pending_timestamps)
+        self.pending_slots, self.pending_temperatures, self.pending_timestamps = [], [], []
+
+        order = np.argsort(slots, kind="stable")
+        slots, temperatures, timestamps = slots[order], temperatures[order], timestamps[order]
+        rows, first, sizes = np.unique(slots, return_index=True, return_counts=True)
+        # Position of every reading among the pending readings of its node; only the newest `window` are kept
+        rank = np.arange(len(slots)) - np.repeat(first, sizes)
+        keep = rank >= np.repeat(sizes, sizes) - self.window
+        positions = (self.heads[slots] + rank) % self.window
+        self.temperatures[slots[keep], positions[keep]] = temperatures[keep]
+        self.timestamps[slots[keep], positions[keep]] = timestamps[keep]
+        self.heads[rows] = (self.heads[rows] + sizes) % self.window
+        self.counts[rows] = np.minimum(self.counts[rows] + sizes, self.window)
+        return rows
+
+    def evaluate(self) -> List[Dict[str, Any]]:
+        """Evaluates every node observed since the previous call and returns the new predictions."""
+        if not self.pending_slots:
+            return []
+        start = time.perf_counter()
+        readings = len(self.pending_slots)
+        rows = self._apply_pending()
+
+        temperatures = self.temperatures[rows]
+        heads = self.heads[rows]
+        counts = self.counts[rows]
+        # Age of every ring position, 0 for the newest reading
+        age = (heads[:, None] - 1 - self.columns) % self.window
+        valid = age < counts[:, None]
+        newest = (heads - 1) % self.window
+        index = np.arange(len(rows))
+        latest = temperatures[index, newest]
+        # Relative to the newest reading, so epoch seconds do not cost precision in the squares
+        times = self.timestamps[rows] - self.timestamps[rows, newest][:, None]
+
+        weights = np.where(valid, self.decay[age], 0.0)
+        ewma = (weights * temperatures).sum(axis=1) / weights.sum(axis=1)
+
+        recent = valid & (age < self.slope_samples)
+        n_recent = recent.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t_mean = np.where(recent, times, 0.0).sum(axis=1) / n_recent
+            y_mean = np.where(recent, temperatures, 0.0).sum(axis=1) / n_recent
+            dt = np.where(recent, times - t_mean[:, None], 0.0)
+            dy = np.where(recent, temperatures - y_mean[:, None], 0.0)
+            sxx = (dt * dt).sum(axis=1)
+            slope = np.where(sxx > 0, (dt * dy).sum(axis=1) / sxx, 0.0)
+
+            baseline = valid & (age >= self.slope_samples)
+            n_baseline = baseline.sum(axis=1)
+            b_mean = np.where(baseline, temperatures, 0.0).sum(axis=1) / n_baseline
+            b_var = np.where(baseline, (temperatures - b_mean[:, None]) ** 2, 0.0).sum(axis=1) / n_baseline
+            z = (latest - b_mean) / np.maximum(np.sqrt(b_var), self.min_std_c)
+
+            eta = np.where(slope > 0, (self.threshold_c - latest) / slope, np.inf)
+
+        ready = (n_recent == self.slope_samples) & (n_baseline >= self.min_baseline)
+        trigger = (ready & (latest < self.threshold_c) & (slope >= self.min_slope)
+                   & (z >= self.min_z) & (eta <= self.horizon_sec))
+        previous = self.predicted[rows]
+        self.predicted[rows] = trigger | (previous & (latest >= self.threshold_c - self.rearm_c))
+
+        predictions = []
+        for i in np.flatnonzero(trigger & ~previous):
+            row = rows[i]
+            predictions.append({
+                "type": "predicted_overheat",
+                "node_id": self.node_ids[row],
+                "temperature_c": round(float(latest[i]), 2),
+                "ewma_c": round(float(ewma[i]), 2),
+                "slope_c_per_min": round(float(slope[i]) * 60.0, 2),
+                "z_score": round(float(z[i]), 2),
+                "threshold_c": self.threshold_c,
+                "eta_sec": round(float(eta[i]), 1),
+                "timestamp": datetime.fromtimestamp(self.timestamps[row, newest[i]], timezone.utc).isoformat(),
+            })
+
+        self.predictions_total += len(predictions)
+        self.evaluations_total += 1
+        self.evaluated_nodes_total += len(rows)
+        self.evaluated_readings_total += readings
+        self.evaluation_seconds_total += time.perf_counter() - start
+        return predictions
+
+    async def start(self, publish: Callable[[str, Dict[str, Any]], None]):
+        """Evaluates pending readings every interval and hands predictions to `publish(node_id, event)`."""
+        self._publish = publish
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                for event in self.evaluate():
+                    self._publish(event["node_id"], event)
+            except Exception as e:
+                logger.error(f"Anomaly evaluation failed: {e!r}")
+
+    def forget(self, node_id: str):
+        slot = self.slots.pop(node_id, None)
+        if slot is None:
+            return
+        self.node_ids[slot] = None
+        self.heads[slot] = 0
+        self.counts[slot] = 0
+        self.predicted[slot] = False
+        if slot in self.pending_slots:
+            pending = [p for p in zip(self.pending_slots, self.pending_temperatures, self.pending_timestamps) if p[0] != slot]
+            self.pending_slots = [p[0] for p in pending]
+            self.pending_temperatures = [p[1] for p in pending]
+            self.pending_timestamps = [p[2] for p in pending]
+        self.free.append(slot)
+
+    def clear(self):
+        self._allocate(INITIAL_CAPACITY)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "nodes": len(self.slots),
+            "pending": len(self.pending_slots),
+            "predicting": int(self.predicted.sum()),
+            "threshold_c": self.threshold_c,
+            "horizon_sec": self.horizon_sec,
+            "evaluations_total": self.evaluations_total,
+            "predictions_total": self.predictions_total,
+            "evaluation_us_per_reading": round(self.evaluation_seconds_total / self.evaluated_readings_total * 1e6, 3)
+            if self.evaluated_readings_total else 0.0,
+        }
+
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,63 @@
+"""
+Measures alarm rule evaluation throughput of AlarmEngine (readings/sec) on a synthetic
+fleet where a share of the nodes overheat and recover. Runs in-process, no database:
+
+    python -m benchmarks.alarm_rules --nodes 10000 --readings 1000000
+"""
+import argparse
+import random
+import time
+from typing import NamedTuple
+from alarm_engine import AlarmEngine, build_rules, NODE_TYPES
+
+TARGET_READINGS_PER_SEC = 100_000
+
+class Reading(NamedTuple):
+    is_online: bool
+    cpu_temperature_c: float
+    connected_users: int
+    current_throughput_mbps: float
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--readings", type=int, default=1_000_000)
+    parser.add_argument("--hot-share", type=float, default=0.05, help="share of readings above the alarm thresholds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    nodes = [(f"node-{i}", rng.choice(NODE_TYPES)) for i in range(args.nodes)]
+
+    # Pre-generate a pool of readings so the timed loop only measures rule evaluation
+    pool = [
+        Reading(
+            True,
+            rng.uniform(51.0, 60.0) if rng.random() < args.hot_share else rng.uniform(35.0, 46.0),
+            rng.randint(430, 500) if rng.random() < args.hot_share else rng.randint(10, 400),
+            rng.uniform(10.0, 900.0),
+        )
+        for _ in range(65536)
+    ]
+
+    engine = AlarmEngine(build_rules())
+    evaluate = engine.evaluate
+    transitions = 0
+    node_count = len(nodes)
+    mask = len(pool) - 1
+
+    start = time.perf_counter()
+    for i in range(args.readings):
+        node_id, node_type = nodes[i % node_count]
+        transitions += len(evaluate(node_id, node_type, pool[i & mask]))
+    elapsed = time.perf_counter() - start
+
+    rate = args.readings / elapsed
+    print(f"readings:     {args.readings}")
+    print(f"transitions:  {transitions}")
+    print(f"elapsed:      {elapsed:.3f} s")
+    print(f"throughput:   {rate:,.0f} readings/s ({elapsed / args.readings * 1e6:.2f} us/reading)")
+    print(f"target:       {TARGET_READINGS_PER_SEC:,} readings/s -> {'OK' if rate >= TARGET_READINGS_PER_SEC else 'BELOW TARGET'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Evaluates the overheat predictor offline on telemetry traces: a recording made with
+INGEST_RECORD_PATH while cooling faults were injected in the simulators, or synthetic
+traces generated with the simulator's fleet model (2-6 °C per reading while a fault lasts).
+Readings are fed in timestamp order and the detector is evaluated every --interval-ms of
+trace time, as the aggregator does. Reports how many threshold crossings were predicted,
+how far ahead, false predictions and the cost per reading. No aggregator or database is needed:
+
+    python -m benchmarks.anomaly /tmp/fleet.rec
+    python -m benchmarks.anomaly --nodes 5000 --minutes 30 --fault-rate 0.002
+"""
+import argparse
+import time
+from collections import defaultdict
+from typing import Iterator, Tuple
+import numpy as np
+from anomaly_detector import AnomalyDetector, PREDICT_INTERVAL_MS
+from benchmarks.log_latency import percentile
+
+HEARTBEAT_SEC = 5.0
+MAX_TEMP_C = 95.0
+
+def synthetic_readings(nodes: int, minutes: float, fault_rate: float, seed: int) -> Iterator[Tuple[float, str, float]]:
+    """(timestamp, node_id, temperature) in time order, following bts_simulator's FleetModel.step."""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(42.0, 46.0, nodes)
+    temp = base.copy()
+    fault_left = np.zeros(nodes, dtype=np.int64)
+    # The simulator sends one slice of the fleet per scheduler tick, spread over the heartbeat
+    offsets = rng.uniform(0.0, HEARTBEAT_SEC, nodes)
+    order = np.argsort(offsets)
+    node_ids = [f"node-{i}" for i in range(nodes)]
+    start = 1_700_000_000.0
+    for tick in range(int(minutes * 60 / HEARTBEAT_SEC)):
+        starting = (fault_left == 0) & (rng.random(nodes) < fault_rate)
+        fault_left[starting] = rng.integers(6, 20, int(starting.sum()))
+        failed = fault_left > 0
+        heating = np.minimum(MAX_TEMP_C, temp + rng.uniform(2.0, 6.0, nodes))
+        normal = base + rng.uniform(-2.0, 2.0, nodes)
+        temp = np.where(failed, heating, normal)
+        fault_left[failed] -= 1
+        now = start + tick * HEARTBEAT_SEC
+        for i in order:
+            yield now + offsets[i], node_ids[i], float(temp[i])
+
+def recorded_readings(path: str) -> Iterator[Tuple[float, str, float]]:
+    from recording import TelemetryRecording
+    with TelemetryRecording(path) as recording:
+        readings = [(r.timestamp, str(r.node_id), r.cpu_temperature_c) for r in recording.readings()]
+    readings.sort(key=lambda r: r[0])
+    yield from readings
+
+def evaluate_trace(readings, detector: AnomalyDetector, interval: float) -> dict:
+    threshold = detector.threshold_c
+    previous = {}
+    rising = defaultdict(bool)
+    crossings = []
+    predictable = set()
+    predictions = defaultdict(list)
+    count = 0
+    busy = 0.0
+    next_evaluation = None
+
+    def run_evaluation(at: float):
+        nonlocal busy
+        start = time.perf_counter()
+        events = detector.evaluate()
+        busy += time.perf_counter() - start
+        for event in events:
+            predictions[event["node_id"]].append(at)
+
+    for timestamp, node_id, temperature in readings:
+        if next_evaluation is None:
+            next_evaluation = timestamp + interval
+        while timestamp >= next_evaluation:
+            run_evaluation(next_evaluation)
+            next_evaluation += interval
+
+        start = time.perf_counter()
+        detector.observe(node_id, temperature, timestamp)
+        busy += time.perf_counter() - start
+        count += 1
+
+        last = previous.get(node_id)
+        if last is not None and last < threshold <= temperature:
+            crossings.append((node_id, timestamp))
+            # A reading that already rose but stayed below the threshold gave the detector a chance
+            if rising[node_id]:
+                predictable.add(len(crossings) - 1)
+        rising[node_id] = last is not None and temperature > last + 1.0 and temperature < threshold
+        previous[node_id] = temperature
+    run_evaluation(next_evaluation or 0.0)
+
+    horizon = detector.horizon_sec + interval
+    used = set()
+    leads = []
+    detected = set()
+    for i, (node_id, crossed_at) in enumerate(crossings):
+        for j, predicted_at in enumerate(predictions[node_id]):
+            if (node_id, j) not in used and crossed_at - horizon <= predicted_at < crossed_at:
+                used.add((node_id, j))
+                leads.append(crossed_at - predicted_at)
+                detected.add(i)
+                break
+    total_predictions = sum(len(times) for times in predictions.values())
+    leads.sort()
+    return {
+        "readings": count,
+        "crossings": len(crossings),
+        "predictable": len(predictable),
+        "detected": len(detected),
+        "detected_predictable": len(detected & predictable),
+        "false_predictions": total_predictions - len(used),
+        "predictions": total_predictions,
+        "lead_p50": percentile(leads, 50) if leads else 0.0,
+        "lead_min": leads[0] if leads else 0.0,
+        "us_per_reading": busy / count * 1e6 if count else 0.0,
+    }
+
+def fleet_cost(nodes: int, rounds: int = 5) -> float:
+    """Microseconds per reading when every node of a large fleet reports once per evaluation."""
+    detector = AnomalyDetector()
+    rng = np.random.default_rng(0)
+    node_ids = [f"node-{i}" for i in range(nodes)]
+    temperatures = rng.uniform(40.0, 47.0, (rounds, nodes)).tolist()
+    start = time.perf_counter()
+    for r in range(rounds):
+        now = 1_700_000_000.0 + r * HEARTBEAT_SEC
+        for node_id, temperature in zip(node_ids, temperatures[r]):
+            detector.observe(node_id, temperature, now)
+        detector.evaluate()
+    return (time.perf_counter() - start) / (rounds * nodes) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", nargs="?", help="file written with INGEST_RECORD_PATH; synthetic traces if omitted")
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--minutes", type=float, default=30.0)
+    parser.add_argument("--fault-rate", type=float, default=0.002, help="chance per reading that a healthy node's cooling fails")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--interval-ms", type=int, default=PREDICT_INTERVAL_MS)
+    parser.add_argument("--fleet", type=int, default=100_000, help="fleet size of the cost measurement")
+    args = parser.parse_args()
+
+    if args.recording:
+        readings = recorded_readings(args.recording)
+    else:
+        readings = synthetic_readings(args.nodes, args.minutes, args.fault_rate, args.seed)
+    detector = AnomalyDetector()
+    result = evaluate_trace(readings, detector, args.interval_ms / 1000.0)
+
+    crossings = result["crossings"] or 1
+    predictable = result["predictable"] or 1
+    print(f"readings {result['readings']}, threshold {detector.threshold_c} °C, horizon {detector.horizon_sec} s")
+    print(f"threshold crossings {result['crossings']}, predicted {result['detected']} ({result['detected'] / crossings:.1%})")
+    print(f"crossings after a rising reading below the threshold {result['predictable']}, "
+          f"predicted {result['detected_predictable']} ({result['detected_predictable'] / predictable:.1%})")
+    print(f"lead time p50 {result['lead_p50']:.1f} s, min {result['lead_min']:.1f} s")
+    print(f"predictions {result['predictions']}, false {result['false_predictions']}")
+    print(f"cost {result['us_per_reading']:.2f} us per reading on this trace, "
+          f"{fleet_cost(args.fleet):.2f} us per reading for a {args.fleet} node fleet")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares telemetry ingest throughput (rows/sec) of the single-row endpoint
+POST /api/nodes/{node_id}/logs against the bulk endpoint POST /api/logs/batch.
+
+Run against a live aggregator (e.g. `docker compose up`):
+    python -m benchmarks.batch_ingest --url http://localhost:8000 --rows 20000
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from benchmarks.common import random_reading, register_nodes
+
+async def bench_single(client: httpx.AsyncClient, node_ids: list, rows: int, concurrency: int) -> float:
+    queue = asyncio.Queue()
+    for i in range(rows):
+        queue.put_nowait(node_ids[i % len(node_ids)])
+
+    async def worker():
+        while not queue.empty():
+            node_id = queue.get_nowait()
+            reading = random_reading()
+            response = await client.post(f"/api/nodes/{node_id}/logs", json=reading)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return rows / (time.perf_counter() - start)
+
+async def bench_batch(client: httpx.AsyncClient, node_ids: list, rows: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    sent = 0
+    while sent < rows:
+        size = min(batch_size, rows - sent)
+        readings = [
+            {"node_id": node_ids[(sent + i) % len(node_ids)], **random_reading()}
+            for i in range(size)
+        ]
+        response = await client.post("/api/logs/batch", json={"readings": readings})
+        response.raise_for_status()
+        if response.json()["rejected"]:
+            raise RuntimeError(f"Batch rejected rows: {response.json()['rejected']}")
+        sent += size
+    return rows / (time.perf_counter() - start)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=32, help="parallel requests for the single-row path")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60.0) as client:
+        node_ids = await register_nodes(client, args.nodes)
+
+        single_rate = await bench_single(client, node_ids, args.rows, args.concurrency)
+        print(f"single-row: {single_rate:10.0f} rows/s  (concurrency={args.concurrency})")
+
+        batch_rate = await bench_batch(client, node_ids, args.rows, args.batch_size)
+        print(f"batch:      {batch_rate:10.0f} rows/s  (batch_size={args.batch_size})")
+
+        print(f"speedup:    {batch_rate / single_rate:10.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
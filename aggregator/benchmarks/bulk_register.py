@@ -0,0 +1,56 @@
+"""
+Measures node onboarding: registering N nodes one request at a time through
+POST /api/nodes/ against batches through POST /api/nodes/bulk, then re-sends
+the same batches to check that a retry returns the same ids and adds no rows.
+
+    python -m benchmarks.bulk_register --url http://localhost:8000 --nodes 100000
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from benchmarks.common import node_definition, register_nodes
+
+async def bench_single(client: httpx.AsyncClient, count: int, concurrency: int) -> float:
+    queue = asyncio.Queue()
+    for i in range(count):
+        queue.put_nowait(i)
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            response = await client.post("/api/nodes/", json=node_definition(i, "SINGLE_REG_NODE"))
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return count / (time.perf_counter() - start)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--single-nodes", type=int, default=2000, help="nodes registered one by one for comparison")
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=300.0) as client:
+        single_rate = await bench_single(client, args.single_nodes, args.concurrency)
+        print(f"single:      {single_rate:10.0f} nodes/s  ({args.single_nodes} nodes, concurrency={args.concurrency})")
+
+        start = time.perf_counter()
+        node_ids = await register_nodes(client, args.nodes, prefix="BULK_REG_NODE", batch_size=args.batch_size)
+        bulk_rate = args.nodes / (time.perf_counter() - start)
+        print(f"bulk:        {bulk_rate:10.0f} nodes/s  ({args.nodes} nodes, batch_size={args.batch_size})")
+
+        start = time.perf_counter()
+        retry_ids = await register_nodes(client, args.nodes, prefix="BULK_REG_NODE", batch_size=args.batch_size)
+        retry_rate = args.nodes / (time.perf_counter() - start)
+        print(f"bulk retry:  {retry_rate:10.0f} nodes/s  same ids: {retry_ids == node_ids}")
+
+        print(f"speedup:     {bulk_rate / single_rate:10.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+import random
+import httpx
+
+# Largest batch accepted by POST /api/nodes/bulk
+REGISTER_BATCH_SIZE = 10000
+
+def random_reading() -> dict:
+    return {
+        "is_online": True,
+        "cpu_temperature_c": round(random.uniform(35.0, 49.0), 2),
+        "connected_users": random.randint(10, 400),
+        "current_throughput_mbps": round(random.uniform(10.0, 900.0), 2),
+    }
+
+def node_definition(i: int, prefix: str = "BENCH_NODE") -> dict:
+    name = f"{prefix}_{i:06d}"
+    return {
+        "node_name": name,
+        "topology_path": f"PL.BENCH.eNodeB.{name}",
+        "node_type": "eNodeB",
+        "ip_address": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+        "max_throughput_mbps": 1000,
+        "latitude": 51.0 + random.uniform(-1.0, 1.0),
+        "longitude": 19.0 + random.uniform(-1.0, 1.0),
+    }
+
+async def register_nodes(client: httpx.AsyncClient, count: int, prefix: str = "BENCH_NODE",
+                         batch_size: int = REGISTER_BATCH_SIZE) -> list:
+    """Registers (or re-registers) `count` benchmark nodes through the bulk endpoint and returns their ids."""
+    node_ids = []
+    for start in range(0, count, batch_size):
+        nodes = [node_definition(i, prefix) for i in range(start, min(start + batch_size, count))]
+        response = await client.post("/api/nodes/bulk", json={"nodes": nodes})
+        response.raise_for_status()
+        node_ids.extend(response.json()["node_ids"])
+    return node_ids
@@ -0,0 +1,94 @@
+"""
+In-process cost of parsing and serializing telemetry, per reading, before and after
+the compact encoding and orjson: request body parsing of both log endpoints, WebSocket
+log_delta frames and node list responses. No aggregator or database is needed:
+
+    python -m benchmarks.encoding --readings 1000
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+import codec
+import schemas
+from benchmarks.common import random_reading, node_definition
+
+def hundredths(reading: dict) -> tuple:
+    return (reading["is_online"], round(reading["cpu_temperature_c"] * 100), reading["connected_users"],
+            round(reading["current_throughput_mbps"] * 100))
+
+def per_reading_us(fn, readings: int, min_time: float = 0.5) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / (calls * readings) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=1000, help="readings per batch, frame and node list")
+    args = parser.parse_args()
+    n = args.readings
+    random.seed(1)
+
+    reading = random_reading()
+    single_json = json.dumps(reading).encode()
+    single_binary = codec.READING.pack(*hundredths(reading))
+
+    node_ids = [uuid.uuid4() for _ in range(n)]
+    rows = [{"node_id": str(node_id), **random_reading()} for node_id in node_ids]
+    batch_json = json.dumps({"readings": rows}).encode()
+    batch_binary = b"".join(
+        codec.BATCH_READING.pack(node_id.bytes, 0.0, *hundredths(row)) for node_id, row in zip(node_ids, rows)
+    )
+
+    def batch_before():
+        batch = schemas.NodeStatusLogBatch.model_validate(json.loads(batch_json))
+        return [schemas.NodeStatusLogBatchItem.model_validate(raw) for raw in batch.readings]
+
+    def batch_after_json():
+        batch = schemas.NodeStatusLogBatch.model_validate_json(batch_json)
+        return [schemas.NodeStatusLogBatchItem.model_validate(raw) for raw in batch.readings]
+
+    now = datetime.now(timezone.utc).isoformat()
+    frame = {
+        "type": "log_delta",
+        "readings": n,
+        "logs": [{"node_id": row["node_id"], "log": {**random_reading(), "timestamp": now}} for row in rows]
+    }
+    nodes = [{**node_definition(i), "node_id": node_id, "created_at": datetime.now(timezone.utc)}
+             for i, node_id in enumerate(node_ids)]
+
+    cases = [
+        ("single reading body", 1,
+         lambda: schemas.NodeStatusLogCreate.model_validate(json.loads(single_json)),
+         lambda: schemas.NodeStatusLogCreate.model_validate_json(single_json),
+         lambda: codec.decode_reading(single_binary)),
+        ("batch body", n, batch_before, batch_after_json, lambda: codec.decode_batch(batch_binary)),
+        ("log_delta frame", n,
+         lambda: json.dumps(frame, default=str),
+         lambda: codec.dumps(frame),
+         None),
+        ("node list response", n,
+         lambda: json.dumps(jsonable_encoder(nodes)).encode(),
+         lambda: codec.FastJSONResponse(nodes).body,
+         None),
+    ]
+
+    print(f"{'us per reading':<22} {'before':>9} {'json':>9} {'binary':>9}")
+    for name, count, before, after_json, after_binary in cases:
+        b = per_reading_us(before, count)
+        j = per_reading_us(after_json, count)
+        x = f"{per_reading_us(after_binary, count):>9.3f}" if after_binary else f"{'-':>9}"
+        print(f"{name:<22} {b:>9.3f} {j:>9.3f} {x}")
+    print(f"\nbytes per reading: single JSON {len(single_json)}, binary {len(single_binary)}; "
+          f"batch JSON {len(batch_json) / n:.1f}, binary {len(batch_binary) / n:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Checks WebSocket fan-out across aggregator workers. Starts uvicorn with several
+workers and EVENT_BUS=postgres (or uses --url of a running deployment), connects
+dashboards that the kernel spreads over the workers, posts readings that land on
+random workers and verifies that every dashboard receives every reading. Reports
+delivery and ingest-to-dashboard latency; exits with status 1 if readings are missing.
+Needs DATABASE_URL and the `websockets` package (part of uvicorn[standard]):
+
+    python -m benchmarks.event_bus --workers 3 --clients 12 --readings 500
+    EVENT_BUS=local python -m benchmarks.event_bus --workers 3   # shows the loss without the bus
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import httpx
+import orjson
+import websockets
+from benchmarks.common import register_nodes
+from benchmarks.log_latency import percentile
+
+def start_workers(port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "EVENT_BUS": os.environ.get("EVENT_BUS", "postgres")}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Aggregator exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/events/stats", timeout=1.0).status_code == 200:
+                # Give every worker time to finish its startup and LISTEN
+                time.sleep(2.0)
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Aggregator did not start within 60 s")
+
+async def dashboard(url: str, received: dict, ready: asyncio.Event, done: asyncio.Event):
+    """Collects the arrival time of every marked reading, keyed by its connected_users marker."""
+    async with websockets.connect(url.replace("http", "ws", 1) + "/ws/events", max_queue=None) as ws:
+        ready.set()
+        while not done.is_set():
+            try:
+                frame = orjson.loads(await asyncio.wait_for(ws.recv(), timeout=0.5))
+            except asyncio.TimeoutError:
+                continue
+            if frame["type"] == "new_log":
+                received[frame["log"]["connected_users"]] = time.perf_counter()
+
+async def run(url: str, clients: int, nodes: int, readings: int, rate: float, grace: float) -> bool:
+    async with httpx.AsyncClient(base_url=url, timeout=30.0) as client:
+        node_ids = await register_nodes(client, nodes, prefix="BUS_NODE")
+        # Registrations reach the other workers through the bus as well
+        await asyncio.sleep(0.5)
+
+        done = asyncio.Event()
+        inboxes = [{} for _ in range(clients)]
+        ready = [asyncio.Event() for _ in range(clients)]
+        tasks = [asyncio.create_task(dashboard(url, inbox, r, done)) for inbox, r in zip(inboxes, ready)]
+        await asyncio.gather(*(r.wait() for r in ready))
+
+        # connected_users carries a unique marker, so each reading can be found in every inbox
+        sent = {}
+        for marker in range(readings):
+            body = {"is_online": True, "cpu_temperature_c": 40.0, "connected_users": 1_000_000 + marker,
+                    "current_throughput_mbps": 100.0}
+            sent[1_000_000 + marker] = time.perf_counter()
+            response = await client.post(f"/api/nodes/{node_ids[marker % len(node_ids)]}/logs", json=body)
+            response.raise_for_status()
+            await asyncio.sleep(1.0 / rate)
+
+        await asyncio.sleep(grace)
+        done.set()
+        await asyncio.gather(*tasks)
+
+    latencies = sorted(inbox[m] - t for inbox in inboxes for m, t in sent.items() if m in inbox)
+    delivered = [sum(1 for m in sent if m in inbox) for inbox in inboxes]
+    print(f"{'client':>6} {'delivered':>10}")
+    for i, count in enumerate(delivered):
+        print(f"{i:>6} {count:>5}/{readings}")
+    print(f"delivery {sum(delivered) / (clients * readings):.1%} | latency p50 {percentile(latencies, 50) * 1000:.1f} ms "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} ms max {(latencies[-1] if latencies else 0) * 1000:.1f} ms")
+    return all(count == readings for count in delivered)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="running deployment to test instead of starting workers")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--clients", type=int, default=12, help="dashboards, spread over the workers by the kernel")
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--readings", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200.0, help="readings posted per second")
+    parser.add_argument("--grace", type=float, default=2.0, help="seconds to wait for the last deliveries")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if url is None:
+        process = start_workers(args.port, args.workers)
+        url = f"http://127.0.0.1:{args.port}"
+    try:
+        ok = asyncio.run(run(url, args.clients, args.nodes, args.readings, args.rate, args.grace))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Load test for POST /api/nodes/{node_id}/logs. For every concurrency level it keeps
+that many requests in flight for a fixed duration and reports throughput and
+p50/p99 latency. Run it before and after a change to compare:
+
+    python -m benchmarks.log_latency --url http://localhost:8000 --levels 1,8,32,128
+"""
+import argparse
+import asyncio
+import random
+import time
+import httpx
+from benchmarks.common import random_reading, register_nodes
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_level(client: httpx.AsyncClient, node_ids: list, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            node_id = random.choice(node_ids)
+            reading = random_reading()
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"/api/nodes/{node_id}/logs", json=reading)
+                if response.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--levels", default="1,8,32,128", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30.0) as client:
+        node_ids = await register_nodes(client, args.nodes, prefix="LOAD_NODE")
+
+        print(f"{'concurrency':>11} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for level in levels:
+            r = await run_level(client, node_ids, level, args.duration)
+            print(f"{r['concurrency']:>11} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
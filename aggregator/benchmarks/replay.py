@@ -0,0 +1,191 @@
+"""
+Replays a telemetry recording made with INGEST_RECORD_PATH into an aggregator.
+Recorded nodes are registered again through the bulk endpoint and their readings
+sent to POST /api/logs/batch on the recorded schedule, scaled by --speed
+(1 = real time, 10 = ten times faster, 0 = as fast as possible). The file is read
+through mmap, so recordings larger than memory can be replayed. The per-worker files
+of one multi-worker recording are replayed together: their readings are merged by
+timestamp onto one schedule.
+
+    INGEST_RECORD_PATH=/tmp/fleet.rec uvicorn main:app        # record
+    python -m benchmarks.replay /tmp/fleet.rec --info          # summarize
+    python -m benchmarks.replay /tmp/fleet.rec --speed 10      # replay
+    python -m benchmarks.replay /tmp/fleet.rec /tmp/fleet.*.rec --speed 10
+"""
+import argparse
+import asyncio
+import heapq
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Iterator, List
+import httpx
+from benchmarks.common import REGISTER_BATCH_SIZE
+from benchmarks.log_latency import percentile
+from recording import TelemetryRecording, RecordedReading
+
+def summarize(recordings: List[TelemetryRecording]) -> dict:
+    nodes = set()
+    readings = 0
+    first = last = None
+    for recording in recordings:
+        for record in recording.records():
+            if isinstance(record, RecordedReading):
+                readings += 1
+                first = record.timestamp if first is None else min(first, record.timestamp)
+                last = record.timestamp if last is None else max(last, record.timestamp)
+            else:
+                nodes.add(record.node_id)
+    return {
+        "bytes": sum(len(recording.map) for recording in recordings),
+        "registered_nodes": len(nodes),
+        "readings": readings,
+        "duration_sec": (last - first) if readings else 0.0,
+    }
+
+def merged_readings(recordings: List[TelemetryRecording]) -> Iterator[RecordedReading]:
+    """Readings of all recordings in timestamp order, for the per-worker files of one run."""
+    if len(recordings) == 1:
+        return recordings[0].readings()
+    return heapq.merge(*(recording.readings() for recording in recordings), key=lambda reading: reading.timestamp)
+
+async def register_recorded_nodes(client: httpx.AsyncClient, recordings: List[TelemetryRecording]) -> dict:
+    """
+    Registers every recorded node and maps its recorded node_id to the id assigned by the target.
+    A node registered through one worker may have its readings in another worker's file, so the
+    nodes of all recordings are registered before any reading is sent.
+    """
+    registrations = {}
+    for recording in recordings:
+        for node in recording.nodes():
+            registrations[node.node_id] = node.registration
+
+    recorded_ids = list(registrations)
+    id_map = {}
+    for start in range(0, len(recorded_ids), REGISTER_BATCH_SIZE):
+        chunk = recorded_ids[start:start + REGISTER_BATCH_SIZE]
+        response = await client.post("/api/nodes/bulk", json={"nodes": [registrations[i] for i in chunk]})
+        response.raise_for_status()
+        id_map.update(zip(chunk, response.json()["node_ids"]))
+    return id_map
+
+def reading_row(reading: RecordedReading, node_id: str, keep_timestamps: bool) -> dict:
+    row = {
+        "node_id": node_id,
+        "is_online": reading.is_online,
+        "cpu_temperature_c": reading.cpu_temperature_c,
+        "connected_users": reading.connected_users,
+        "current_throughput_mbps": reading.current_throughput_mbps,
+    }
+    if keep_timestamps:
+        row["timestamp"] = datetime.fromtimestamp(reading.timestamp, timezone.utc).isoformat()
+    return row
+
+async def replay(client: httpx.AsyncClient, readings: Iterator[RecordedReading], id_map: dict, speed: float,
+                 batch_size: int, window: float, concurrency: int, keep_timestamps: bool) -> dict:
+    """
+    Open loop: a batch is sent when its first reading falls due, whether or not earlier
+    batches have completed, so a slow aggregator shows up as latency rather than as a
+    lower send rate. Latency is measured from the time the batch was due.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(concurrency)
+    latencies = []
+    tasks = set()
+    counts = {"batches": 0, "accepted": 0, "rejected": 0, "errors": 0}
+
+    async def send(rows: list, due: float):
+        async with in_flight:
+            try:
+                response = await client.post("/api/logs/batch", json={"readings": rows})
+                response.raise_for_status()
+                body = response.json()
+                counts["accepted"] += body["accepted"]
+                counts["rejected"] += body["rejected"]
+            except httpx.HTTPError:
+                counts["errors"] += 1
+                return
+        latencies.append(loop.time() - due)
+
+    def dispatch(rows: list, due: float):
+        counts["batches"] += 1
+        task = asyncio.create_task(send(rows, due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    started = loop.time()
+    first = None
+    rows = []
+    due = started
+    max_lag = 0.0
+
+    for reading in readings:
+        if first is None:
+            first = reading.timestamp
+        at = started + (reading.timestamp - first) / speed if speed > 0 else started
+        # Readings within `window` of the batch's first one travel together
+        if rows and (len(rows) >= batch_size or at - due > window):
+            dispatch(rows, due)
+            rows = []
+        if not rows:
+            due = at
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+                # Yield so in-flight requests progress while catching up
+                await asyncio.sleep(0)
+        node_id = str(reading.node_id)
+        rows.append(reading_row(reading, id_map.get(reading.node_id, node_id), keep_timestamps))
+
+    if rows:
+        dispatch(rows, due)
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+
+    latencies.sort()
+    return {
+        **counts,
+        "elapsed_sec": elapsed,
+        "readings_per_sec": (counts["accepted"] + counts["rejected"]) / elapsed if elapsed else 0.0,
+        "max_lag_ms": max_lag * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+",
+                        help="file written by an aggregator started with INGEST_RECORD_PATH, or all per-worker files of one run")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 for as fast as possible")
+    parser.add_argument("--batch-size", type=int, default=1000, help="largest batch sent to /api/logs/batch")
+    parser.add_argument("--window", type=float, default=0.1, help="seconds of recorded time grouped into one batch")
+    parser.add_argument("--concurrency", type=int, default=16, help="batches in flight at once")
+    parser.add_argument("--keep-timestamps", action="store_true",
+                        help="send recorded timestamps instead of letting the aggregator stamp readings on arrival")
+    parser.add_argument("--info", action="store_true", help="print a summary of the recording and exit")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        recordings = [stack.enter_context(TelemetryRecording(path)) for path in args.recordings]
+        info = summarize(recordings)
+        print(f"{info['bytes']} bytes | {info['registered_nodes']} nodes | {info['readings']} readings over {info['duration_sec']:.1f} s")
+        if args.info:
+            return
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60.0) as client:
+            id_map = await register_recorded_nodes(client, recordings)
+            print(f"Registered {len(id_map)} nodes, replaying at {'max' if args.speed <= 0 else f'{args.speed:g}x'} speed")
+            r = await replay(client, merged_readings(recordings), id_map, args.speed, args.batch_size, args.window,
+                             args.concurrency, args.keep_timestamps)
+
+    print(f"{r['accepted']} accepted, {r['rejected']} rejected, {r['errors']} failed batches of {r['batches']}")
+    print(f"{r['elapsed_sec']:.1f} s | {r['readings_per_sec']:.0f} readings/s | "
+          f"batch p50 {r['p50_ms']:.2f} ms p99 {r['p99_ms']:.2f} ms | max lag {r['max_lag_ms']:.0f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
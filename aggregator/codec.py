@@ -0,0 +1,72 @@
+import struct
+from typing import Any, List
+import orjson
+from pydantic import TypeAdapter, ValidationError
+from fastapi.responses import JSONResponse
+import schemas
+
+# Compact telemetry encoding, accepted by the log endpoints next to JSON. Temperature and
+# throughput travel as integer hundredths (the precision nodes report in), so decoding
+# needs no rounding and cannot produce NaN.
+TELEMETRY_CONTENT_TYPE = "application/x-telemetry"
+# POST /api/nodes/{node_id}/logs: is_online, cpu_temperature_c * 100, connected_users, current_throughput_mbps * 100
+READING = struct.Struct("<?hII")
+# POST /api/logs/batch, one record per reading: node_id, epoch timestamp (0 = server time), then as above
+BATCH_READING = struct.Struct("<16sd?hII")
+MAX_BATCH_READINGS = 10000
+READING_DOC = f"One {READING.format} struct ({READING.size} bytes), temperature and throughput in hundredths"
+BATCH_READING_DOC = f"Concatenated {BATCH_READING.format} structs ({BATCH_READING.size} bytes each), node_id as 16 UUID bytes"
+
+_batch_items = TypeAdapter(List[schemas.NodeStatusLogBatchItem])
+
+class InvalidTelemetry(ValueError):
+    pass
+
+def dumps(data: Any) -> str:
+    """JSON text of data; datetimes and UUIDs are encoded natively, anything else with str()."""
+    return orjson.dumps(data, default=str).decode()
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by orjson. Returned directly by routes whose rows are built in SQL,
+    so FastAPI does not pass them through jsonable_encoder first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str)
+
+def is_telemetry(content_type: str) -> bool:
+    return content_type.split(";", 1)[0].strip().lower() == TELEMETRY_CONTENT_TYPE
+
+def decode_reading(body: bytes) -> schemas.NodeStatusLogCreate:
+    if len(body) != READING.size:
+        raise InvalidTelemetry(f"Expected {READING.size} bytes, got {len(body)}.")
+    is_online, temperature, users, throughput = READING.unpack(body)
+    return schemas.NodeStatusLogCreate.model_validate({
+        "is_online": is_online,
+        "cpu_temperature_c": temperature / 100,
+        "connected_users": users,
+        "current_throughput_mbps": throughput / 100
+    })
+
+def decode_batch(body: bytes) -> List[schemas.NodeStatusLogBatchItem]:
+    """Decodes a batch with a single validation call; the struct layout already fixes every field's type."""
+    count, rest = divmod(len(body), BATCH_READING.size)
+    if rest:
+        raise InvalidTelemetry(f"Body length must be a multiple of {BATCH_READING.size} bytes.")
+    if count > MAX_BATCH_READINGS:
+        raise InvalidTelemetry(f"At most {MAX_BATCH_READINGS} readings per batch.")
+    try:
+        return _batch_items.validate_python([
+            {
+                "node_id": node_id,
+                "timestamp": timestamp or None,
+                "is_online": is_online,
+                "cpu_temperature_c": temperature / 100,
+                "connected_users": users,
+                "current_throughput_mbps": throughput / 100
+            }
+            for node_id, timestamp, is_online, temperature, users, throughput in BATCH_READING.iter_unpack(body)
+        ])
+    except ValidationError as e:
+        raise InvalidTelemetry("; ".join(f"reading {err['loc'][0]}: {err['msg']}" for err in e.errors()))
@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+from typing import List
+from sqlalchemy import select, update, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+from alarm_engine import AlarmTransition
+
+async def get_open_alarms(db: AsyncSession):
+    """Returns (alarm_id, node_id, node_type, alarm_rule) of every alarm that is not cleared."""
+    result = await db.execute(
+        select(models.ActiveAlarm.alarm_id, models.ActiveAlarm.node_id, models.NetworkNode.node_type, models.ActiveAlarm.alarm_rule)
+        .join(models.NetworkNode, models.NetworkNode.node_id == models.ActiveAlarm.node_id)
+        .where(models.ActiveAlarm.cleared_at.is_(None), models.ActiveAlarm.alarm_rule.is_not(None))
+    )
+    return [(row.alarm_id, str(row.node_id), row.node_type.value, row.alarm_rule) for row in result]
+
+async def apply_alarm_transitions(db: AsyncSession, transitions: List[AlarmTransition]):
+    """
+    Inserts raised alarms and sets cleared_at on cleared ones, in one transaction. Transitions of
+    readings without a timestamp are stamped now; a NULL cleared_at would leave the alarm open.
+    """
+    now = datetime.now(timezone.utc)
+    raised = [
+        {
+            "alarm_id": t.alarm_id,
+            "node_id": t.node_id,
+            "severity": models.Severity(t.severity),
+            "description": t.description,
+            "alarm_rule": t.rule,
+            "raised_at": t.timestamp or now,
+        }
+        for t in transitions if t.raised
+    ]
+    cleared = [{"alarm_id": t.alarm_id, "cleared_at": t.timestamp or now} for t in transitions if not t.raised]
+
+    if raised:
+        await db.execute(insert(models.ActiveAlarm), raised)
+    if cleared:
+        # ORM bulk UPDATE by primary key
+        await db.execute(update(models.ActiveAlarm), cleared)
+    await db.commit()
@@ -0,0 +1,154 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import select, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+import schemas
+
+# Alarm raised for a component that is not OK; the alarm of the previous status is cleared on every change
+COMPONENT_ALARM_SEVERITY = {
+    models.Status.DEGRADED: models.Severity.MAJOR,
+    models.Status.FAILED: models.Severity.CRITICAL,
+}
+
+# The reported statuses are passed as three parallel arrays and joined as one relation
+REPORTED = """
+    unnest(CAST(:node_ids AS uuid[]), CAST(:component_types AS componenttype[]), CAST(:statuses AS status[]))
+        AS v(node_id, component_type, status)
+"""
+
+INSERT_MISSING = text(f"""
+    INSERT INTO hardware_component (component_id, node_id, component_type, status, status_changed_at)
+    SELECT gen_random_uuid(), v.node_id, v.component_type, v.status, now()
+    FROM {REPORTED}
+    ON CONFLICT (node_id, component_type) DO NOTHING
+    RETURNING component_id, node_id, component_type, status
+""")
+
+# Rows whose status did not change are not written at all. The self-join reads the row
+# as it was before the statement, which gives the previous status.
+UPDATE_CHANGED = text(f"""
+    UPDATE hardware_component hc
+    SET status = v.status, status_changed_at = now()
+    FROM {REPORTED}, hardware_component old
+    WHERE hc.node_id = v.node_id AND hc.component_type = v.component_type
+      AND old.component_id = hc.component_id
+      AND hc.status IS DISTINCT FROM v.status
+    RETURNING hc.component_id, hc.node_id, hc.component_type, old.status AS previous_status, hc.status
+""")
+
+CLEAR_OPEN_ALARMS = text("""
+    UPDATE active_alarm SET cleared_at = :cleared_at
+    WHERE cleared_at IS NULL AND component_id = ANY(CAST(:component_ids AS uuid[]))
+    RETURNING alarm_id, node_id, component_id, severity, description
+""")
+
+def _change(row, previous_status: Optional[str]) -> Dict[str, Any]:
+    return {
+        "component_id": row.component_id,
+        "node_id": row.node_id,
+        "component_type": models.ComponentType(row.component_type),
+        "previous_status": models.Status(previous_status) if previous_status else None,
+        "status": models.Status(row.status),
+    }
+
+async def apply_component_statuses(db: AsyncSession, items: Sequence[schemas.ComponentStatusItem]) -> Dict[str, Any]:
+    """
+    Applies reported component statuses in one transaction. Of several reports for the same
+    component the last one wins. Components reported for the first time are inserted, the
+    others are updated by a single set-based UPDATE that only touches actual changes. Every
+    change clears the open alarms of the component and raises one if it is not OK.
+    Returns the changes and the raised and cleared alarms.
+    """
+    latest = {(item.node_id, item.component_type): item.status for item in items}
+    if not latest:
+        return {"unique": 0, "changes": [], "raised": [], "cleared": []}
+
+    params = {
+        "node_ids": [node_id for node_id, _ in latest],
+        "component_types": [component_type.value for _, component_type in latest],
+        "statuses": [status.value for status in latest.values()],
+    }
+    inserted = (await db.execute(INSERT_MISSING, params)).all()
+    updated = (await db.execute(UPDATE_CHANGED, params)).all()
+    changes = [_change(row, None) for row in inserted] + [_change(row, row.previous_status) for row in updated]
+
+    now = datetime.now(timezone.utc)
+    cleared = []
+    if updated:
+        result = await db.execute(CLEAR_OPEN_ALARMS, {
+            "cleared_at": now,
+            "component_ids": [row.component_id for row in updated],
+        })
+        cleared = [dict(row._mapping) for row in result]
+
+    raised = [
+        {
+            "alarm_id": uuid.uuid4(),
+            "node_id": change["node_id"],
+            "component_id": change["component_id"],
+            "component_type": change["component_type"],
+            "severity": COMPONENT_ALARM_SEVERITY[change["status"]],
+            "description": f"{change['component_type'].value} {change['status'].value}",
+            "raised_at": now,
+        }
+        for change in changes if change["status"] in COMPONENT_ALARM_SEVERITY
+    ]
+    if raised:
+        await db.execute(insert(models.ActiveAlarm), [
+            {key: value for key, value in alarm.items() if key != "component_type"} for alarm in raised
+        ])
+    await db.commit()
+
+    component_types = {change["component_id"]: change["component_type"] for change in changes}
+    for alarm in cleared:
+        alarm["component_type"] = component_types[alarm["component_id"]]
+        alarm["severity"] = models.Severity(alarm["severity"])
+        alarm["cleared_at"] = now
+    return {"unique": len(latest), "changes": changes, "raised": raised, "cleared": cleared}
+
+async def get_components(db: AsyncSession, status: Optional[models.Status] = None,
+                         component_type: Optional[models.ComponentType] = None,
+                         topology: Optional[str] = None, limit: int = 1000) -> List[dict]:
+    """
+    Returns components with their node, e.g. all FAILED fans below a topology path. Without a
+    status, or for DEGRADED and FAILED, the query carries the literal predicate of the partial
+    index on components that are not OK, so only the faulty few are scanned. The condition has
+    to be a constant: a bound parameter would not let a prepared plan use the partial index.
+    """
+    component = models.HardwareComponent
+    node = models.NetworkNode
+    stmt = (
+        select(
+            component.component_id,
+            component.node_id,
+            node.node_name,
+            node.topology_path,
+            component.component_type,
+            component.status,
+            component.status_changed_at,
+        )
+        .join(node, node.node_id == component.node_id)
+        .order_by(component.component_type, component.status, component.node_id)
+        .limit(limit)
+    )
+    if status != models.Status.OK:
+        stmt = stmt.where(text("hardware_component.status <> 'OK'"))
+    if status:
+        stmt = stmt.where(component.status == status)
+    if component_type:
+        stmt = stmt.where(component.component_type == component_type)
+    if topology:
+        stmt = stmt.where(node.topology_path.descendant_of(topology))
+
+    rows = (await db.execute(stmt)).mappings().all()
+    return [
+        {
+            **row,
+            "topology_path": str(row["topology_path"]),
+            "component_type": row["component_type"].value,
+            "status": row["status"].value,
+        }
+        for row in rows
+    ]
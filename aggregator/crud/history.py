@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import select, table, column, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+
+# Resolutions from finest to coarsest with the approximate spacing of their rows.
+# Raw rows arrive with the simulator heartbeat (5 s).
+RESOLUTION_STEPS = {
+    "raw": timedelta(seconds=5),
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+}
+
+# Upper bound of points an automatic resolution may return for one node
+MAX_AUTO_POINTS = 1500
+
+ROLLUP_COLUMNS = (
+    "bucket", "node_id",
+    "avg_cpu_temperature_c", "max_cpu_temperature_c",
+    "avg_connected_users", "max_connected_users",
+    "avg_throughput_mbps", "max_throughput_mbps",
+    "samples",
+)
+
+ROLLUP_VIEWS = {
+    "1m": table("node_status_1m", *(column(name) for name in ROLLUP_COLUMNS)),
+    "1h": table("node_status_1h", *(column(name) for name in ROLLUP_COLUMNS)),
+}
+
+def retained(resolution: str, start: datetime, retention: Dict[str, Optional[timedelta]]) -> bool:
+    """Whether rows of `resolution` still reach back to `start`. None means kept forever."""
+    keep = retention.get(resolution)
+    return keep is None or start >= datetime.now(start.tzinfo) - keep
+
+def pick_resolution(start: datetime, end: datetime, limit: int, retention: Dict[str, Optional[timedelta]]) -> Optional[str]:
+    """
+    Picks the finest resolution that keeps the answer under MAX_AUTO_POINTS rows, i.e. the
+    coarsest rollup the range needs. A resolution whose retention does not reach back to
+    `start` is skipped. Longer ranges get the coarsest retained resolution if it fits in
+    `limit` rows. Returns None when none does.
+    """
+    span = end - start
+    # Rollups also return the bucket that contains `start`
+    candidates = [(resolution, span / step + 1) for resolution, step in RESOLUTION_STEPS.items()
+                  if retained(resolution, start, retention)]
+    for resolution, points in candidates:
+        if points <= min(MAX_AUTO_POINTS, limit):
+            return resolution
+    if candidates and candidates[-1][1] <= limit:
+        return candidates[-1][0]
+    return None
+
+async def get_node_metrics(db: AsyncSession, node_id: UUID, start: datetime, end: datetime, resolution: str,
+                           limit: int) -> Tuple[list, bool]:
+    """Returns up to `limit` points and whether more were cut off."""
+    if resolution == "raw":
+        log = models.NodeStatusLog
+        stmt = (
+            select(
+                log.timestamp.label("bucket"),
+                log.cpu_temperature_c.label("avg_cpu_temperature_c"),
+                log.cpu_temperature_c.label("max_cpu_temperature_c"),
+                log.connected_users.label("avg_connected_users"),
+                log.connected_users.label("max_connected_users"),
+                log.current_throughput_mbps.label("avg_throughput_mbps"),
+                log.current_throughput_mbps.label("max_throughput_mbps"),
+                literal(1).label("samples"),
+            )
+            .where(log.node_id == node_id, log.timestamp >= start, log.timestamp < end)
+            .order_by(log.timestamp)
+        )
+    else:
+        view = ROLLUP_VIEWS[resolution]
+        stmt = (
+            select(*(view.c[name] for name in ROLLUP_COLUMNS if name != "node_id"))
+            # Include the bucket that contains `start`
+            .where(view.c.node_id == node_id, view.c.bucket > start - RESOLUTION_STEPS[resolution], view.c.bucket < end)
+            .order_by(view.c.bucket)
+        )
+
+    # One extra row tells whether the series was cut off
+    rows = (await db.execute(stmt.limit(limit + 1))).mappings().all()
+    return rows[:limit], len(rows) > limit
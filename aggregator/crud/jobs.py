@@ -0,0 +1,35 @@
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import select, update, insert, delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+
+async def insert_job(db: AsyncSession, values: dict, history: int):
+    """Inserts a started job and deletes the finished ones beyond the newest `history`."""
+    job = models.MaintenanceJob
+    await db.execute(insert(job).values(**values))
+    newest = select(job.job_id).order_by(job.started_at.desc()).limit(history)
+    await db.execute(delete(job).where(job.status != "running", job.job_id.not_in(newest)))
+    await db.commit()
+
+async def save_job(db: AsyncSession, job_id: UUID, values: dict):
+    await db.execute(update(models.MaintenanceJob).where(models.MaintenanceJob.job_id == job_id).values(**values))
+    await db.commit()
+
+async def get_job(db: AsyncSession, job_id: UUID) -> Optional[models.MaintenanceJob]:
+    return await db.get(models.MaintenanceJob, job_id)
+
+async def get_running_job(db: AsyncSession, kind: str, target: Optional[str] = None) -> Optional[models.MaintenanceJob]:
+    """
+    Returns the newest job of the kind and target that is still marked running. The status is
+    compared as a literal, so a prepared plan can use the partial index on running jobs.
+    """
+    job = models.MaintenanceJob
+    stmt = (
+        select(job)
+        .where(text("maintenance_job.status = 'running'"), job.kind == kind,
+               job.target == target if target is not None else job.target.is_(None))
+        .order_by(job.started_at.desc())
+        .limit(1)
+    )
+    return await db.scalar(stmt)
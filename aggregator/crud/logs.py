@@ -1,17 +1,62 @@
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import List, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 import schemas
-from uuid import UUID
-
-def create_node_log(db: Session, node_id: UUID, log: schemas.NodeStatusLogCreate):
-    db_log = models.NodeStatusLog(
-        node_id=node_id,
-        is_online=log.is_online,
-        cpu_temperature_c=log.cpu_temperature_c,
-        connected_users=log.connected_users,
-        current_throughput_mbps=log.current_throughput_mbps
-    )
-    db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
-    return db_log
\ No newline at end of file
+
+async def create_node_logs_bulk(db: AsyncSession, readings: List[schemas.NodeStatusLogBatchItem]) -> List[Tuple[bool, datetime, str]]:
+    """
+    Writes many readings with a single multi-row INSERT and one commit.
+    Returns (accepted, timestamp, error) for every reading, in input order.
+    """
+    if not readings:
+        return []
+
+    node_ids = {r.node_id for r in readings}
+    known_ids = set(await db.scalars(
+        select(models.NetworkNode.node_id).where(
+            models.NetworkNode.node_id.in_(node_ids), models.NetworkNode.deleting_at.is_(None)
+        )
+    ))
+
+    results = []
+    rows = []
+    seen = set()
+    for reading in readings:
+        timestamp = reading.timestamp or datetime.now(timezone.utc)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+        if reading.node_id not in known_ids:
+            results.append((False, timestamp, "Unknown node_id"))
+            continue
+        if (reading.node_id, timestamp) in seen:
+            results.append((False, timestamp, "Duplicate reading for this node and timestamp"))
+            continue
+
+        seen.add((reading.node_id, timestamp))
+        results.append((True, timestamp, None))
+        rows.append({
+            "timestamp": timestamp,
+            "node_id": reading.node_id,
+            "is_online": reading.is_online,
+            "cpu_temperature_c": reading.cpu_temperature_c,
+            "connected_users": reading.connected_users,
+            "current_throughput_mbps": reading.current_throughput_mbps,
+        })
+
+    if rows:
+        # executemany with RETURNING is batched by SQLAlchemy into multi-row VALUES statements
+        stmt = insert(models.NodeStatusLog).on_conflict_do_nothing().returning(
+            models.NodeStatusLog.node_id, models.NodeStatusLog.timestamp
+        )
+        inserted = {(row.node_id, row.timestamp) for row in await db.execute(stmt, rows)}
+        await db.commit()
+
+        for i, (reading, (accepted, timestamp, error)) in enumerate(zip(readings, results)):
+            if accepted and (reading.node_id, timestamp) not in inserted:
+                results[i] = (False, timestamp, "Duplicate reading for this node and timestamp")
+
+    return results
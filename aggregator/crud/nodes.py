@@ -1,41 +1,317 @@
-from sqlalchemy.orm import Session
+import asyncio
+import base64
+import os
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+from sqlalchemy import select, delete, update, tuple_, func, text, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from geoalchemy2.elements import WKTElement
 import models
 import schemas
 
-def create_network_node(db: Session, node: schemas.NetworkNodeCreate):
-    point = WKTElement(f'POINT({node.longitude} {node.latitude})', srid=4326)
-    
-    db_node = models.NetworkNode(
-        node_name=node.node_name,
-        topology_path=node.topology_path,
-        node_type=node.node_type,
-        ip_address=node.ip_address,
-        max_throughput_mbps=node.max_throughput_mbps,
-        vendor_config=node.vendor_config,
-        location=point
+# DELETE /api/nodes/{node_id} removes telemetry in batches of this many rows with a pause in between
+NODE_DELETE_BATCH_ROWS = int(os.getenv("NODE_DELETE_BATCH_ROWS", "5000"))
+NODE_DELETE_PAUSE_MS = int(os.getenv("NODE_DELETE_PAUSE_MS", "50"))
+
+def _node_values(node: schemas.NetworkNodeCreate) -> dict:
+    return {
+        "node_name": node.node_name,
+        "topology_path": node.topology_path,
+        "node_type": node.node_type,
+        "ip_address": node.ip_address,
+        "max_throughput_mbps": node.max_throughput_mbps,
+        "vendor_config": node.vendor_config,
+        "location": WKTElement(f'POINT({node.longitude} {node.latitude})', srid=4326),
+    }
+
+# Attributes a repeated registration may change
+UPSERT_COLUMNS = ("topology_path", "node_type", "ip_address", "max_throughput_mbps", "vendor_config", "location")
+
+async def upsert_network_nodes(db: AsyncSession, nodes: Sequence[schemas.NetworkNodeCreate]) -> list:
+    """
+    Registers nodes by node_name with one INSERT ... ON CONFLICT DO UPDATE and one commit.
+    Nodes that already exist keep their node_id and get the new attributes, so retries are safe;
+    rows whose attributes did not change are left untouched.
+    Returns one row with every NODE_FIELDS column per input item, in input order.
+    """
+    if not nodes:
+        return []
+
+    # A statement cannot update the same row twice, the last occurrence of a name wins
+    unique = {node.node_name: node for node in nodes}
+
+    columns = models.NetworkNode.__table__.c
+    stmt = insert(models.NetworkNode)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.NetworkNode.node_name],
+        set_={name: stmt.excluded[name] for name in UPSERT_COLUMNS},
+        # An identical registration writes nothing, so it does not bump the fleet version (ETag)
+        where=or_(*(columns[name].is_distinct_from(stmt.excluded[name]) for name in UPSERT_COLUMNS)),
+    ).returning(*(expr.label(name) for name, expr in NODE_FIELDS.items()))
+
+    result = await db.execute(stmt, [_node_values(node) for node in unique.values()])
+    by_name = {row.node_name: row for row in result.all()}
+    # Skipped rows are not returned by the upsert
+    unchanged = [name for name in unique if name not in by_name]
+    if unchanged:
+        result = await db.execute(
+            select(*(expr.label(name) for name, expr in NODE_FIELDS.items()))
+            .where(models.NetworkNode.node_name.in_(unchanged))
+        )
+        by_name.update((row.node_name, row) for row in result.all())
+    await db.commit()
+
+    return [by_name[node.node_name] for node in nodes]
+
+async def create_network_node(db: AsyncSession, node: schemas.NetworkNodeCreate):
+    return (await upsert_network_nodes(db, [node]))[0]
+
+# Response fields that can be requested with ?fields=, mapped to SQL expressions.
+# Coordinates come from ST_X/ST_Y so the geometry is never decoded in Python.
+NODE_FIELDS = {
+    "node_id": models.NetworkNode.node_id,
+    "node_name": models.NetworkNode.node_name,
+    "topology_path": models.NetworkNode.topology_path,
+    "node_type": models.NetworkNode.node_type,
+    "ip_address": models.NetworkNode.ip_address,
+    "max_throughput_mbps": models.NetworkNode.max_throughput_mbps,
+    "vendor_config": models.NetworkNode.vendor_config,
+    "latitude": models.NetworkNode.latitude,
+    "longitude": models.NetworkNode.longitude,
+    "created_at": models.NetworkNode.created_at,
+}
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(created_at: datetime, node_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{node_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, node_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(node_id)
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+
+async def get_fleet_version(db: AsyncSession) -> int:
+    return await db.scalar(select(models.FleetVersion.version).where(models.FleetVersion.id == 1)) or 0
+
+async def get_nodes(db: AsyncSession, limit: int = 100, cursor: Optional[str] = None,
+                    fields: Optional[Sequence[str]] = None, skip: int = 0,
+                    topology: Optional[str] = None, node_type: Optional[models.NodeType] = None,
+                    node_name: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Returns one page of nodes ordered by (created_at, node_id) and the cursor of the next page.
+    Pages are found by keyset, so the cost does not grow with the position in the fleet.
+    With `topology` only the subtree below that ltree path is returned, with `node_name`
+    only that node, looked up through the unique index on the name.
+    """
+    fields = list(fields or NODE_FIELDS)
+    # The keyset columns are always selected to build the next cursor
+    columns = {name: NODE_FIELDS[name] for name in dict.fromkeys(fields + ["created_at", "node_id"])}
+
+    stmt = (
+        select(*(expr.label(name) for name, expr in columns.items()))
+        .where(models.NetworkNode.deleting_at.is_(None))
+        .order_by(models.NetworkNode.created_at, models.NetworkNode.node_id)
+        .limit(limit)
+    )
+    if topology:
+        stmt = stmt.where(models.NetworkNode.topology_path.descendant_of(topology))
+    if node_type:
+        stmt = stmt.where(models.NetworkNode.node_type == node_type)
+    if node_name:
+        stmt = stmt.where(models.NetworkNode.node_name == node_name)
+    if cursor:
+        created_at, node_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(models.NetworkNode.created_at, models.NetworkNode.node_id) > tuple_(created_at, node_id))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    rows = (await db.execute(stmt)).mappings().all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["node_id"])
+
+    return _node_rows(rows, fields), next_cursor
+
+async def count_nodes(db: AsyncSession, topology: Optional[str] = None, node_type: Optional[models.NodeType] = None) -> int:
+    stmt = select(func.count()).select_from(models.NetworkNode).where(models.NetworkNode.deleting_at.is_(None))
+    if topology:
+        stmt = stmt.where(models.NetworkNode.topology_path.descendant_of(topology))
+    if node_type:
+        stmt = stmt.where(models.NetworkNode.node_type == node_type)
+    return await db.scalar(stmt)
+
+def _node_rows(rows, fields: Sequence[str]) -> List[dict]:
+    nodes = []
+    for row in rows:
+        node = {name: row[name] for name in fields}
+        if "node_type" in node:
+            node["node_type"] = node["node_type"].value
+        nodes.append(node)
+    return nodes
+
+def _point(latitude: float, longitude: float):
+    return func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326)
+
+async def get_nodes_within(db: AsyncSession, bbox: Tuple[float, float, float, float], limit: int,
+                           fields: Optional[Sequence[str]] = None) -> List[dict]:
+    """Returns nodes inside a (min_lon, min_lat, max_lon, max_lat) box using the GiST index on location."""
+    fields = list(fields or NODE_FIELDS)
+    envelope = func.ST_MakeEnvelope(*bbox, 4326)
+    stmt = (
+        select(*(NODE_FIELDS[name].label(name) for name in fields))
+        .where(func.ST_Intersects(models.NetworkNode.location, envelope), models.NetworkNode.deleting_at.is_(None))
+        .limit(limit)
     )
-    db.add(db_node)
-    db.commit()
-    db.refresh(db_node)
+    rows = (await db.execute(stmt)).mappings().all()
+    return _node_rows(rows, fields)
 
-    db_node.latitude = node.latitude
-    db_node.longitude = node.longitude
+async def get_nodes_nearby(db: AsyncSession, latitude: float, longitude: float, radius_km: float, k: int,
+                           fields: Optional[Sequence[str]] = None) -> List[dict]:
+    """Returns up to k nodes within radius_km, nearest first (KNN <-> ordering on the geography index)."""
+    fields = list(fields or NODE_FIELDS)
+    location = func.geography(models.NetworkNode.location)
+    point = func.geography(_point(latitude, longitude))
+    stmt = (
+        select(
+            *(NODE_FIELDS[name].label(name) for name in fields),
+            (func.ST_Distance(location, point) / 1000.0).label("distance_km")
+        )
+        .where(func.ST_DWithin(location, point, radius_km * 1000.0), models.NetworkNode.deleting_at.is_(None))
+        .order_by(location.op("<->")(point))
+        .limit(k)
+    )
+    rows = (await db.execute(stmt)).mappings().all()
+    nodes = _node_rows(rows, fields)
+    for node, row in zip(nodes, rows):
+        node["distance_km"] = round(row["distance_km"], 3)
+    return nodes
+
+def _noop_progress(step: str, done: int, total: int):
+    pass
+
+async def _rollup_tables(db: AsyncSession) -> List[str]:
+    """Materialization hypertables of the continuous aggregates over node_status_log."""
+    rows = await db.execute(text("""
+        SELECT format('%I.%I', materialization_hypertable_schema, materialization_hypertable_name)
+        FROM timescaledb_information.continuous_aggregates
+        WHERE hypertable_name = 'node_status_log'
+    """))
+    return list(rows.scalars())
 
-    return db_node
+async def reset_fleet(db: AsyncSession, progress: Optional[Callable[[str, int, int], None]] = None) -> dict:
+    """
+    Removes every node with its telemetry, alarms and components without a row-by-row DELETE.
+    Telemetry chunks are dropped one at a time, each in its own short transaction, so ingest
+    keeps running in between. The remaining tables are truncated together at the end; only that
+    statement takes an exclusive lock, and it has almost nothing left to remove.
+    """
+    progress = progress or _noop_progress
+    nodes = await db.scalar(select(func.count()).select_from(models.NetworkNode))
+    chunks = (await db.execute(text("""
+        SELECT range_start, range_end FROM timescaledb_information.chunks
+        WHERE hypertable_name = 'node_status_log'
+        ORDER BY range_start
+    """))).all()
+    await db.commit()
 
-def get_nodes(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.NetworkNode).offset(skip).limit(limit).all()
+    total = len(chunks) + 1
+    for i, (range_start, range_end) in enumerate(chunks):
+        progress("dropping telemetry chunks", i, total)
+        await db.execute(
+            text("SELECT drop_chunks('node_status_log', older_than => :range_end, newer_than => :range_start)"),
+            {"range_start": range_start, "range_end": range_end}
+        )
+        await db.commit()
 
-def delete_all_nodes(db: Session):
+    progress("truncating nodes", len(chunks), total)
     try:
-        db.query(models.NodeStatusLog).delete()
-        db.query(models.ActiveAlarm).delete()
-        db.query(models.HardwareComponent).delete()
-        
-        nodes_deleted = db.query(models.NetworkNode).delete()
-        db.commit()
-        return nodes_deleted
-    except Exception as e:
-        db.rollback()
-        raise e
\ No newline at end of file
+        # Chunks created by ingest while the old ones were dropped go with the hypertable
+        await db.execute(text("TRUNCATE node_status_log, active_alarm, hardware_component, network_node"))
+        for table in await _rollup_tables(db):
+            await db.execute(text(f"TRUNCATE {table}"))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    progress("done", total, total)
+
+    return {"deleted_nodes": nodes, "dropped_chunks": len(chunks)}
+
+async def node_exists(db: AsyncSession, node_id: UUID) -> bool:
+    return await db.scalar(select(models.NetworkNode.node_id).where(models.NetworkNode.node_id == node_id)) is not None
+
+async def mark_node_deleting(db: AsyncSession, node_id: UUID) -> bool:
+    """
+    Marks a node as being deleted, which hides it from lookups and makes ingest reject its
+    readings on every worker. Returns False if the node does not exist.
+    """
+    node = models.NetworkNode
+    marked = await db.scalar(
+        update(node).where(node.node_id == node_id)
+        .values(deleting_at=func.coalesce(node.deleting_at, func.now()))
+        .returning(node.node_id)
+    )
+    await db.commit()
+    return marked is not None
+
+async def unmark_node_deleting(db: AsyncSession, node_id: UUID):
+    """Returns a node whose delete failed to the fleet."""
+    await db.execute(update(models.NetworkNode).where(models.NetworkNode.node_id == node_id).values(deleting_at=None))
+    await db.commit()
+
+async def delete_node(db: AsyncSession, node_id: UUID, batch_rows: int = NODE_DELETE_BATCH_ROWS,
+                      pause_ms: int = NODE_DELETE_PAUSE_MS,
+                      progress: Optional[Callable[[str, int, int], None]] = None) -> dict:
+    """
+    Deletes one node and its history. Telemetry is deleted `batch_rows` rows per transaction
+    through the (node_id, timestamp) index, pausing `pause_ms` between batches, so the rows
+    and chunks shared with other nodes are never locked for long. Readings that arrive
+    meanwhile are removed by the final transaction, which also deletes the node itself.
+    """
+    progress = progress or _noop_progress
+    total = await db.scalar(
+        select(func.count()).select_from(models.NodeStatusLog).where(models.NodeStatusLog.node_id == node_id)
+    )
+    await db.commit()
+
+    batch = text("""
+        DELETE FROM node_status_log
+        WHERE node_id = :node_id AND timestamp IN (
+            SELECT timestamp FROM node_status_log WHERE node_id = :node_id
+            ORDER BY timestamp DESC LIMIT :batch_rows
+        )
+    """)
+    deleted = 0
+    while True:
+        progress("deleting telemetry", deleted, total)
+        rowcount = (await db.execute(batch, {"node_id": node_id, "batch_rows": batch_rows})).rowcount
+        await db.commit()
+        deleted += rowcount
+        if rowcount < batch_rows:
+            break
+        await asyncio.sleep(pause_ms / 1000.0)
+
+    progress("deleting node", deleted, total)
+    try:
+        deleted += (await db.execute(delete(models.NodeStatusLog).where(models.NodeStatusLog.node_id == node_id))).rowcount
+        for table in await _rollup_tables(db):
+            await db.execute(text(f"DELETE FROM {table} WHERE node_id = :node_id"), {"node_id": node_id})
+        alarms = (await db.execute(delete(models.ActiveAlarm).where(models.ActiveAlarm.node_id == node_id))).rowcount
+        await db.execute(delete(models.HardwareComponent).where(models.HardwareComponent.node_id == node_id))
+        await db.execute(delete(models.NetworkNode).where(models.NetworkNode.node_id == node_id))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    progress("done", total, total)
+
+    return {"deleted_readings": deleted, "deleted_alarms": alarms}
@@ -0,0 +1,65 @@
+import os
+from datetime import timedelta
+from typing import Any, Dict
+from sqlalchemy import select, func, true
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+
+# Nodes without a reading in this window count as not reporting (and offline)
+TOPOLOGY_ONLINE_WINDOW_SEC = int(os.getenv("TOPOLOGY_ONLINE_WINDOW_SEC", "60"))
+
+async def get_topology_summary(db: AsyncSession, path: str, window_sec: int = TOPOLOGY_ONLINE_WINDOW_SEC) -> Dict[str, Any]:
+    """
+    Aggregates the subtree below `path` in one query: the nodes are found through the
+    ltree GiST index and each one is joined (LATERAL) with its latest reading of the
+    window through the (node_id, timestamp DESC) index.
+    """
+    node = models.NetworkNode
+    log = models.NodeStatusLog
+
+    latest = (
+        select(log.is_online, log.cpu_temperature_c, log.current_throughput_mbps, log.connected_users)
+        .where(log.node_id == node.node_id, log.timestamp > func.now() - timedelta(seconds=window_sec))
+        .order_by(log.timestamp.desc())
+        .limit(1)
+        .lateral("latest")
+    )
+    stmt = (
+        select(
+            node.node_type,
+            func.count().label("nodes"),
+            func.count(latest.c.is_online).label("reporting"),
+            func.count().filter(latest.c.is_online).label("online"),
+            func.sum(latest.c.cpu_temperature_c).label("sum_temperature"),
+            func.max(latest.c.cpu_temperature_c).label("max_temperature"),
+            func.sum(latest.c.current_throughput_mbps).label("sum_throughput"),
+            func.max(latest.c.current_throughput_mbps).label("max_throughput"),
+            func.coalesce(func.sum(latest.c.connected_users), 0).label("connected_users"),
+        )
+        .select_from(node)
+        .outerjoin(latest, true())
+        .where(node.topology_path.descendant_of(path))
+        .group_by(node.node_type)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    nodes = sum(row.nodes for row in rows)
+    reporting = sum(row.reporting for row in rows)
+    online = sum(row.online for row in rows)
+    temperatures = [row.max_temperature for row in rows if row.max_temperature is not None]
+    throughputs = [row.max_throughput for row in rows if row.max_throughput is not None]
+
+    return {
+        "path": path,
+        "nodes": nodes,
+        "nodes_by_type": {row.node_type.value: row.nodes for row in rows},
+        "reporting": reporting,
+        "online": online,
+        "online_ratio": online / nodes if nodes else 0.0,
+        "avg_cpu_temperature_c": sum(row.sum_temperature or 0 for row in rows) / reporting if reporting else None,
+        "max_cpu_temperature_c": max(temperatures, default=None),
+        "avg_throughput_mbps": sum(row.sum_throughput or 0 for row in rows) / reporting if reporting else None,
+        "max_throughput_mbps": max(throughputs, default=None),
+        "connected_users": sum(row.connected_users for row in rows),
+        "window_sec": window_sec,
+    }
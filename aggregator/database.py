@@ -1,33 +1,258 @@
 import os
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
+from metrics import db_acquire_seconds, db_commit_seconds
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# The same DATABASE_URL is used for every driver, the async engine always talks through asyncpg
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
 
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+TELEMETRY_RAW_RETENTION_DAYS = int(os.getenv("TELEMETRY_RAW_RETENTION_DAYS", "30"))
+TELEMETRY_1M_RETENTION_DAYS = int(os.getenv("TELEMETRY_1M_RETENTION_DAYS", "180"))
+TELEMETRY_COMPRESS_AFTER_DAYS = int(os.getenv("TELEMETRY_COMPRESS_AFTER_DAYS", "7"))
+
+# Continuous aggregates over node_status_log: (view name, bucket width, refresh start offset, refresh schedule)
+TELEMETRY_ROLLUPS = (
+    ("node_status_1m", "1 minute", "2 hours", "1 minute"),
+    ("node_status_1h", "1 hour", "3 days", "30 minutes"),
+)
+
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+)
+class TimedSession(AsyncSession):
+    """AsyncSession recording the duration of every commit in aggregator_db_commit_seconds."""
+
+    async def commit(self):
+        start = time.perf_counter()
+        await super().commit()
+        db_commit_seconds.observe(time.perf_counter() - start)
+
+SessionLocal = async_sessionmaker(bind=engine, class_=TimedSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def init_db():
-    with engine.begin() as conn:
-        conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis;"))
-        conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb;"))
-        conn.execute(text("CREATE EXTENSION IF NOT EXISTS ltree;"))
-    
-    Base.metadata.create_all(bind=engine)
-    
-    with engine.begin() as conn:
-        conn.execute(text("""
+# create_all only creates missing tables, so columns, indexes and triggers added
+# after the first release are applied idempotently on every start
+SCHEMA_UPGRADES = (
+    "ALTER TABLE active_alarm ADD COLUMN IF NOT EXISTS alarm_rule VARCHAR;",
+    "ALTER TABLE network_node ADD COLUMN IF NOT EXISTS deleting_at TIMESTAMP WITH TIME ZONE;",
+    "CREATE INDEX IF NOT EXISTS ix_network_node_created_at_node_id ON network_node (created_at, node_id);",
+    "CREATE INDEX IF NOT EXISTS idx_network_node_location ON network_node USING GIST (location);",
+    # Geography index for metre based radius searches and KNN ordering on the sphere
+    "CREATE INDEX IF NOT EXISTS ix_network_node_location_geog ON network_node USING GIST (geography(location));",
+    """
+    DO $$
+    BEGIN
+        IF (SELECT udt_name FROM information_schema.columns
+            WHERE table_name = 'network_node' AND column_name = 'topology_path') <> 'ltree' THEN
+            ALTER TABLE network_node ALTER COLUMN topology_path TYPE ltree USING text2ltree(topology_path);
+        END IF;
+    END
+    $$;
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_network_node_topology_path ON network_node USING GIST (topology_path);",
+    "CREATE INDEX IF NOT EXISTS ix_node_status_log_node_id_timestamp ON node_status_log (node_id, timestamp DESC);",
+    # Before node_name became unique, retried registrations left duplicate rows. The newest row
+    # of every name is kept and the telemetry, alarms and components of the older duplicates are
+    # moved to it. Only readings at a timestamp the kept node already has are dropped, as the
+    # primary key allows one reading per node and instant; a duplicate component of a type the
+    # kept node already has hands its alarms over to that component.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'ux_network_node_node_name') THEN
+            CREATE TEMPORARY TABLE duplicate_node ON COMMIT DROP AS
+            SELECT node_id, keep_id FROM (
+                SELECT node_id,
+                       first_value(node_id) OVER (PARTITION BY node_name ORDER BY created_at DESC, node_id) AS keep_id
+                FROM network_node
+            ) ranked
+            WHERE node_id <> keep_id;
+
+            DELETE FROM node_status_log l
+            USING duplicate_node d, node_status_log kept
+            WHERE l.node_id = d.node_id AND kept.node_id = d.keep_id AND kept.timestamp = l.timestamp;
+            UPDATE node_status_log l SET node_id = d.keep_id
+            FROM duplicate_node d WHERE l.node_id = d.node_id;
+
+            UPDATE active_alarm a SET node_id = d.keep_id
+            FROM duplicate_node d WHERE a.node_id = d.node_id;
+
+            UPDATE active_alarm a SET component_id = kept.component_id
+            FROM hardware_component hc, duplicate_node d, hardware_component kept
+            WHERE a.component_id = hc.component_id AND hc.node_id = d.node_id
+              AND kept.node_id = d.keep_id AND kept.component_type = hc.component_type;
+            DELETE FROM hardware_component hc
+            USING duplicate_node d, hardware_component kept
+            WHERE hc.node_id = d.node_id AND kept.node_id = d.keep_id AND kept.component_type = hc.component_type;
+            UPDATE hardware_component hc SET node_id = d.keep_id
+            FROM duplicate_node d WHERE hc.node_id = d.node_id;
+
+            DELETE FROM network_node WHERE node_id IN (SELECT node_id FROM duplicate_node);
+
+            CREATE UNIQUE INDEX ux_network_node_node_name ON network_node (node_name);
+        END IF;
+    END
+    $$;
+    """,
+    "ALTER TABLE hardware_component ADD COLUMN IF NOT EXISTS status_changed_at TIMESTAMP WITH TIME ZONE;",
+    # Status updates address a component by (node_id, component_type). Of any duplicates the
+    # first row is kept and alarms of the others are moved to it.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'ux_hardware_component_node_type') THEN
+            CREATE TEMPORARY TABLE duplicate_component ON COMMIT DROP AS
+            SELECT component_id, keep_id FROM (
+                SELECT component_id,
+                       first_value(component_id) OVER (PARTITION BY node_id, component_type ORDER BY component_id) AS keep_id
+                FROM hardware_component
+            ) ranked
+            WHERE component_id <> keep_id;
+
+            UPDATE active_alarm a SET component_id = d.keep_id
+            FROM duplicate_component d WHERE a.component_id = d.component_id;
+            DELETE FROM hardware_component WHERE component_id IN (SELECT component_id FROM duplicate_component);
+
+            CREATE UNIQUE INDEX ux_hardware_component_node_type ON hardware_component (node_id, component_type);
+        END IF;
+    END
+    $$;
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_hardware_component_not_ok ON hardware_component (component_type, status, node_id) WHERE status <> 'OK';",
+    "CREATE INDEX IF NOT EXISTS ix_active_alarm_open_component ON active_alarm (component_id) WHERE cleared_at IS NULL;",
+    "INSERT INTO fleet_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;",
+    """
+    CREATE OR REPLACE FUNCTION bump_fleet_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE fleet_version SET version = version + 1 WHERE id = 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    # Statement triggers fire even when no row changed, e.g. for a retried registration whose
+    # upsert skips every row. Inserts and updates bump the version only if they wrote a row.
+    """
+    CREATE OR REPLACE FUNCTION bump_fleet_version_if_changed() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM changed_node) THEN
+            UPDATE fleet_version SET version = version + 1 WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE OR REPLACE TRIGGER network_node_fleet_version
+    AFTER DELETE OR TRUNCATE ON network_node
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_fleet_version();
+    """,
+    """
+    CREATE OR REPLACE TRIGGER network_node_fleet_version_insert
+    AFTER INSERT ON network_node REFERENCING NEW TABLE AS changed_node
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_fleet_version_if_changed();
+    """,
+    """
+    CREATE OR REPLACE TRIGGER network_node_fleet_version_update
+    AFTER UPDATE ON network_node REFERENCING NEW TABLE AS changed_node
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_fleet_version_if_changed();
+    """,
+)
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis;"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb;"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS ltree;"))
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+
+    async with engine.begin() as conn:
+        await conn.execute(text("""
             SELECT create_hypertable('node_status_log', by_range('timestamp'), if_not_exists => TRUE);
         """))
 
-def get_db():
-    db = SessionLocal()
-    try:
+    await init_telemetry_rollups()
+
+async def init_telemetry_rollups():
+    """Creates the continuous aggregates of node_status_log and its compression and retention policies."""
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        for view, bucket, start_offset, schedule in TELEMETRY_ROLLUPS:
+            await conn.execute(text(f"""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+                WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+                SELECT time_bucket(INTERVAL '{bucket}', timestamp) AS bucket,
+                       node_id,
+                       avg(cpu_temperature_c) AS avg_cpu_temperature_c,
+                       max(cpu_temperature_c) AS max_cpu_temperature_c,
+                       avg(connected_users) AS avg_connected_users,
+                       max(connected_users) AS max_connected_users,
+                       avg(current_throughput_mbps) AS avg_throughput_mbps,
+                       max(current_throughput_mbps) AS max_throughput_mbps,
+                       count(*) AS samples
+                FROM node_status_log
+                GROUP BY bucket, node_id
+                WITH NO DATA;
+            """))
+            await conn.execute(text(f"""
+                SELECT add_continuous_aggregate_policy('{view}',
+                    start_offset => INTERVAL '{start_offset}',
+                    end_offset => INTERVAL '{bucket}',
+                    schedule_interval => INTERVAL '{schedule}',
+                    if_not_exists => TRUE);
+            """))
+
+        compression_enabled = await conn.scalar(text("""
+            SELECT compression_enabled FROM timescaledb_information.hypertables
+            WHERE hypertable_name = 'node_status_log';
+        """))
+        if not compression_enabled:
+            await conn.execute(text("""
+                ALTER TABLE node_status_log SET (
+                    timescaledb.compress,
+                    timescaledb.compress_segmentby = 'node_id',
+                    timescaledb.compress_orderby = 'timestamp DESC'
+                );
+            """))
+        await conn.execute(text(f"""
+            SELECT add_compression_policy('node_status_log', INTERVAL '{TELEMETRY_COMPRESS_AFTER_DAYS} days', if_not_exists => TRUE);
+        """))
+        await conn.execute(text(f"""
+            SELECT add_retention_policy('node_status_log', INTERVAL '{TELEMETRY_RAW_RETENTION_DAYS} days', if_not_exists => TRUE);
+        """))
+        await conn.execute(text(f"""
+            SELECT add_retention_policy('node_status_1m', INTERVAL '{TELEMETRY_1M_RETENTION_DAYS} days', if_not_exists => TRUE);
+        """))
+
+async def get_db():
+    async with SessionLocal() as db:
+        # Checked out up front, so waiting for a free pooled connection is measured on its own
+        start = time.perf_counter()
+        await db.connection()
+        db_acquire_seconds.observe(time.perf_counter() - start)
         yield db
-    finally:
-        db.close()
\ No newline at end of file
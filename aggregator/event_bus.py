@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+import asyncpg
+import orjson
+from sqlalchemy.engine import make_url
+from codec import dumps
+from database import DATABASE_URL
+from fleet_state import fleet_state
+from node_registry import node_registry, NodeInfo
+from alarm_engine import alarm_engine
+from anomaly_detector import anomaly_detector
+from ws_manager import manager
+
+logger = logging.getLogger("event_bus")
+
+# "local" for a single worker, "postgres" to share events between workers and replicas via LISTEN/NOTIFY
+EVENT_BUS = os.getenv("EVENT_BUS", "local")
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "aggregator_events")
+EVENT_BUS_FLUSH_MS = int(os.getenv("EVENT_BUS_FLUSH_MS", "50"))
+EVENT_BUS_QUEUE_SIZE = int(os.getenv("EVENT_BUS_QUEUE_SIZE", "100000"))
+# asyncpg takes a plain postgresql:// DSN
+EVENT_BUS_DSN = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+# How often an instance that is not the alarm owner tries to take over
+EVENT_BUS_CLAIM_INTERVAL_MS = int(os.getenv("EVENT_BUS_CLAIM_INTERVAL_MS", "1000"))
+
+class RemoteReading(NamedTuple):
+    is_online: bool
+    cpu_temperature_c: float
+    connected_users: int
+    current_throughput_mbps: float
+
+class LocalEventBus:
+    """
+    Single-worker mode: events go straight to this process's WebSocket clients. Callers
+    update the local registry and fleet state themselves; the bus only carries those
+    changes to other instances.
+    """
+    # Whether other instances register nodes this one may not have heard of yet
+    shared = False
+
+    def __init__(self):
+        # Whether this instance runs the alarm engine and anomaly detector
+        self.alarm_owner = False
+
+    async def start(self, on_alarm_owner: Callable[[], Awaitable[None]],
+                    on_reading: Callable[[str, RemoteReading, Optional[datetime]], None]):
+        """`on_alarm_owner` loads alarm state before this instance starts evaluating readings."""
+        await on_alarm_owner()
+        self.alarm_owner = True
+
+    async def stop(self):
+        pass
+
+    def publish_log(self, node_id: str, log: Dict[str, Any]):
+        manager.publish_log(node_id, log)
+
+    def publish_event(self, node_id: str, data: Dict[str, Any]):
+        manager.publish_event(node_id, data)
+
+    def publish_nodes(self, nodes: Iterable[NodeInfo]):
+        pass
+
+    def publish_deleting(self, node_id: str):
+        pass
+
+    def publish_forget(self, node_id: str):
+        pass
+
+    def publish_reset(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", "alarm_owner": self.alarm_owner}
+
+class PostgresEventBus(LocalEventBus):
+    """
+    Shares events between aggregator processes through Postgres LISTEN/NOTIFY. Events are
+    delivered to local clients at once and queued for the others; every EVENT_BUS_FLUSH_MS
+    the queue is packed into as few NOTIFY payloads as fit and sent in one round trip.
+    Each instance ignores its own notifications. Delivery to other instances is best effort:
+    events queued while the connection is down are dropped and counted.
+
+    Alarms are evaluated by one instance, the alarm owner, which holds a session advisory lock
+    on its listening connection. It runs its own readings and those it receives from the other
+    instances through the alarm engine and anomaly detector, so debounce, hysteresis and
+    escalation see every reading of a node whichever worker took it. The other instances try
+    to take the lock every EVENT_BUS_CLAIM_INTERVAL_MS; when the owner's connection is lost
+    the lock is released and the next one loads the open alarms and takes over.
+    """
+    shared = True
+
+    def __init__(self, dsn: str = EVENT_BUS_DSN, channel: str = EVENT_BUS_CHANNEL,
+                 flush_ms: int = EVENT_BUS_FLUSH_MS, max_queue: int = EVENT_BUS_QUEUE_SIZE,
+                 claim_interval_ms: int = EVENT_BUS_CLAIM_INTERVAL_MS):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.flush_interval = flush_ms / 1000.0
+        self.claim_interval = claim_interval_ms / 1000.0
+        self._claimed_at = 0.0
+        self._on_alarm_owner: Optional[Callable[[], Awaitable[None]]] = None
+        self._on_reading: Optional[Callable[[str, RemoteReading, Optional[datetime]], None]] = None
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.prefix = '{"src":"' + self.instance_id + '","items":['
+        self._pending: deque = deque(maxlen=max_queue)
+        self._connection: Optional[asyncpg.Connection] = None
+        self._connected = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+        self.published_total = 0
+        self.notifications_total = 0
+        self.received_total = 0
+        self.dropped_total = 0
+        self.malformed_total = 0
+        self.reconnects_total = 0
+
+    async def start(self, on_alarm_owner: Callable[[], Awaitable[None]],
+                    on_reading: Callable[[str, RemoteReading, Optional[datetime]], None]):
+        """
+        `on_alarm_owner` loads alarm state when this instance becomes the alarm owner, `on_reading`
+        evaluates a reading received from another instance while it is.
+        """
+        self._on_alarm_owner = on_alarm_owner
+        self._on_reading = on_reading
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._flusher())]
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning("Event bus not connected yet, events stay local until it is")
+
+    async def stop(self):
+        listener, flusher = self._tasks
+        flusher.cancel()
+        await self._flush()
+        listener.cancel()
+        if self._connection is not None:
+            await self._connection.close()
+
+    def _queue(self, item: list):
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped_total += 1
+        self._pending.append(dumps(item))
+        self.published_total += 1
+
+    def publish_log(self, node_id: str, log: Dict[str, Any]):
+        manager.publish_log(node_id, log)
+        self._queue(["log", node_id, log])
+
+    def publish_event(self, node_id: str, data: Dict[str, Any]):
+        manager.publish_event(node_id, data)
+        self._queue(["event", node_id, data])
+
+    def publish_nodes(self, nodes: Iterable[NodeInfo]):
+        for node in nodes:
+            self._queue(["node", node.node_id, node.fields()])
+
+    def publish_deleting(self, node_id: str):
+        self._queue(["deleting", node_id, None])
+
+    def publish_forget(self, node_id: str):
+        self._queue(["forget", node_id, None])
+
+    def publish_reset(self):
+        self._queue(["reset", None, None])
+
+    def _payloads(self, items: List[str]) -> List[str]:
+        """
+        Packs encoded items into as few payloads under MAX_PAYLOAD_BYTES as possible. The NOTIFY
+        limit is in bytes and orjson writes non-ASCII as is (e.g. "°C" in alarm descriptions),
+        so sizes are taken from the UTF-8 encoding.
+        """
+        payloads = []
+        chunk = []
+        overhead = len(self.prefix.encode()) + 2
+        size = overhead
+        for item in items:
+            length = len(item.encode())
+            if length + overhead > MAX_PAYLOAD_BYTES:
+                self.dropped_total += 1
+                logger.warning(f"Dropping event of {length} bytes, too large for NOTIFY")
+                continue
+            if chunk and size + length + 1 > MAX_PAYLOAD_BYTES:
+                payloads.append(self.prefix + ",".join(chunk) + "]}")
+                chunk = []
+                size = overhead
+            chunk.append(item)
+            size += length + 1
+        if chunk:
+            payloads.append(self.prefix + ",".join(chunk) + "]}")
+        return payloads
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        items = list(self._pending)
+        self._pending.clear()
+        connection = self._connection
+        if connection is None or connection.is_closed():
+            self.dropped_total += len(items)
+            return
+        payloads = self._payloads(items)
+        try:
+            await connection.executemany("SELECT pg_notify($1, $2)", [(self.channel, p) for p in payloads])
+            self.notifications_total += len(payloads)
+        except (asyncpg.PostgresError, OSError, asyncpg.InterfaceError) as e:
+            logger.warning(f"Event bus notify failed: {e!r}")
+            self.dropped_total += len(items)
+
+    async def _flusher(self):
+        # Claims run here too, as the flushes and claims share the listening connection
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+            if not self.alarm_owner and loop.time() - self._claimed_at >= self.claim_interval:
+                await self._claim_alarms()
+
+    async def _claim_alarms(self):
+        """Becomes the alarm owner if no other instance holds the alarm lock."""
+        self._claimed_at = asyncio.get_running_loop().time()
+        connection = self._connection
+        if connection is None or connection.is_closed():
+            return
+        try:
+            if not await connection.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", self.channel + ":alarms"):
+                return
+        except (asyncpg.PostgresError, OSError, asyncpg.InterfaceError) as e:
+            logger.warning(f"Event bus could not claim the alarm lock: {e!r}")
+            return
+        # Alarm state of a previous term is stale; it is reloaded from the open alarms
+        alarm_engine.clear()
+        anomaly_detector.clear()
+        try:
+            await self._on_alarm_owner()
+        except Exception as e:
+            logger.error(f"Event bus could not load alarm state, releasing the alarm lock: {e!r}")
+            try:
+                await connection.execute("SELECT pg_advisory_unlock(hashtext($1))", self.channel + ":alarms")
+            except (asyncpg.PostgresError, OSError, asyncpg.InterfaceError):
+                pass
+            return
+        if connection is self._connection:
+            self.alarm_owner = True
+            logger.info(f"Event bus {self.instance_id} is the alarm owner")
+
+    def _release_alarms(self):
+        """The lock went with the connection, so another instance may take over at any moment."""
+        if self.alarm_owner:
+            self.alarm_owner = False
+            alarm_engine.clear()
+            anomaly_detector.clear()
+            logger.warning(f"Event bus {self.instance_id} lost the alarm lock")
+
+    async def _listen(self):
+        """Keeps one dedicated connection listening, reconnecting after failures."""
+        while True:
+            closed = asyncio.Event()
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._on_notification)
+                self._connection = connection
+                self._connected.set()
+                logger.info(f"Event bus {self.instance_id} listening on {self.channel}")
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event bus connection failed: {e!r}")
+            self._connection = None
+            self._connected.clear()
+            self._release_alarms()
+            self.reconnects_total += 1
+            await asyncio.sleep(1.0)
+
+    def _on_notification(self, connection, pid, channel, payload: str):
+        # Anything may NOTIFY on the channel; a payload that is not ours must not break the listener
+        try:
+            message = orjson.loads(payload)
+            source, items = message["src"], list(message["items"])
+        except (orjson.JSONDecodeError, ValueError, TypeError, KeyError) as e:
+            self.malformed_total += 1
+            logger.warning(f"Event bus dropped a malformed notification: {e!r}")
+            return
+        if source == self.instance_id:
+            return
+        for item in items:
+            self.received_total += 1
+            try:
+                kind, node_id, data = item
+                self._apply(kind, node_id, data)
+            except Exception as e:
+                logger.warning(f"Event bus could not apply event {str(item)[:200]}: {e!r}")
+
+    def _apply(self, kind: str, node_id: Optional[str], data):
+        if kind == "log":
+            if node_registry.get(node_id) is not None:
+                timestamp = data.get("timestamp")
+                timestamp = datetime.fromisoformat(timestamp) if timestamp else None
+                reading = RemoteReading(
+                    data["is_online"], data["cpu_temperature_c"], data["connected_users"], data["current_throughput_mbps"]
+                )
+                fleet_state.update(node_id, reading, timestamp)
+                if self.alarm_owner:
+                    self._on_reading(node_id, reading, timestamp)
+            manager.publish_log(node_id, data)
+        elif kind == "event":
+            manager.publish_event(node_id, data)
+        elif kind == "node":
+            node_registry.add(NodeInfo(node_id, *data))
+        elif kind == "deleting":
+            node_registry.mark_deleting(node_id)
+            fleet_state.forget(node_id)
+        elif kind == "forget":
+            node_registry.remove(node_id)
+            alarm_engine.forget(node_id)
+            anomaly_detector.forget(node_id)
+            fleet_state.forget(node_id)
+        elif kind == "reset":
+            node_registry.clear()
+            alarm_engine.clear()
+            anomaly_detector.clear()
+            fleet_state.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "postgres",
+            "instance_id": self.instance_id,
+            "channel": self.channel,
+            "connected": self._connection is not None,
+            "alarm_owner": self.alarm_owner,
+            "pending": len(self._pending),
+            "published_total": self.published_total,
+            "notifications_total": self.notifications_total,
+            "received_total": self.received_total,
+            "dropped_total": self.dropped_total,
+            "malformed_total": self.malformed_total,
+            "reconnects_total": self.reconnects_total,
+        }
+
+event_bus = PostgresEventBus() if EVENT_BUS == "postgres" else LocalEventBus()
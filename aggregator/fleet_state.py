@@ -0,0 +1,127 @@
+import os
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, func, true
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+
+# Readings older than this are not loaded into the cache at startup
+FLEET_STATE_LOAD_WINDOW_HOURS = int(os.getenv("FLEET_STATE_LOAD_WINDOW_HOURS", "24"))
+
+class FleetState:
+    """
+    Latest reading of every node, kept in parallel typed arrays indexed by a slot per node
+    (about 30 bytes per node instead of a dict of objects). Updated on ingest, so the
+    current state of the fleet never has to be read back from the hypertable.
+    """
+
+    def __init__(self):
+        self.slots: Dict[str, int] = {}
+        self.node_ids: List[Optional[str]] = []
+        self.free: List[int] = []
+        self.timestamps = array("d")
+        self.is_online = array("b")
+        self.cpu_temperature_c = array("d")
+        self.connected_users = array("q")
+        self.current_throughput_mbps = array("d")
+        # Bumped on every change, lets callers cache encoded snapshots
+        self.version = 0
+
+    def _slot(self, node_id: str) -> int:
+        slot = self.slots.get(node_id)
+        if slot is not None:
+            return slot
+        if self.free:
+            slot = self.free.pop()
+            self.node_ids[slot] = node_id
+        else:
+            slot = len(self.node_ids)
+            self.node_ids.append(node_id)
+            self.timestamps.append(0.0)
+            self.is_online.append(0)
+            self.cpu_temperature_c.append(0.0)
+            self.connected_users.append(0)
+            self.current_throughput_mbps.append(0.0)
+        self.slots[node_id] = slot
+        return slot
+
+    def update(self, node_id: str, reading, timestamp: Optional[datetime] = None):
+        """Stores a reading unless the node already has a newer one (batches may carry old timestamps)."""
+        ts = timestamp.timestamp() if timestamp is not None else time.time()
+        slot = self._slot(node_id)
+        if ts < self.timestamps[slot]:
+            return
+        self.timestamps[slot] = ts
+        self.is_online[slot] = reading.is_online
+        self.cpu_temperature_c[slot] = reading.cpu_temperature_c
+        self.connected_users[slot] = reading.connected_users
+        self.current_throughput_mbps[slot] = reading.current_throughput_mbps
+        self.version += 1
+
+    def forget(self, node_id: str):
+        slot = self.slots.pop(node_id, None)
+        if slot is None:
+            return
+        self.node_ids[slot] = None
+        self.timestamps[slot] = 0.0
+        self.free.append(slot)
+        self.version += 1
+
+    def clear(self):
+        version = self.version
+        self.__init__()
+        # Keeps increasing so a snapshot cached before the reset is never served again
+        self.version = version + 1
+
+    def __len__(self):
+        return len(self.slots)
+
+    async def load(self, db: AsyncSession, window_hours: int = FLEET_STATE_LOAD_WINDOW_HOURS):
+        """Rebuilds the cache with one query: the latest reading of every node within the window."""
+        node = models.NetworkNode
+        log = models.NodeStatusLog
+        latest = (
+            select(log.timestamp, log.is_online, log.cpu_temperature_c, log.connected_users, log.current_throughput_mbps)
+            .where(log.node_id == node.node_id, log.timestamp > func.now() - timedelta(hours=window_hours))
+            .order_by(log.timestamp.desc())
+            .limit(1)
+            .lateral("latest")
+        )
+        result = await db.execute(select(node.node_id, latest).select_from(node).join(latest, true()))
+
+        self.clear()
+        for row in result:
+            self.update(str(row.node_id), row, row.timestamp)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Returns the latest reading of every node in the same shape as log_delta entries."""
+        return [
+            {
+                "node_id": node_id,
+                "log": {
+                    "is_online": bool(self.is_online[slot]),
+                    "cpu_temperature_c": self.cpu_temperature_c[slot],
+                    "connected_users": self.connected_users[slot],
+                    "current_throughput_mbps": self.current_throughput_mbps[slot],
+                    "timestamp": datetime.fromtimestamp(self.timestamps[slot], timezone.utc).isoformat()
+                }
+            }
+            for node_id, slot in self.slots.items()
+        ]
+
+    def columnar(self) -> Dict[str, list]:
+        """Returns one list per field, timestamps as epoch seconds. Much smaller than snapshot() on the wire."""
+        live = list(self.slots.items())
+        slots = [slot for _, slot in live]
+        return {
+            "node_id": [node_id for node_id, _ in live],
+            "timestamp": [self.timestamps[s] for s in slots],
+            "is_online": [bool(self.is_online[s]) for s in slots],
+            "cpu_temperature_c": [self.cpu_temperature_c[s] for s in slots],
+            "connected_users": [self.connected_users[s] for s in slots],
+            "current_throughput_mbps": [self.current_throughput_mbps[s] for s in slots],
+        }
+
+fleet_state = FleetState()
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List
+from database import SessionLocal
+import schemas
+from crud import logs as crud_logs
+from crud import alarms as crud_alarms
+from alarm_engine import AlarmTransition
+from recording import recorder
+
+logger = logging.getLogger("ingest_buffer")
+
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "50000"))
+INGEST_FLUSH_ROWS = int(os.getenv("INGEST_FLUSH_ROWS", "1000"))
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "200"))
+# A failed batch write is retried this many times, backing off from INGEST_RETRY_BACKOFF_MS
+INGEST_FLUSH_RETRIES = int(os.getenv("INGEST_FLUSH_RETRIES", "3"))
+INGEST_RETRY_BACKOFF_MS = int(os.getenv("INGEST_RETRY_BACKOFF_MS", "500"))
+
+class IngestBufferFull(Exception):
+    pass
+
+class IngestBuffer:
+    """
+    Bounded in-process queue of telemetry readings. Request handlers only append to it;
+    a background task writes the readings to node_status_log in bulk whenever
+    `flush_rows` readings are pending or every `flush_interval_ms` milliseconds.
+    Alarm state transitions are queued alongside and written after the readings.
+
+    Delivery is at most once: a batch whose write still fails after `flush_retries`
+    retries with exponential backoff is dropped and counted in write_errors_total
+    (aggregator_ingest_lost_total). While a batch is retried, new readings queue up
+    until the buffer is full and the log endpoint answers 429.
+    """
+
+    def __init__(self, max_size: int, flush_rows: int, flush_interval_ms: int,
+                 flush_retries: int = INGEST_FLUSH_RETRIES, retry_backoff_ms: int = INGEST_RETRY_BACKOFF_MS):
+        self.max_size = max_size
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_retries = flush_retries
+        self.retry_backoff = retry_backoff_ms / 1000.0
+
+        self._pending = deque()
+        self._alarm_transitions: List[AlarmTransition] = []
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+        self.enqueued_total = 0
+        self.rejected_full_total = 0
+        self.written_total = 0
+        self.write_rejected_total = 0
+        self.write_errors_total = 0
+        self.write_retries_total = 0
+        self.alarm_transitions_total = 0
+        self.flush_count = 0
+        self.flush_latency_total = 0.0
+        self.flush_latency_max = 0.0
+        self.last_flush_latency = 0.0
+
+    def put(self, reading: schemas.NodeStatusLogBatchItem):
+        """Queues a reading without blocking. Raises IngestBufferFull when the buffer is at capacity."""
+        if self._closing or len(self._pending) >= self.max_size:
+            self.rejected_full_total += 1
+            raise IngestBufferFull()
+
+        self._pending.append(reading)
+        self.enqueued_total += 1
+        if len(self._pending) >= self.flush_rows:
+            self._wakeup.set()
+
+    def put_alarm_transitions(self, transitions: List[AlarmTransition]):
+        """Queues raise/clear transitions for the active_alarm table. Transitions are rare, so they are not bounded."""
+        self._alarm_transitions.extend(transitions)
+
+    async def start(self):
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops accepting readings and flushes everything still pending."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush_pending()
+
+        await self._flush_pending()
+
+    async def _flush_pending(self):
+        while self._pending:
+            size = min(self.flush_rows, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(size)]
+            await self._flush(batch)
+
+        if self._alarm_transitions:
+            transitions, self._alarm_transitions = self._alarm_transitions, []
+            try:
+                async with SessionLocal() as db:
+                    await crud_alarms.apply_alarm_transitions(db=db, transitions=transitions)
+                self.alarm_transitions_total += len(transitions)
+            except Exception as e:
+                self.write_errors_total += len(transitions)
+                logger.error(f"Failed to write {len(transitions)} alarm transitions: {e}")
+
+    async def _flush(self, batch: List[schemas.NodeStatusLogBatchItem]):
+        start = time.perf_counter()
+        outcomes = None
+        try:
+            for attempt in range(self.flush_retries + 1):
+                try:
+                    # A retry after a write that did commit finds its rows as duplicates
+                    outcomes = await self._write(batch)
+                    break
+                except Exception as e:
+                    if attempt == self.flush_retries:
+                        self.write_errors_total += len(batch)
+                        logger.error(f"Lost {len(batch)} readings after {attempt + 1} failed writes: {e}")
+                    else:
+                        self.write_retries_total += 1
+                        logger.warning(f"Failed to flush {len(batch)} readings, retry {attempt + 1}: {e}")
+                        await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+        finally:
+            latency = time.perf_counter() - start
+            self.flush_count += 1
+            self.last_flush_latency = latency
+            self.flush_latency_total += latency
+            self.flush_latency_max = max(self.flush_latency_max, latency)
+        if outcomes is None:
+            return
+
+        # Recorded once written, so readings the database rejects stay out of the recording
+        for reading, (accepted, timestamp, _) in zip(batch, outcomes):
+            if accepted:
+                recorder.record_reading(reading.node_id, reading, timestamp)
+
+        rejected = sum(1 for accepted, _, _ in outcomes if not accepted)
+        self.written_total += len(outcomes) - rejected
+        self.write_rejected_total += rejected
+        if rejected:
+            logger.warning(f"{rejected} of {len(batch)} buffered readings were rejected on write")
+
+    @staticmethod
+    async def _write(batch: List[schemas.NodeStatusLogBatchItem]):
+        async with SessionLocal() as db:
+            return await crud_logs.create_node_logs_bulk(db=db, readings=batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._pending),
+            "queue_capacity": self.max_size,
+            "enqueued_total": self.enqueued_total,
+            "rejected_full_total": self.rejected_full_total,
+            "written_total": self.written_total,
+            "write_rejected_total": self.write_rejected_total,
+            "write_errors_total": self.write_errors_total,
+            "write_retries_total": self.write_retries_total,
+            "alarm_transitions_pending": len(self._alarm_transitions),
+            "alarm_transitions_total": self.alarm_transitions_total,
+            "flush_count": self.flush_count,
+            "flush_latency_ms_last": round(self.last_flush_latency * 1000, 3),
+            "flush_latency_ms_avg": round(self.flush_latency_total / self.flush_count * 1000, 3) if self.flush_count else 0.0,
+            "flush_latency_ms_max": round(self.flush_latency_max * 1000, 3),
+        }
+
+ingest_buffer = IngestBuffer(
+    max_size=INGEST_QUEUE_SIZE,
+    flush_rows=INGEST_FLUSH_ROWS,
+    flush_interval_ms=INGEST_FLUSH_INTERVAL_MS
+)
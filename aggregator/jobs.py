@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from database import SessionLocal
+from crud import jobs as crud_jobs
+
+logger = logging.getLogger("jobs")
+
+# Finished jobs kept for GET /api/jobs/{job_id}
+JOB_HISTORY = 100
+# How often the worker running a job saves its progress
+JOB_PROGRESS_INTERVAL_MS = int(os.getenv("JOB_PROGRESS_INTERVAL_MS", "1000"))
+# A running job whose progress was not saved for this long is reported as failed
+JOB_STALE_SEC = int(os.getenv("JOB_STALE_SEC", "30"))
+
+class Job:
+    """A long running maintenance task. The task itself advances `done` towards `total`."""
+
+    def __init__(self, kind: str, target: Optional[str] = None):
+        self.job_id = uuid.uuid4()
+        self.kind = kind
+        self.target = target
+        self.status = "running"
+        self.step = None
+        self.done = 0
+        self.total = 0
+        self.detail: Dict[str, Any] = {}
+        self.error = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.updated_at = self.started_at
+
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        job = cls.__new__(cls)
+        for name in ("job_id", "kind", "target", "status", "step", "done", "total", "detail", "error",
+                     "started_at", "finished_at", "updated_at"):
+            setattr(job, name, getattr(row, name))
+        return job
+
+    def values(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id, "kind": self.kind, "target": self.target, "status": self.status,
+            "step": self.step, "done": self.done, "total": self.total, "detail": self.detail,
+            "error": self.error, "started_at": self.started_at, "finished_at": self.finished_at,
+            "updated_at": self.updated_at,
+        }
+
+    def advance(self, step: str, done: Optional[int] = None, total: Optional[int] = None):
+        self.step = step
+        if total is not None:
+            self.total = total
+        if done is not None:
+            self.done = done
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done":
+            return 1.0
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+class JobManager:
+    """
+    Runs background jobs in the worker that starts them and keeps their state in the
+    maintenance_job table, so any worker can report on any job. The running worker saves
+    the progress every JOB_PROGRESS_INTERVAL_MS; a job still marked running that has not
+    been saved for JOB_STALE_SEC lost its worker and is reported as failed.
+    """
+
+    def __init__(self, history: int = JOB_HISTORY, progress_interval_ms: int = JOB_PROGRESS_INTERVAL_MS,
+                 stale_sec: int = JOB_STALE_SEC):
+        self.history = history
+        self.progress_interval = progress_interval_ms / 1000.0
+        self.stale_after = timedelta(seconds=stale_sec)
+        # Running tasks of this worker, referenced so they are not garbage collected
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def start(self, kind: str, run: Callable[[Job], Awaitable[Any]], target: Optional[str] = None) -> Job:
+        job = Job(kind, target)
+        async with SessionLocal() as db:
+            await crud_jobs.insert_job(db, job.values(), self.history)
+        task = asyncio.create_task(self._run(job, run))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[Any]]):
+        saver = asyncio.create_task(self._save_progress(job))
+        try:
+            result = await run(job)
+            if isinstance(result, dict):
+                job.detail.update(result)
+            job.status = "done"
+        except Exception as e:
+            logger.exception(f"Job {job.kind} {job.job_id} failed")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            saver.cancel()
+            job.finished_at = datetime.now(timezone.utc)
+            await self._save(job)
+
+    async def _save_progress(self, job: Job):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._save(job)
+
+    async def _save(self, job: Job):
+        job.updated_at = datetime.now(timezone.utc)
+        try:
+            async with SessionLocal() as db:
+                await crud_jobs.save_job(db, job.job_id, job.values())
+        except Exception as e:
+            logger.warning(f"Could not save job {job.kind} {job.job_id}: {e!r}")
+
+    def _load(self, row) -> Optional[Job]:
+        if row is None:
+            return None
+        job = Job.from_row(row)
+        if job.status == "running" and job.updated_at < datetime.now(timezone.utc) - self.stale_after:
+            job.status = "failed"
+            job.error = "The worker running the job stopped"
+        return job
+
+    async def get(self, job_id: uuid.UUID) -> Optional[Job]:
+        async with SessionLocal() as db:
+            return self._load(await crud_jobs.get_job(db, job_id))
+
+    async def running(self, kind: str, target: Optional[str] = None) -> Optional[Job]:
+        """Returns the job of the kind and target that is running on any worker."""
+        async with SessionLocal() as db:
+            job = self._load(await crud_jobs.get_running_job(db, kind, target))
+        return job if job is not None and job.status == "running" else None
+
+job_manager = JobManager()
@@ -1,18 +1,55 @@
 import os
+from datetime import datetime, timezone
+from typing import Literal
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from pydantic import ValidationError
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from database import init_db
-from routers import nodes, logs
+from database import init_db, SessionLocal, engine, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from routers import nodes, logs, history, topology, jobs, components
 from ws_manager import manager
+from ingest_buffer import ingest_buffer
+from node_registry import node_registry
+from alarm_engine import alarm_engine
+from anomaly_detector import anomaly_detector
+from fleet_state import fleet_state
+from recording import recorder
+from event_bus import event_bus
+from crud import alarms as crud_alarms
+from subscriptions import Subscription
+import schemas
+from codec import FastJSONResponse
+from metrics import registry, MetricsMiddleware
+
+async def restore_alarms():
+    """Loads the open alarms into the alarm engine when this instance becomes the alarm owner."""
+    async with SessionLocal() as db:
+        superseded = alarm_engine.restore(await crud_alarms.get_open_alarms(db), datetime.now(timezone.utc))
+        if superseded:
+            await crud_alarms.apply_alarm_transitions(db=db, transitions=superseded)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Database init")
-    init_db()
-    print("Database ready")
+    await init_db()
+    async with SessionLocal() as db:
+        await node_registry.load(db)
+        await fleet_state.load(db)
+    print(f"Database ready, {len(node_registry)} nodes registered, {len(fleet_state)} with a recent reading")
+    await ingest_buffer.start()
+    await event_bus.start(restore_alarms, logs.evaluate_remote_reading)
+    await anomaly_detector.start(event_bus.publish_event)
+    recorder.start()
+    if recorder.enabled:
+        print(f"Recording ingest traffic to {recorder.path}")
     yield
+    print("Flushing ingest buffer")
+    await ingest_buffer.stop()
+    await anomaly_detector.stop()
+    await event_bus.stop()
+    recorder.stop()
     print("Closing connections")
 
 app = FastAPI(
@@ -30,18 +67,95 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+# Read from the components on scrape, nothing is updated on the request path
+registry.gauge_callback("aggregator_db_pool_checked_out", "Pooled connections in use", engine.pool.checkedout)
+registry.gauge_callback("aggregator_db_pool_checked_in", "Idle pooled connections", engine.pool.checkedin)
+registry.gauge_callback("aggregator_db_pool_max", "Largest number of connections the pool opens", lambda: DB_POOL_SIZE + DB_MAX_OVERFLOW)
+registry.gauge_callback("aggregator_ws_connections", "Connected WebSocket clients", lambda: len(manager.active_connections))
+registry.gauge_callback("aggregator_ws_channels", "Distinct WebSocket tick rate and filter combinations", lambda: len(manager.channels))
+registry.counter_callback("aggregator_ws_frames_dropped_total", "Frames dropped from full client queues", lambda: manager.dropped_total)
+registry.counter_callback("aggregator_ws_clients_evicted_total", "Clients disconnected after a failed send", lambda: manager.evicted_total)
+registry.gauge_callback("aggregator_ingest_queue_depth", "Readings waiting in the write-behind buffer", lambda: ingest_buffer.stats()["queue_depth"])
+registry.counter_callback("aggregator_ingest_rejected_full_total", "Readings refused with 429 because the buffer was full", lambda: ingest_buffer.rejected_full_total)
+registry.counter_callback("aggregator_ingest_written_total", "Readings written by the write-behind buffer", lambda: ingest_buffer.written_total)
+registry.counter_callback("aggregator_ingest_lost_total", "Buffered readings dropped after every write retry failed", lambda: ingest_buffer.write_errors_total)
+registry.counter_callback("aggregator_ingest_write_retries_total", "Batch writes of the buffer that were retried", lambda: ingest_buffer.write_retries_total)
+registry.counter_callback("aggregator_predicted_overheat_total", "predicted_overheat events emitted by the anomaly detector", lambda: anomaly_detector.predictions_total)
+registry.gauge_callback("aggregator_nodes_registered", "Nodes in the in-memory registry", lambda: len(node_registry))
+
 app.include_router(nodes.router)
 app.include_router(logs.router)
+app.include_router(logs.batch_router)
+app.include_router(history.router)
+app.include_router(topology.router)
+app.include_router(jobs.router)
+app.include_router(components.router)
 
 @app.websocket("/ws/events")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, tick_ms: int = 0):
+    """
+    Streams events. `tick_ms` > 0 coalesces readings into one log_delta frame per tick.
+    Clients narrow the stream by sending a filter, e.g.
+    {"action": "subscribe", "topology_prefix": "PL.REGION_3", "node_types": ["gNodeB"], "bbox": [14.0, 49.0, 24.2, 54.9]}
+    or {"action": "unsubscribe"} to receive the whole fleet again.
+    """
+    await manager.connect(websocket, tick_ms=tick_ms)
     try:
         while True:
             data = await websocket.receive_text()
+            try:
+                subscription = schemas.EventSubscription.model_validate_json(data)
+            except (ValueError, ValidationError) as e:
+                manager.send_personal_json(websocket, {"type": "error", "message": f"Invalid subscription: {e}"})
+                continue
+            manager.subscribe(websocket, Subscription.from_schema(subscription))
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
+@app.get("/api/ingest/stats")
+def ingest_stats():
+    """Returns ingest queue depth and flush latency of the write-behind buffer."""
+    return ingest_buffer.stats()
+
+@app.get("/api/recording/stats")
+def recording_stats():
+    """Returns whether ingest traffic is being recorded (INGEST_RECORD_PATH) and how much was captured."""
+    return recorder.stats()
+
+@app.get("/api/fleet/snapshot")
+def fleet_snapshot(format: Literal["rows", "columnar"] = "rows"):
+    """
+    Returns the latest reading of every node from memory. format=columnar returns one
+    array per field with epoch timestamps, which is several times smaller.
+    """
+    if format == "columnar":
+        return FastJSONResponse({"nodes": len(fleet_state), "columns": fleet_state.columnar()})
+    return FastJSONResponse({"nodes": len(fleet_state), "readings": fleet_state.snapshot()})
+
+@app.get("/api/events/stats")
+def event_bus_stats():
+    """Returns the event bus backend and, for postgres, notification counts of this instance."""
+    return event_bus.stats()
+
+@app.get("/api/anomaly/stats")
+def anomaly_stats():
+    """Returns the nodes tracked by the overheat predictor, predictions made and evaluation cost per reading."""
+    return anomaly_detector.stats()
+
+@app.get("/api/ws/stats")
+def websocket_stats():
+    """Returns WebSocket connection count, outbound queue depth and dropped frames."""
+    return manager.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text format: request, database and WebSocket latency histograms, pool and ingest gauges."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 os.makedirs("static", exist_ok=True)
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
 
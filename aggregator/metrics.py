@@ -0,0 +1,211 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Seconds; covers sub-millisecond in-process work up to slow database calls
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic counter, optionally split by labels. Metrics are only updated from the event
+    loop thread, so a plain integer increment is safe and needs no lock.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, labels: Tuple[str, ...] = ()):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in self.values.items()]
+
+class HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf, allocated once
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram:
+    """Fixed-bucket histogram. Each label combination gets its own preallocated series on first use."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], HistogramSeries] = {}
+        if not labelnames:
+            self.series[()] = HistogramSeries(self.bounds)
+
+    def labels(self, *values: str) -> HistogramSeries:
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = HistogramSeries(self.bounds)
+        return series
+
+    def observe(self, value: float):
+        self.series[()].observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), series.counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series.sum)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series.count}")
+        return lines
+
+class CallbackMetric:
+    """
+    Gauge or counter read from the owning component when /metrics is scraped, so the hot
+    path pays nothing for it. The callback returns a value or a {label values: value} dict.
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable, kind: str = "gauge",
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in value.items()]
+
+class RateMeter:
+    """Events per second over the last `window` complete seconds, counted in a ring of per-second slots."""
+
+    def __init__(self, window: int = 10):
+        self.window = window
+        self.slots = [0] * (window + 1)
+        self.seconds = [0] * (window + 1)
+
+    def mark(self, count: int = 1):
+        second = int(time.monotonic())
+        i = second % len(self.slots)
+        if self.seconds[i] != second:
+            self.seconds[i] = second
+            self.slots[i] = 0
+        self.slots[i] += count
+
+    def rate(self) -> float:
+        now = int(time.monotonic())
+        total = sum(count for second, count in zip(self.seconds, self.slots) if now - self.window <= second < now)
+        return total / self.window
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, callback: Callable, labelnames: Sequence[str] = ()):
+        return self.register(CallbackMetric(name, documentation, callback, "gauge", labelnames))
+
+    def counter_callback(self, name: str, documentation: str, callback: Callable, labelnames: Sequence[str] = ()):
+        return self.register(CallbackMetric(name, documentation, callback, "counter", labelnames))
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "aggregator_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+db_acquire_seconds = registry.histogram(
+    "aggregator_db_session_acquire_seconds", "Time to check a connection out of the pool for a request session")
+db_commit_seconds = registry.histogram(
+    "aggregator_db_commit_seconds", "Duration of session commits")
+ws_publish_seconds = registry.histogram(
+    "aggregator_ws_publish_duration_seconds", "Routing, encoding and queueing of one event for WebSocket clients", ("kind",))
+ws_send_seconds = registry.histogram(
+    "aggregator_ws_send_duration_seconds", "Duration of a single WebSocket frame send")
+ws_send_failures = registry.counter(
+    "aggregator_ws_send_failures_total", "WebSocket sends that failed and evicted the client", ("reason",))
+ingest_readings = registry.counter(
+    "aggregator_ingest_readings_total", "Readings accepted by the log endpoints")
+ingest_rate = RateMeter()
+registry.gauge_callback(
+    "aggregator_ingest_readings_per_second", "Readings accepted per second over the last 10 seconds", ingest_rate.rate)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Requests are labelled by the matched route
+    template (e.g. /api/nodes/{node_id}/logs), so ids in paths do not create new series.
+    Everything served by the static mount shares the "static" label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = route.path if route is not None else "static"
+            http_request_seconds.labels(scope["method"], template, str(status)).observe(time.perf_counter() - start)
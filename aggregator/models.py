@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Integer, Float, Boolean, ForeignKey, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, ForeignKey, DateTime, Index, Enum as SQLEnum, func, text
+from sqlalchemy.types import UserDefinedType
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import declarative_base, relationship
 from geoalchemy2 import Geometry
@@ -9,6 +10,24 @@ from database import Base
 from sqlalchemy.ext.hybrid import hybrid_property
 from geoalchemy2.functions import ST_X, ST_Y
 
+class Ltree(UserDefinedType):
+    """PostgreSQL ltree label path, exchanged with the driver as plain text."""
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "LTREE"
+
+    def bind_expression(self, bindvalue):
+        return func.text2ltree(bindvalue)
+
+    def column_expression(self, col):
+        return func.ltree2text(col)
+
+    class comparator_factory(UserDefinedType.Comparator):
+        def descendant_of(self, other):
+            """Path equals `other` or lies below it (ltree <@), served by the GiST index."""
+            return self.op("<@", is_comparison=True)(other)
+
 class NodeType(enum.Enum):
     BTS = "BTS"
     NodeB = "NodeB"
@@ -38,13 +57,23 @@ class NetworkNode(Base):
     
     node_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     node_name = Column(String, nullable=False)
-    topology_path = Column(String, nullable=False)
+    topology_path = Column(Ltree, nullable=False)
     node_type = Column(SQLEnum(NodeType), nullable=False)
     ip_address = Column(String, nullable=False)
     max_throughput_mbps = Column(Integer, nullable=False)
     location = Column(Geometry('POINT'), nullable=False)
     vendor_config = Column(JSONB, default={})
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # Set while a delete job removes the node; it takes no readings and is hidden from lookups
+    deleting_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Keyset pagination order of GET /api/nodes/
+        Index("ix_network_node_created_at_node_id", "created_at", "node_id"),
+        Index("ix_network_node_topology_path", "topology_path", postgresql_using="gist"),
+        # Natural key of registration upserts
+        Index("ux_network_node_node_name", "node_name", unique=True),
+    )
 
     logs = relationship("NodeStatusLog", back_populates="node")
     components = relationship("HardwareComponent", back_populates="node")
@@ -112,6 +141,9 @@ class NodeStatusLog(Base):
     connected_users = Column(Integer, nullable=False)
     current_throughput_mbps = Column(Float, nullable=False)
 
+    # Latest reading of a node
+    __table_args__ = (Index("ix_node_status_log_node_id_timestamp", "node_id", timestamp.desc()),)
+
     node = relationship("NetworkNode", back_populates="logs")
 
 class HardwareComponent(Base):
@@ -121,6 +153,14 @@ class HardwareComponent(Base):
     node_id = Column(UUID(as_uuid=True), ForeignKey("network_node.node_id"), nullable=False)
     component_type = Column(SQLEnum(ComponentType), nullable=False)
     status = Column(SQLEnum(Status), default=Status.OK)
+    status_changed_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # A node has one component of each type, status updates address it by (node_id, component_type)
+        Index("ux_hardware_component_node_type", "node_id", "component_type", unique=True),
+        # Fleet-wide fault queries only ever look at the few components that are not OK
+        Index("ix_hardware_component_not_ok", "component_type", "status", "node_id", postgresql_where=text("status <> 'OK'")),
+    )
 
     node = relationship("NetworkNode", back_populates="components")
 
@@ -132,7 +172,40 @@ class ActiveAlarm(Base):
     component_id = Column(UUID(as_uuid=True), ForeignKey("hardware_component.component_id"), nullable=True)
     severity = Column(SQLEnum(Severity), nullable=False)
     description = Column(String, nullable=False)
+    # Name of the alarm engine rule that raised the alarm, NULL for component status alarms
+    alarm_rule = Column(String, nullable=True)
     raised_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     cleared_at = Column(DateTime(timezone=True), nullable=True)
 
-    node = relationship("NetworkNode", back_populates="alarms")
\ No newline at end of file
+    # Open alarms of a component, cleared when its status changes
+    __table_args__ = (Index("ix_active_alarm_open_component", "component_id", postgresql_where=text("cleared_at IS NULL")),)
+
+    node = relationship("NetworkNode", back_populates="alarms")
+
+class FleetVersion(Base):
+    """Single row counter bumped by a trigger on every change of network_node, used as the fleet ETag."""
+    __tablename__ = "fleet_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+class MaintenanceJob(Base):
+    """State of a background job (fleet reset, node deletion), readable from every worker."""
+    __tablename__ = "maintenance_job"
+
+    job_id = Column(UUID(as_uuid=True), primary_key=True)
+    kind = Column(String, nullable=False)
+    target = Column(String, nullable=True)
+    status = Column(String, nullable=False)
+    step = Column(String, nullable=True)
+    done = Column(BigInteger, nullable=False, default=0)
+    total = Column(BigInteger, nullable=False, default=0)
+    detail = Column(JSONB, nullable=False, default={})
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed by the worker running the job; a running job that stops reporting has failed
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Running jobs of a kind and target, looked up before starting another one
+    __table_args__ = (Index("ix_maintenance_job_running", "kind", "target", postgresql_where=text("status = 'running'")),)
@@ -0,0 +1,126 @@
+from typing import Any, Dict, Iterable, Optional
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+
+class NodeInfo:
+    __slots__ = ("node_id", "node_name", "topology_path", "node_type", "latitude", "longitude",
+                 "max_throughput_mbps", "meta")
+
+    def __init__(self, node_id: str, node_name: str, topology_path: str, node_type: str, latitude: float,
+                 longitude: float, max_throughput_mbps: int):
+        self.node_id = node_id
+        self.node_name = node_name
+        self.topology_path = topology_path
+        self.node_type = node_type
+        self.latitude = latitude
+        self.longitude = longitude
+        self.max_throughput_mbps = max_throughput_mbps
+        # Attached to WebSocket events as is, built once per registration
+        self.meta: Dict[str, Any] = {
+            "node_name": node_name,
+            "node_type": node_type,
+            "topology_path": topology_path,
+            "latitude": latitude,
+            "longitude": longitude,
+            "max_throughput_mbps": max_throughput_mbps,
+        }
+
+    def fields(self) -> list:
+        """Constructor arguments after node_id, as carried by the event bus."""
+        return [self.node_name, self.topology_path, self.node_type, self.latitude, self.longitude,
+                self.max_throughput_mbps]
+
+class NodeRegistry:
+    """
+    In-memory copy of the static attributes of every registered node, keyed by node_id.
+    Used to validate ingest and to route and enrich events without touching the database.
+    Nodes being deleted are set aside: they are not found, so their readings are rejected,
+    until the delete commits, and are put back if it fails.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, NodeInfo] = {}
+        self.deleting: Dict[str, NodeInfo] = {}
+
+    @staticmethod
+    def _select():
+        return select(
+            models.NetworkNode.node_id,
+            models.NetworkNode.node_name,
+            models.NetworkNode.topology_path,
+            models.NetworkNode.node_type,
+            models.NetworkNode.latitude,
+            models.NetworkNode.longitude,
+            models.NetworkNode.max_throughput_mbps,
+        ).where(models.NetworkNode.deleting_at.is_(None))
+
+    @staticmethod
+    def _info(row) -> NodeInfo:
+        return NodeInfo(str(row.node_id), row.node_name, str(row.topology_path), row.node_type.value,
+                        row.latitude, row.longitude, row.max_throughput_mbps)
+
+    async def load(self, db: AsyncSession):
+        result = await db.execute(self._select())
+        self.nodes = {str(row.node_id): self._info(row) for row in result}
+        self.deleting = {}
+
+    async def fetch(self, db: AsyncSession, node_ids: Iterable[str]) -> int:
+        """
+        Loads nodes missing from the registry, e.g. registered on another worker whose
+        event bus notification has not arrived yet. Returns how many were found.
+        """
+        ids = []
+        for node_id in node_ids:
+            try:
+                ids.append(UUID(str(node_id)))
+            except ValueError:
+                pass
+        if not ids:
+            return 0
+        result = await db.execute(self._select().where(models.NetworkNode.node_id.in_(ids)))
+        found = 0
+        for row in result:
+            self.add(self._info(row))
+            found += 1
+        return found
+
+    def register(self, node: models.NetworkNode):
+        self.add(self._info(node))
+
+    def add(self, info: NodeInfo):
+        self.deleting.pop(info.node_id, None)
+        self.nodes[info.node_id] = info
+
+    def mark_deleting(self, node_id: str) -> Optional[NodeInfo]:
+        info = self.nodes.pop(node_id, None)
+        if info is not None:
+            self.deleting[node_id] = info
+        return info or self.deleting.get(node_id)
+
+    def restore(self, node_id: str) -> Optional[NodeInfo]:
+        """Puts back a node whose delete failed and returns it."""
+        info = self.deleting.pop(node_id, None)
+        if info is not None:
+            self.nodes[node_id] = info
+        return info
+
+    def remove(self, node_id: str):
+        self.nodes.pop(node_id, None)
+        self.deleting.pop(node_id, None)
+
+    def clear(self):
+        self.nodes = {}
+        self.deleting = {}
+
+    def get(self, node_id: str) -> Optional[NodeInfo]:
+        return self.nodes.get(node_id)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+node_registry = NodeRegistry()
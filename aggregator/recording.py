@@ -0,0 +1,201 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import uuid
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger("recording")
+
+# Append-only capture of ingest traffic, enabled by setting a file path
+INGEST_RECORD_PATH = os.getenv("INGEST_RECORD_PATH", "")
+
+MAGIC = b"SIVREC2\n"
+# Version 1 stored the floats of a reading as float32, which replays lossy; it is still readable
+MAGIC_V1 = b"SIVREC1\n"
+NODE = b"N"
+READING = b"R"
+# type, node_id, JSON length + registration JSON
+NODE_HEADER = struct.Struct("<c16sI")
+# type, epoch seconds, node_id, is_online, cpu_temperature_c, connected_users, current_throughput_mbps
+READING_RECORD = struct.Struct("<cd16s?dId")
+READING_RECORD_V1 = struct.Struct("<cd16s?fIf")
+
+class RecordedReading(NamedTuple):
+    timestamp: float
+    node_id: uuid.UUID
+    is_online: bool
+    cpu_temperature_c: float
+    connected_users: int
+    current_throughput_mbps: float
+
+class RecordedNode(NamedTuple):
+    node_id: uuid.UUID
+    registration: dict
+
+class TelemetryRecorder:
+    """
+    Writes node registrations and readings to an append-only binary file: a registration
+    is its JSON payload, a reading a fixed 46-byte record. Writes go to a buffered file,
+    so recording does not add I/O waits to the ingest path.
+
+    The file is locked while it is recorded to. Under several uvicorn workers only the first
+    one records to the configured path; every other worker records to its own file with its
+    pid before the suffix (fleet.rec -> fleet.12345.rec), so no two processes append to one file.
+    Without advisory locks (Windows) every worker records to its own file.
+    """
+
+    def __init__(self, path: str = INGEST_RECORD_PATH):
+        self.path = path
+        self.file = None
+        self.nodes = 0
+        self.readings = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.file is not None
+
+    def start(self):
+        if not self.path or self.file is not None:
+            return
+        file = self._open_locked(self.path)
+        if file is None:
+            stem, suffix = os.path.splitext(self.path)
+            self.path = f"{stem}.{os.getpid()}{suffix}"
+            file = open(self.path, "ab", buffering=1024 * 1024)
+            logger.info(f"Recording to {self.path} of this worker")
+
+        end = 0
+        if os.path.getsize(self.path) > 0:
+            # Drop a record cut short by an earlier crash before appending to the file
+            with TelemetryRecording(self.path) as recording:
+                if recording.version != MAGIC:
+                    file.close()
+                    raise ValueError(f"{self.path} is an older recording format, record to a new file")
+                for _ in recording.records():
+                    pass
+                end = recording.end
+        file.truncate(end)
+        if end == 0:
+            file.write(MAGIC)
+        self.file = file
+
+    @staticmethod
+    def _open_locked(path: str):
+        """Opens the file for appending, or returns None if another process records to it."""
+        if fcntl is None:
+            # Without advisory locks every worker records to its own file
+            return None
+        file = open(path, "ab", buffering=1024 * 1024)
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return None
+        return file
+
+    def stop(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def record_node(self, node_id, registration: dict):
+        if self.file is None:
+            return
+        payload = json.dumps(registration, default=str).encode()
+        self.file.write(NODE_HEADER.pack(NODE, uuid.UUID(str(node_id)).bytes, len(payload)))
+        self.file.write(payload)
+        self.nodes += 1
+
+    def record_reading(self, node_id, reading, timestamp: Optional[datetime]):
+        if self.file is None:
+            return
+        self.file.write(READING_RECORD.pack(
+            READING,
+            timestamp.timestamp() if timestamp is not None else datetime.now().timestamp(),
+            uuid.UUID(str(node_id)).bytes,
+            reading.is_online,
+            reading.cpu_temperature_c,
+            reading.connected_users,
+            reading.current_throughput_mbps
+        ))
+        self.readings += 1
+
+    def stats(self):
+        return {"path": self.path or None, "enabled": self.enabled, "nodes": self.nodes, "readings": self.readings}
+
+class TelemetryRecording:
+    """
+    Reads a recording through mmap, one record at a time, so files larger than memory can
+    be replayed. A record cut short by a crash at the end of the file is ignored. Version 1
+    recordings, with float32 readings, are read as well.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.version = MAGIC
+        # Offset just past the last complete record read by records()
+        self.end = len(MAGIC)
+
+    def __enter__(self) -> "TelemetryRecording":
+        self.file = open(self.path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.version = self.map[:len(MAGIC)]
+        if self.version not in (MAGIC, MAGIC_V1):
+            self.close()
+            raise ValueError(f"{self.path} is not a telemetry recording")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def records(self) -> Iterator[object]:
+        """Yields RecordedNode and RecordedReading in file order."""
+        data = self.map
+        size = len(data)
+        record = READING_RECORD if self.version == MAGIC else READING_RECORD_V1
+        offset = self.end = len(MAGIC)
+        while offset < size:
+            kind = data[offset:offset + 1]
+            if kind == READING:
+                if offset + record.size > size:
+                    return
+                _, ts, node_id, online, temp, users, throughput = record.unpack_from(data, offset)
+                offset = self.end = offset + record.size
+                yield RecordedReading(ts, uuid.UUID(bytes=node_id), online, temp, users, throughput)
+            elif kind == NODE:
+                if offset + NODE_HEADER.size > size:
+                    return
+                _, node_id, length = NODE_HEADER.unpack_from(data, offset)
+                start = offset + NODE_HEADER.size
+                if start + length > size:
+                    return
+                offset = self.end = start + length
+                yield RecordedNode(uuid.UUID(bytes=node_id), json.loads(data[start:offset]))
+            else:
+                raise ValueError(f"Corrupt recording {self.path} at byte {offset}")
+
+    def nodes(self) -> Iterator[RecordedNode]:
+        return (record for record in self.records() if isinstance(record, RecordedNode))
+
+    def readings(self) -> Iterator[RecordedReading]:
+        return (record for record in self.records() if isinstance(record, RecordedReading))
+
+recorder = TelemetryRecorder()
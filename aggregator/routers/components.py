@@ -0,0 +1,70 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+import schemas
+from models import ComponentType, Status
+from crud import components as crud_components
+from event_bus import event_bus
+from routers.logs import unknown_nodes
+from codec import FastJSONResponse
+
+router = APIRouter(prefix="/api/components", tags=["Hardware Components"])
+
+def publish_component_alarm(kind: str, alarm: dict, timestamp):
+    node_id = str(alarm["node_id"])
+    event_bus.publish_event(node_id, {
+        "type": kind,
+        "alarm_id": str(alarm["alarm_id"]),
+        "node_id": node_id,
+        "component_id": str(alarm["component_id"]),
+        "component_type": alarm["component_type"].value,
+        "severity": alarm["severity"].value,
+        "description": alarm["description"],
+        "timestamp": timestamp.isoformat(),
+    })
+
+@router.post("/status", response_model=schemas.ComponentStatusBatchResponse)
+async def report_component_statuses(batch: schemas.ComponentStatusBatch, db: AsyncSession = Depends(get_db)):
+    """
+    Reports the status of many nodes' hardware components at once. Only actual changes are
+    written, with one set-based UPDATE; each change clears the component's open alarm and
+    raises a MAJOR (DEGRADED) or CRITICAL (FAILED) alarm linked through component_id.
+    Components of unknown nodes are rejected from the node registry.
+    """
+    missing = await unknown_nodes({str(item.node_id) for item in batch.components}, db)
+    rejected = [
+        schemas.ComponentStatusRejection(index=index, node_id=item.node_id, error="Unknown node_id")
+        for index, item in enumerate(batch.components) if str(item.node_id) in missing
+    ]
+    items = [item for item in batch.components if str(item.node_id) not in missing]
+
+    result = await crud_components.apply_component_statuses(db, items)
+    for alarm in result["cleared"]:
+        publish_component_alarm("alarm_cleared", alarm, alarm["cleared_at"])
+    for alarm in result["raised"]:
+        publish_component_alarm("new_alarm", alarm, alarm["raised_at"])
+
+    return schemas.ComponentStatusBatchResponse(
+        received=len(batch.components),
+        changed=len(result["changes"]),
+        unchanged=result["unique"] - len(result["changes"]),
+        alarms_raised=len(result["raised"]),
+        alarms_cleared=len(result["cleared"]),
+        changes=result["changes"],
+        rejected=rejected,
+    )
+
+@router.get("/", response_model=None, responses={200: {"model": List[schemas.HardwareComponentResponse]}})
+async def read_components(
+    status: Optional[Status] = Query(default=None, description="Without a status every component that is not OK is returned"),
+    component_type: Optional[ComponentType] = None,
+    topology: Optional[str] = Query(default=None, pattern=schemas.TOPOLOGY_PATH_PATTERN),
+    limit: int = Query(default=1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns hardware components across the fleet, e.g. all FAILED cooling fans below a topology path."""
+    components = await crud_components.get_components(
+        db, status=status, component_type=component_type, topology=topology, limit=limit
+    )
+    return FastJSONResponse(components)
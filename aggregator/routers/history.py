@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, TELEMETRY_RAW_RETENTION_DAYS, TELEMETRY_1M_RETENTION_DAYS
+import schemas
+from crud import history as crud_history
+from node_registry import node_registry
+
+router = APIRouter(prefix="/api/nodes", tags=["Telemetry History"])
+
+# How far back every resolution reaches; hourly rollups have no retention policy
+RETENTION = {
+    "raw": timedelta(days=TELEMETRY_RAW_RETENTION_DAYS),
+    "1m": timedelta(days=TELEMETRY_1M_RETENTION_DAYS),
+    "1h": None,
+}
+
+@router.get("/{node_id}/metrics", response_model=schemas.NodeMetricsResponse)
+async def read_node_metrics(
+    node_id: UUID,
+    start: Optional[datetime] = Query(default=None, alias="from"),
+    end: Optional[datetime] = Query(default=None, alias="to"),
+    resolution: Literal["auto", "raw", "1m", "1h"] = "auto",
+    limit: int = Query(default=5000, ge=1, le=50000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Returns downsampled telemetry history of a node. With resolution=auto the coarsest
+    rollup that still fits the requested range is used (raw rows, 1 minute or 1 hour buckets),
+    among those whose retention reaches back to 'from'. 422 when no resolution fits; an
+    explicit resolution that returns more than `limit` points is cut off with truncated=true.
+    """
+    if node_registry.get(str(node_id)) is None:
+        raise HTTPException(status_code=404, detail="Node not found.")
+
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=1)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'.")
+
+    if resolution == "auto":
+        resolution = crud_history.pick_resolution(start, end, limit, RETENTION)
+        if resolution is None:
+            raise HTTPException(status_code=422, detail=(
+                f"No resolution covers the range in at most {limit} points; "
+                "narrow the range or request a resolution explicitly."
+            ))
+    elif not crud_history.retained(resolution, start, RETENTION):
+        raise HTTPException(status_code=422, detail=(
+            f"'from' is older than the {RETENTION[resolution].days} days kept at {resolution} resolution."
+        ))
+
+    points, truncated = await crud_history.get_node_metrics(db, node_id, start, end, resolution, limit)
+    return schemas.NodeMetricsResponse(node_id=node_id, resolution=resolution, start=start, end=end,
+                                       points=points, truncated=truncated)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, HTTPException
+from uuid import UUID
+import schemas
+from jobs import job_manager
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+async def read_job(job_id: UUID):
+    """Returns the status and progress of a background job (fleet reset, node deletion) started by any worker."""
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
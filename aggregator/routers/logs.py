@@ -1,44 +1,203 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import time
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional, Set
 from uuid import UUID
-from database import get_db
+from database import get_db, SessionLocal
 import schemas
 from crud import logs as crud_logs
-from ws_manager import manager
-    
+from crud import alarms as crud_alarms
+from event_bus import event_bus
+from ingest_buffer import ingest_buffer, IngestBufferFull
+from node_registry import node_registry
+from fleet_state import fleet_state
+from recording import recorder
+from alarm_engine import alarm_engine, AlarmTransition
+from anomaly_detector import anomaly_detector
+import codec
+from metrics import ingest_readings, ingest_rate
+
 router = APIRouter(prefix="/api/nodes", tags=["Telemetry & Logs"])
+batch_router = APIRouter(prefix="/api/logs", tags=["Telemetry & Logs"])
+
+def evaluate_reading(node_id: str, node_type: str, log, timestamp) -> List[AlarmTransition]:
+    """Runs the alarm engine and anomaly detector on a reading and broadcasts the alarm transitions."""
+    transitions = alarm_engine.evaluate(node_id, node_type, log, timestamp)
+    anomaly_detector.observe(node_id, log.cpu_temperature_c, timestamp.timestamp() if timestamp else time.time())
+    timestamp = timestamp.isoformat() if timestamp is not None else None
 
-@router.post("/{node_id}/logs", response_model=schemas.NodeStatusLogResponse, status_code=201)
-async def report_node_status(node_id: UUID, log: schemas.NodeStatusLogCreate, db: Session = Depends(get_db)):
-    """Reports new node status."""
-    created_log = crud_logs.create_node_log(db=db, node_id=node_id, log=log)
-    
-    # Check for alarm conditions
-    alarms = []
-    if log.cpu_temperature_c > 50.0:
-        alarms.append(f"High CPU temp: {log.cpu_temperature_c}°C")
-    if log.connected_users > 450:
-        alarms.append(f"High traffic: {log.connected_users} users")
-        
-    for alarm_msg in alarms:
-        await manager.broadcast_json({
-            "type": "new_alarm",
-            "node_id": str(node_id),
-            "severity": "CRITICAL" if log.cpu_temperature_c > 53.0 else "WARNING",
-            "description": alarm_msg,
-            "timestamp": created_log.timestamp.isoformat() if hasattr(created_log, "timestamp") else None
+    for t in transitions:
+        event_bus.publish_event(node_id, {
+            "type": "new_alarm" if t.raised else "alarm_cleared",
+            "alarm_id": str(t.alarm_id),
+            "node_id": node_id,
+            "rule": t.rule,
+            "severity": t.severity,
+            "description": t.description,
+            "timestamp": timestamp
         })
-    
-    await manager.broadcast_json({
-        "type": "new_log",
-        "node_id": str(node_id),
-        "log": {
-            "is_online": log.is_online,
-            "cpu_temperature_c": log.cpu_temperature_c,
-            "connected_users": log.connected_users,
-            "current_throughput_mbps": log.current_throughput_mbps,
-            "timestamp": created_log.timestamp.isoformat() if hasattr(created_log, "timestamp") else None
-        }
+    return transitions
+
+def evaluate_remote_reading(node_id: str, log, timestamp):
+    """Evaluates a reading another instance received; the event bus calls it on the alarm owner."""
+    node = node_registry.get(node_id)
+    if node is not None:
+        ingest_buffer.put_alarm_transitions(evaluate_reading(node_id, node.node_type, log, timestamp))
+
+def publish_log_events(node_id: UUID, log: schemas.NodeStatusLogCreate, timestamp) -> List[AlarmTransition]:
+    """
+    Updates the fleet state and broadcasts the reading. On the alarm owner the reading also goes
+    through the alarm engine and anomaly detector; other instances leave that to the owner, which
+    receives the reading through the event bus.
+    """
+    node_id = str(node_id)
+    ingest_readings.inc()
+    ingest_rate.mark()
+    node = node_registry.get(node_id)
+    transitions = []
+    if node is not None:
+        fleet_state.update(node_id, log, timestamp)
+        if event_bus.alarm_owner:
+            transitions = evaluate_reading(node_id, node.node_type, log, timestamp)
+
+    event_bus.publish_log(node_id, {
+        "is_online": log.is_online,
+        "cpu_temperature_c": log.cpu_temperature_c,
+        "connected_users": log.connected_users,
+        "current_throughput_mbps": log.current_throughput_mbps,
+        "timestamp": timestamp.isoformat() if timestamp is not None else None
     })
-    
-    return created_log
\ No newline at end of file
+    return transitions
+
+async def unknown_nodes(node_ids: Iterable[str], db: Optional[AsyncSession] = None) -> Set[str]:
+    """
+    Returns the ids missing from the node registry. With a shared event bus a node may have
+    been registered on another worker a moment ago, so misses are looked up once in the database.
+    """
+    missing = {node_id for node_id in node_ids if node_id not in node_registry}
+    if missing and event_bus.shared:
+        if db is None:
+            async with SessionLocal() as db:
+                await node_registry.fetch(db, missing)
+        else:
+            await node_registry.fetch(db, missing)
+        missing = {node_id for node_id in missing if node_id not in node_registry}
+    return missing
+
+def request_body(model, binary_description: str) -> dict:
+    """OpenAPI request body of a log endpoint, which reads JSON or the compact binary encoding itself."""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": model.model_json_schema()},
+        codec.TELEMETRY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary", "description": binary_description}},
+    }}}
+
+async def parse_body(request: Request, model, decode):
+    """Parses the body as the compact encoding or, by default, as JSON straight into `model`."""
+    body = await request.body()
+    if codec.is_telemetry(request.headers.get("content-type", "")):
+        try:
+            return decode(body)
+        except codec.InvalidTelemetry as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        errors = [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        raise RequestValidationError(errors, body=body)
+
+@router.post("/{node_id}/logs", response_model=schemas.NodeStatusLogResponse, status_code=202,
+             openapi_extra=request_body(schemas.NodeStatusLogCreate, codec.READING_DOC))
+async def report_node_status(node_id: UUID, request: Request):
+    """
+    Reports new node status. The reading is queued and written to the database in the background.
+    Its events are broadcast at once, so this path is at most once: if the write still fails
+    after INGEST_FLUSH_RETRIES retries, the reading is lost and counted in aggregator_ingest_lost_total.
+    Accepts JSON or, with Content-Type application/x-telemetry, one 11-byte binary record.
+    Unknown node ids are rejected with 404 from the in-memory node registry.
+    """
+    if await unknown_nodes([str(node_id)]):
+        raise HTTPException(status_code=404, detail="Node not found.")
+    log = await parse_body(request, schemas.NodeStatusLogCreate, codec.decode_reading)
+    reading = schemas.NodeStatusLogBatchItem(
+        node_id=node_id,
+        timestamp=datetime.now(timezone.utc),
+        **log.model_dump()
+    )
+    try:
+        ingest_buffer.put(reading)
+    except IngestBufferFull:
+        raise HTTPException(status_code=429, detail="Ingest queue is full, retry later.", headers={"Retry-After": "1"})
+
+    ingest_buffer.put_alarm_transitions(publish_log_events(node_id, log, reading.timestamp))
+    return reading
+
+@batch_router.post("/batch", response_model=schemas.NodeStatusLogBatchResponse,
+                   openapi_extra=request_body(schemas.NodeStatusLogBatch, codec.BATCH_READING_DOC))
+async def report_node_status_batch(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Reports statuses of many nodes at once. Every JSON reading is accepted or rejected on its own.
+    With Content-Type application/x-telemetry the body is a sequence of 35-byte binary records,
+    which need no per-reading validation.
+    """
+    batch = await parse_body(request, schemas.NodeStatusLogBatch, codec.decode_batch)
+    if isinstance(batch, list):
+        readings = batch
+        results = [None] * len(readings)
+        positions = list(range(len(readings)))
+    else:
+        results = [None] * len(batch.readings)
+        readings = []
+        positions = []
+
+        for index, raw in enumerate(batch.readings):
+            try:
+                readings.append(schemas.NodeStatusLogBatchItem.model_validate(raw))
+                positions.append(index)
+            except ValidationError as e:
+                results[index] = schemas.NodeStatusLogBatchResult(
+                    index=index,
+                    accepted=False,
+                    error="; ".join(err["msg"] for err in e.errors())
+                )
+
+    # Unknown ids are rejected from the registry before anything reaches the database
+    missing = await unknown_nodes({str(reading.node_id) for reading in readings}, db)
+    if missing:
+        known = []
+        for index, reading in zip(positions, readings):
+            if str(reading.node_id) in missing:
+                results[index] = schemas.NodeStatusLogBatchResult(
+                    index=index, node_id=reading.node_id, accepted=False, error="Unknown node_id"
+                )
+            else:
+                known.append((index, reading))
+        positions = [index for index, _ in known]
+        readings = [reading for _, reading in known]
+
+    outcomes = await crud_logs.create_node_logs_bulk(db=db, readings=readings)
+    transitions = []
+
+    for index, reading, (accepted, timestamp, error) in zip(positions, readings, outcomes):
+        results[index] = schemas.NodeStatusLogBatchResult(
+            index=index,
+            node_id=reading.node_id,
+            accepted=accepted,
+            timestamp=timestamp,
+            error=error
+        )
+        if accepted:
+            recorder.record_reading(reading.node_id, reading, timestamp)
+            transitions.extend(publish_log_events(reading.node_id, reading, timestamp))
+
+    if transitions:
+        await crud_alarms.apply_alarm_transitions(db=db, transitions=transitions)
+
+    accepted_count = sum(1 for r in results if r.accepted)
+    return schemas.NodeStatusLogBatchResponse(
+        accepted=accepted_count,
+        rejected=len(results) - accepted_count,
+        results=results
+    )
@@ -1,24 +1,193 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+import zlib
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from uuid import UUID
+from database import get_db, SessionLocal
 import schemas
+from models import NodeType
 from crud import nodes as crud_nodes
+from node_registry import node_registry
+from alarm_engine import alarm_engine
+from anomaly_detector import anomaly_detector
+from fleet_state import fleet_state
+from recording import recorder
+from event_bus import event_bus
+from codec import FastJSONResponse
+from jobs import job_manager, Job
 
 router = APIRouter(prefix="/api/nodes", tags=["Network Nodes"])
 
 @router.post("/", response_model=schemas.NetworkNodeResponse, status_code=201)
-def register_node(node: schemas.NetworkNodeCreate, db: Session = Depends(get_db)):
-    """Registers new station."""
-    return crud_nodes.create_network_node(db=db, node=node)
-
-@router.get("/", response_model=List[schemas.NetworkNodeResponse])
-def read_nodes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Returns list of all registered stations."""
-    return crud_nodes.get_nodes(db, skip=skip, limit=limit)
-
-@router.delete("/", status_code=200)
-def delete_all_nodes(db: Session = Depends(get_db)):
-    """Deletes all network nodes (and their cascading logs and alarms)."""
-    deleted_count = crud_nodes.delete_all_nodes(db)
-    return {"status": "success", "message": f"Deleted {deleted_count} nodes."}
\ No newline at end of file
+async def register_node(node: schemas.NetworkNodeCreate, db: AsyncSession = Depends(get_db)):
+    """Registers new station. Registering an existing node_name again updates it and returns its node_id."""
+    db_node = await crud_nodes.create_network_node(db=db, node=node)
+    node_registry.register(db_node)
+    event_bus.publish_nodes([node_registry.get(str(db_node.node_id))])
+    recorder.record_node(db_node.node_id, node.model_dump(mode="json"))
+    return db_node
+
+@router.post("/bulk", response_model=schemas.NetworkNodeBulkResponse)
+async def register_nodes_bulk(batch: schemas.NetworkNodeBulkCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Registers many stations in one statement, upserting by node_name.
+    Returns the node ids in request order; retrying the same request returns the same ids.
+    """
+    db_nodes = await crud_nodes.upsert_network_nodes(db=db, nodes=batch.nodes)
+    for db_node in db_nodes:
+        node_registry.register(db_node)
+    event_bus.publish_nodes(node_registry.get(str(db_node.node_id)) for db_node in db_nodes)
+    if recorder.enabled:
+        for node, db_node in zip(batch.nodes, db_nodes):
+            recorder.record_node(db_node.node_id, node.model_dump(mode="json"))
+    return schemas.NetworkNodeBulkResponse(
+        registered=len(db_nodes),
+        node_ids=[db_node.node_id for db_node in db_nodes]
+    )
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    field_list = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(field_list) - crud_nodes.NODE_FIELDS.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return field_list
+
+# Rows are built in SQL and may be projected, so they are not validated against NetworkNodeResponse
+@router.get("/", response_model=None, responses={200: {"model": List[schemas.NetworkNodeResponse]}})
+async def read_nodes(
+    request: Request,
+    limit: int = Query(default=100, ge=1, le=5000),
+    cursor: Optional[str] = Query(default=None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma separated subset of fields to return"),
+    skip: int = Query(default=0, ge=0, deprecated=True),
+    node_name: Optional[str] = Query(default=None, description="Only the node with this exact name"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Returns a page of registered stations. Follow the X-Next-Cursor header for the next page.
+    Responses carry a fleet-version ETag; send it back in If-None-Match to get 304 when nothing changed.
+    """
+    field_list = parse_fields(fields)
+
+    version = await crud_nodes.get_fleet_version(db)
+    etag = f'W/"{version}-{zlib.crc32(request.url.query.encode()):08x}"'
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        nodes, next_cursor = await crud_nodes.get_nodes(db, limit=limit, cursor=cursor, fields=field_list, skip=skip,
+                                                         node_name=node_name)
+    except crud_nodes.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return FastJSONResponse(nodes, headers=headers)
+
+@router.get("/count", response_model=schemas.NetworkNodeCount)
+async def count_nodes(
+    topology: Optional[str] = Query(default=None, pattern=schemas.TOPOLOGY_PATH_PATTERN),
+    node_type: Optional[NodeType] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns the number of registered stations, optionally of a topology subtree or node type, counted in SQL."""
+    return {"count": await crud_nodes.count_nodes(db, topology=topology, node_type=node_type)}
+
+@router.get("/within", response_model=None, responses={200: {"model": List[schemas.NetworkNodeResponse]}})
+async def read_nodes_within(
+    bbox: str = Query(description="min_lon,min_lat,max_lon,max_lat"),
+    limit: int = Query(default=2000, ge=1, le=10000),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns stations inside a bounding box (e.g. the visible map viewport)."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox minimum must not exceed its maximum")
+
+    return FastJSONResponse(await crud_nodes.get_nodes_within(db, (min_lon, min_lat, max_lon, max_lat), limit, parse_fields(fields)))
+
+@router.get("/nearby", response_model=None, responses={200: {"model": List[schemas.NearbyNodeResponse]}})
+async def read_nodes_nearby(
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    radius_km: float = Query(default=10.0, gt=0, le=1000),
+    k: int = Query(default=10, ge=1, le=1000),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns the k stations nearest to a point within radius_km, nearest first, with their distance."""
+    return FastJSONResponse(await crud_nodes.get_nodes_nearby(db, lat, lon, radius_km, k, parse_fields(fields)))
+
+def job_accepted(job: Job) -> FastJSONResponse:
+    return FastJSONResponse(
+        schemas.JobResponse.model_validate(job).model_dump(mode="json"),
+        status_code=202,
+        headers={"Location": f"/api/jobs/{job.job_id}"}
+    )
+
+async def reset_fleet(job: Optional[Job] = None) -> dict:
+    async with SessionLocal() as db:
+        result = await crud_nodes.reset_fleet(db, progress=job.advance if job else None)
+    node_registry.clear()
+    alarm_engine.clear()
+    anomaly_detector.clear()
+    fleet_state.clear()
+    event_bus.publish_reset()
+    return result
+
+@router.delete("/", status_code=200, responses={202: {"model": schemas.JobResponse}})
+async def delete_all_nodes(background: bool = Query(default=False, description="Return 202 with a job id at once")):
+    """
+    Deletes all network nodes with their telemetry, alarms and components. Telemetry chunks
+    are dropped and the tables truncated, so the cost does not grow with the stored history.
+    With background=true the reset runs as a job; poll GET /api/jobs/{job_id} for its progress.
+    """
+    if background:
+        return job_accepted(await job_manager.running("fleet_reset") or await job_manager.start("fleet_reset", reset_fleet))
+    result = await reset_fleet()
+    return {"status": "success", "message": f"Deleted {result['deleted_nodes']} nodes.", **result}
+
+@router.delete("/{node_id}", status_code=202, response_model=schemas.JobResponse)
+async def delete_node(node_id: UUID, db: AsyncSession = Depends(get_db)):
+    """
+    Deletes one node and its history. The node is marked as deleting at once: it leaves the
+    live views and its readings are rejected on every worker. Its telemetry is deleted by a
+    background job in small batches, so ingest for other nodes is not blocked. Once the job
+    commits the node is dropped from the registries; if it fails the node is put back.
+    Poll GET /api/jobs/{job_id} for progress.
+    """
+    key = str(node_id)
+    job = await job_manager.running("node_delete", key)
+    if job is None:
+        if not await crud_nodes.mark_node_deleting(db, node_id):
+            raise HTTPException(status_code=404, detail="Node not found.")
+        node_registry.mark_deleting(key)
+        fleet_state.forget(key)
+        event_bus.publish_deleting(key)
+
+        async def run(job: Job) -> dict:
+            try:
+                async with SessionLocal() as job_db:
+                    result = await crud_nodes.delete_node(job_db, node_id, progress=job.advance)
+            except Exception:
+                async with SessionLocal() as job_db:
+                    await crud_nodes.unmark_node_deleting(job_db, node_id)
+                info = node_registry.restore(key)
+                if info is not None:
+                    event_bus.publish_nodes([info])
+                raise
+            node_registry.remove(key)
+            alarm_engine.forget(key)
+            anomaly_detector.forget(key)
+            event_bus.publish_forget(key)
+            return result
+
+        job = await job_manager.start("node_delete", run, key)
+    return job_accepted(job)
@@ -0,0 +1,68 @@
+import re
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+import schemas
+from models import NodeType, ComponentType, Status
+from crud import nodes as crud_nodes
+from crud import topology as crud_topology
+from crud import components as crud_components
+from routers.nodes import parse_fields
+from codec import FastJSONResponse
+
+router = APIRouter(prefix="/api/topology", tags=["Topology"])
+
+def validate_path(path: str) -> str:
+    if not re.match(schemas.TOPOLOGY_PATH_PATTERN, path):
+        raise HTTPException(status_code=400, detail="Topology path must be dot separated labels of letters, digits and '_'.")
+    return path
+
+@router.get("/{path}/nodes", response_model=None, responses={200: {"model": List[schemas.NetworkNodeResponse]}})
+async def read_subtree_nodes(
+    path: str,
+    node_type: Optional[NodeType] = None,
+    limit: int = Query(default=1000, ge=1, le=5000),
+    cursor: Optional[str] = Query(default=None, description="Value of X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma separated subset of fields to return"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns a page of the stations at or below a topology path, e.g. all eNodeBs under PL.REGION_2."""
+    validate_path(path)
+    try:
+        nodes, next_cursor = await crud_nodes.get_nodes(
+            db, limit=limit, cursor=cursor, fields=parse_fields(fields), topology=path, node_type=node_type
+        )
+    except crud_nodes.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(nodes, headers=headers)
+
+@router.get("/{path}/summary", response_model=schemas.TopologySummary)
+async def read_subtree_summary(
+    path: str,
+    window_sec: int = Query(default=crud_topology.TOPOLOGY_ONLINE_WINDOW_SEC, ge=1, le=86400),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Returns node counts, online ratio and average/max temperature and throughput of the
+    latest reading of every station below a topology path.
+    """
+    validate_path(path)
+    return await crud_topology.get_topology_summary(db, path, window_sec)
+
+@router.get("/{path}/components", response_model=None, responses={200: {"model": List[schemas.HardwareComponentResponse]}})
+async def read_subtree_components(
+    path: str,
+    status: Optional[Status] = Query(default=None, description="Without a status every component that is not OK is returned"),
+    component_type: Optional[ComponentType] = None,
+    limit: int = Query(default=1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Returns the faulty hardware components of the stations below a topology path, e.g. all FAILED cooling fans under PL.REGION_2."""
+    validate_path(path)
+    components = await crud_components.get_components(
+        db, status=status, component_type=component_type, topology=path, limit=limit
+    )
+    return FastJSONResponse(components)
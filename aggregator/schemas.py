@@ -1,12 +1,15 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, confloat
+from typing import Optional, Dict, Any, List, Literal, Tuple
 from datetime import datetime
 from uuid import UUID
 from models import NodeType, ComponentType, Status, Severity
 
+# Dot separated ltree labels, e.g. PL.REGION_2.eNodeB.POL_SIM_NODE_001
+TOPOLOGY_PATH_PATTERN = r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$"
+
 class NetworkNodeBase(BaseModel):
     node_name: str
-    topology_path: str
+    topology_path: str = Field(pattern=TOPOLOGY_PATH_PATTERN, max_length=2048)
     node_type: NodeType
     ip_address: str
     max_throughput_mbps: int
@@ -25,6 +28,34 @@ class NetworkNodeResponse(NetworkNodeBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class NetworkNodeBulkCreate(BaseModel):
+    nodes: List[NetworkNodeCreate] = Field(max_length=10000)
+
+class NetworkNodeBulkResponse(BaseModel):
+    registered: int
+    # Same order as the request, existing nodes keep their id
+    node_ids: List[UUID]
+
+class NetworkNodeCount(BaseModel):
+    count: int
+
+class NearbyNodeResponse(NetworkNodeResponse):
+    distance_km: float
+
+class TopologySummary(BaseModel):
+    path: str
+    nodes: int
+    nodes_by_type: Dict[str, int]
+    reporting: int
+    online: int
+    online_ratio: float
+    avg_cpu_temperature_c: Optional[float] = None
+    max_cpu_temperature_c: Optional[float] = None
+    avg_throughput_mbps: Optional[float] = None
+    max_throughput_mbps: Optional[float] = None
+    connected_users: int
+    window_sec: int
+
 class NodeStatusLogCreate(BaseModel):
     is_online: bool
     cpu_temperature_c: float
@@ -37,6 +68,27 @@ class NodeStatusLogResponse(NodeStatusLogCreate):
 
     model_config = ConfigDict(from_attributes=True)
 
+class NodeStatusLogBatchItem(NodeStatusLogCreate):
+    node_id: UUID
+    # Readings may carry their own capture time; the server time is used otherwise
+    timestamp: Optional[datetime] = None
+
+class NodeStatusLogBatch(BaseModel):
+    # Rows are validated one by one, so a malformed reading rejects only itself
+    readings: List[Dict[str, Any]] = Field(max_length=10000)
+
+class NodeStatusLogBatchResult(BaseModel):
+    index: int
+    node_id: Optional[UUID] = None
+    accepted: bool
+    timestamp: Optional[datetime] = None
+    error: Optional[str] = None
+
+class NodeStatusLogBatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[NodeStatusLogBatchResult]
+
 class ActiveAlarmCreate(BaseModel):
     component_id: Optional[UUID] = None
     severity: Severity
@@ -48,4 +100,87 @@ class ActiveAlarmResponse(ActiveAlarmCreate):
     raised_at: datetime
     cleared_at: Optional[datetime] = None
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class ComponentStatusItem(BaseModel):
+    node_id: UUID
+    component_type: ComponentType
+    status: Status
+
+class ComponentStatusBatch(BaseModel):
+    components: List[ComponentStatusItem] = Field(max_length=10000)
+
+class ComponentStatusChange(BaseModel):
+    component_id: UUID
+    node_id: UUID
+    component_type: ComponentType
+    # None for a component reported for the first time
+    previous_status: Optional[Status] = None
+    status: Status
+
+class ComponentStatusRejection(BaseModel):
+    index: int
+    node_id: UUID
+    error: str
+
+class ComponentStatusBatchResponse(BaseModel):
+    received: int
+    changed: int
+    unchanged: int
+    alarms_raised: int
+    alarms_cleared: int
+    changes: List[ComponentStatusChange]
+    rejected: List[ComponentStatusRejection]
+
+class HardwareComponentResponse(BaseModel):
+    component_id: UUID
+    node_id: UUID
+    node_name: str
+    topology_path: str
+    component_type: ComponentType
+    status: Status
+    status_changed_at: Optional[datetime] = None
+
+class MetricPoint(BaseModel):
+    bucket: datetime
+    avg_cpu_temperature_c: float
+    max_cpu_temperature_c: float
+    avg_connected_users: float
+    max_connected_users: int
+    avg_throughput_mbps: float
+    max_throughput_mbps: float
+    samples: int
+
+class NodeMetricsResponse(BaseModel):
+    node_id: UUID
+    resolution: str
+    start: datetime
+    end: datetime
+    points: List[MetricPoint]
+    # More than `limit` points matched and the rest were cut off
+    truncated: bool = False
+
+Longitude = confloat(ge=-180, le=180, allow_inf_nan=False)
+Latitude = confloat(ge=-90, le=90, allow_inf_nan=False)
+
+class EventSubscription(BaseModel):
+    """Filter sent by a /ws/events client. Every given criterion must match (AND)."""
+    action: Literal["subscribe", "unsubscribe"] = "subscribe"
+    topology_prefix: Optional[str] = None
+    node_types: Optional[List[NodeType]] = None
+    # min_lon, min_lat, max_lon, max_lat; finite, as the bbox is mapped onto a grid of cells
+    bbox: Optional[Tuple[Longitude, Latitude, Longitude, Latitude]] = None
+
+class JobResponse(BaseModel):
+    job_id: UUID
+    kind: str
+    target: Optional[str] = None
+    status: Literal["running", "done", "failed"]
+    step: Optional[str] = None
+    progress: float
+    detail: Dict[str, Any]
+    error: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
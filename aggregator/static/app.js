@@ -12,6 +12,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Stores node markers by ID
     const markers = {};
+    // Latest reading by node ID, seeded by the fleet_snapshot frame and kept current by the stream
+    const latestReadings = {};
     let totalLogsCount = 0;
 
     // Stats elements
@@ -25,75 +27,142 @@ document.addEventListener('DOMContentLoaded', () => {
         logsInLastSecond = 0; // reset every second
     }, 1000);
 
-    // 2. Fetch all nodes from API
-    async function fetchNodes() {
-        try {
-            const res = await fetch('/api/nodes/?limit=500');
-            const nodes = await res.json();
+    // How often the server sends coalesced node updates (alarms are never delayed)
+    const WS_TICK_MS = 500;
 
-            totalNodesEl.innerText = nodes.length;
+    // 2. Fetch all nodes from API, page by page
+    // Only the fields the map needs are requested; coordinates are computed by the database
+    const NODE_FIELDS = 'node_id,node_name,node_type,ip_address,max_throughput_mbps,vendor_config,latitude,longitude';
+    const VIEWPORT_NODE_LIMIT = 5000;
+    const VIEWPORT_DEBOUNCE_MS = 250;
 
-            nodes.forEach(node => {
-                // Prevent duplicate markers if fetchNodes is called again
-                if (markers[node.node_id]) {
-                    return;
-                }
+    function latestReadingHTML(nodeId) {
+        const log = latestReadings[nodeId];
+        if (!log) {
+            return '';
+        }
+        return `
+            <div class="popup-data" style="margin-top: 10px;">
+                <span class="data-label">Status:</span><span class="data-val">${log.is_online ? 'Online' : 'Offline'}</span>
+                <span class="data-label">CPU Temp:</span><span class="data-val">${log.cpu_temperature_c.toFixed(1)} °C</span>
+                <span class="data-label">Users:</span><span class="data-val">${log.connected_users}</span>
+                <span class="data-label">Throughput:</span><span class="data-val">${log.current_throughput_mbps.toFixed(1)} Mbps</span>
+            </div>
+        `;
+    }
 
-                const lat = node.latitude;
-                const lon = node.longitude;
-
-                if (lat && lon) {
-                    // Create Custom DivIcon
-                    const icon = L.divIcon({
-                        className: 'custom-marker',
-                        html: '', // Empty because we rely on the CSS sizing/border
-                        iconSize: [14, 14],
-                        iconAnchor: [7, 7],
-                        popupAnchor: [0, -10]
-                    });
+    function applyFleetSnapshot(columns) {
+        columns.node_id.forEach((nodeId, i) => {
+            latestReadings[nodeId] = {
+                is_online: columns.is_online[i],
+                cpu_temperature_c: columns.cpu_temperature_c[i],
+                connected_users: columns.connected_users[i],
+                current_throughput_mbps: columns.current_throughput_mbps[i]
+            };
+        });
+    }
 
-                    const marker = L.marker([lat, lon], { icon: icon }).addTo(map);
+    function addNodeMarker(node) {
+        // Prevent duplicate markers if fetchNodes is called again
+        if (markers[node.node_id]) {
+            return;
+        }
 
-                    const faultPort = node.vendor_config?.fault_port;
+        const lat = node.latitude;
+        const lon = node.longitude;
+
+        if (lat && lon) {
+            // Create Custom DivIcon
+            const icon = L.divIcon({
+                className: 'custom-marker',
+                html: '', // Empty because we rely on the CSS sizing/border
+                iconSize: [14, 14],
+                iconAnchor: [7, 7],
+                popupAnchor: [0, -10]
+            });
 
-                    let actionsHTML = '';
-                    if (faultPort) {
-                        actionsHTML = `
-                            <div class="popup-actions" style="margin-top: 15px; display: flex; gap: 8px;">
-                                <button onclick="injectFault(${faultPort})" class="btn-danger">Inject Fault</button>
-                                <button onclick="fixFault(${faultPort})" class="btn-success">Fix Node</button>
-                            </div>
-                        `;
-                    }
+            const marker = L.marker([lat, lon], { icon: icon }).addTo(map);
 
-                    const popupHTML = `
-                        <div class="popup-title">${node.node_name}</div>
-                        <div class="popup-data">
-                            <span class="data-label">Type:</span><span class="data-val">${node.node_type}</span>
-                            <span class="data-label">IP:</span><span class="data-val">${node.ip_address}</span>
-                            <span class="data-label">Max Speed:</span><span class="data-val">${node.max_throughput_mbps} Mbps</span>
-                        </div>
-                        ${actionsHTML}
-                    `;
-                    marker.bindPopup(popupHTML);
-
-                    markers[node.node_id] = marker;
-                }
-            });
+            const faultPort = node.vendor_config?.fault_port;
+            // Set for nodes hosted by a multi-node simulator, which has fault routes per node
+            const faultNode = node.vendor_config?.fault_node ? `'${node.vendor_config.fault_node}'` : 'null';
+
+            let actionsHTML = '';
+            if (faultPort) {
+                actionsHTML = `
+                    <div class="popup-actions" style="margin-top: 15px; display: flex; gap: 8px;">
+                        <button onclick="injectFault(${faultPort}, ${faultNode})" class="btn-danger">Inject Fault</button>
+                        <button onclick="fixFault(${faultPort}, ${faultNode})" class="btn-success">Fix Node</button>
+                    </div>
+                `;
+            }
+
+            const popupHTML = `
+                <div class="popup-title">${node.node_name}</div>
+                <div class="popup-data">
+                    <span class="data-label">Type:</span><span class="data-val">${node.node_type}</span>
+                    ${node.ip_address ? `<span class="data-label">IP:</span><span class="data-val">${node.ip_address}</span>` : ''}
+                    <span class="data-label">Max Speed:</span><span class="data-val">${node.max_throughput_mbps} Mbps</span>
+                </div>
+                ${actionsHTML}
+            `;
+            marker.bindPopup(() => popupHTML + latestReadingHTML(node.node_id));
+
+            markers[node.node_id] = marker;
+        }
+    }
+
+    function viewportBbox() {
+        const bounds = map.getBounds();
+        const clamp = (value, limit) => Math.max(-limit, Math.min(limit, value));
+        return [
+            clamp(bounds.getWest(), 180), clamp(bounds.getSouth(), 90),
+            clamp(bounds.getEast(), 180), clamp(bounds.getNorth(), 90)
+        ];
+    }
+
+    // Loads only the stations inside the visible map area; markers already loaded are kept
+    async function fetchNodes() {
+        try {
+            const bbox = viewportBbox();
+            const params = new URLSearchParams({ bbox: bbox.join(','), limit: VIEWPORT_NODE_LIMIT, fields: NODE_FIELDS });
+            const res = await fetch(`/api/nodes/within?${params}`);
+            const nodes = await res.json();
+
+            nodes.forEach(addNodeMarker);
+            totalNodesEl.innerText = Object.keys(markers).length;
+
+            subscribeViewport(bbox);
 
         } catch (error) {
             console.error("Failed to load network nodes", error);
         }
     }
 
+    // Only events of stations in view are streamed to this dashboard
+    let ws = null;
+    function subscribeViewport(bbox) {
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ action: 'subscribe', bbox: bbox }));
+        }
+    }
+
+    let viewportTimer = null;
+    map.on('moveend', () => {
+        clearTimeout(viewportTimer);
+        viewportTimer = setTimeout(fetchNodes, VIEWPORT_DEBOUNCE_MS);
+    });
+
     // 3. Set up WebSocket Connection
     function connectWS() {
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${window.location.host}/ws/events`;
-        const ws = new WebSocket(wsUrl);
+        // Readings are coalesced server-side into one log_delta frame per tick
+        const wsUrl = `${protocol}//${window.location.host}/ws/events?tick_ms=${WS_TICK_MS}`;
+        ws = new WebSocket(wsUrl);
 
         ws.onopen = () => {
             console.log("WebSocket connection established!");
+            subscribeViewport(viewportBbox());
             document.querySelector('.system-status p').innerText = "System Online";
             document.querySelector('.pulse-dot').style.backgroundColor = "var(--accent-green)";
         };
@@ -102,12 +171,24 @@ document.addEventListener('DOMContentLoaded', () => {
             try {
                 const data = JSON.parse(event.data);
 
-                if (data.type === "new_log") {
+                if (data.type === "fleet_snapshot") {
+                    applyFleetSnapshot(data.columns);
+                } else if (data.type === "new_log") {
                     logsInLastSecond++;
                     totalLogsCount++;
                     handleNewLog(data);
+                } else if (data.type === "log_delta") {
+                    logsInLastSecond += data.readings;
+                    totalLogsCount += data.readings;
+                    data.logs.forEach(handleNewLog);
                 } else if (data.type === "new_alarm") {
                     handleNewAlarm(data);
+                } else if (data.type === "predicted_overheat") {
+                    handleNewAlarm({
+                        ...data,
+                        severity: "FORECAST",
+                        description: `${data.temperature_c.toFixed(1)} °C, ${data.threshold_c} °C in ~${Math.round(data.eta_sec)} s`
+                    });
                 }
             } catch (error) {
                 console.error("Error parsing WS message:", error);
@@ -125,12 +206,28 @@ document.addEventListener('DOMContentLoaded', () => {
     // Prevents spamming the API if many unknown node logs arrive at once
     let isFetchingNodes = false;
 
+    // Events carry the node's metadata (name, type, location, max throughput), so a station
+    // registered after the page loaded is placed on the map without another request.
+    // Returns false if the event did not carry it, e.g. its first frame was dropped.
+    function ensureNodeMarker(payload) {
+        if (markers[payload.node_id]) {
+            return true;
+        }
+        if (!payload.node) {
+            return false;
+        }
+        addNodeMarker({ node_id: payload.node_id, ...payload.node });
+        totalNodesEl.innerText = Object.keys(markers).length;
+        return Boolean(markers[payload.node_id]);
+    }
+
     // 4. Handle Visual Feedback for a New Log
     function handleNewLog(payload) {
         const nodeId = payload.node_id;
         const logData = payload.log;
+        latestReadings[nodeId] = logData;
 
-        if (markers[nodeId]) {
+        if (ensureNodeMarker(payload)) {
             const marker = markers[nodeId];
 
             // Brief highlight effect on the marker
@@ -169,7 +266,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 }, 3000); // the CSS animation is 3s long
             }
         } else {
-            // Node not found on map. It was likely added after we loaded.
+            // Node not found on map and the event had no metadata for it
             if (!isFetchingNodes) {
                 isFetchingNodes = true;
                 fetchNodes().then(() => {
@@ -187,7 +284,7 @@ document.addEventListener('DOMContentLoaded', () => {
     function handleNewAlarm(payload) {
         const nodeId = payload.node_id;
 
-        if (markers[nodeId]) {
+        if (ensureNodeMarker(payload)) {
             const marker = markers[nodeId];
             const iconEl = marker.getElement();
 
@@ -227,7 +324,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 }, 4000);
             }
         } else {
-            // Node not found on map, try to fetch it first so we don't lose the alarm
+            // Node not found on map and the event had no metadata, fetch it so we don't lose the alarm
             if (!isFetchingNodes) {
                 isFetchingNodes = true;
                 fetchNodes().then(() => {
@@ -261,6 +358,9 @@ document.addEventListener('DOMContentLoaded', () => {
                         for (const prop of Object.getOwnPropertyNames(markers)) {
                             delete markers[prop];
                         }
+                        for (const prop of Object.getOwnPropertyNames(latestReadings)) {
+                            delete latestReadings[prop];
+                        }
                         totalNodesEl.innerText = '0';
                     } else {
                         alert("Failed to delete nodes.");
@@ -278,10 +378,15 @@ document.addEventListener('DOMContentLoaded', () => {
     connectWS();
 });
 
+function faultUrl(port, nodeName, action) {
+    const base = `http://localhost:${port}/api`;
+    return nodeName ? `${base}/nodes/${encodeURIComponent(nodeName)}/fault/${action}` : `${base}/fault/${action}`;
+}
+
 // Expose fault handlers to global scope for inline onclick handlers
-window.injectFault = async function (port) {
+window.injectFault = async function (port, nodeName = null) {
     try {
-        const res = await fetch(`http://localhost:${port}/api/fault/cooling`, { method: 'POST' });
+        const res = await fetch(faultUrl(port, nodeName, 'cooling'), { method: 'POST' });
         const data = await res.json();
         if (res.ok) {
             alert(`Fault injected successfully: ${data.message}`);
@@ -294,9 +399,9 @@ window.injectFault = async function (port) {
     }
 };
 
-window.fixFault = async function (port) {
+window.fixFault = async function (port, nodeName = null) {
     try {
-        const res = await fetch(`http://localhost:${port}/api/fault/fix`, { method: 'POST' });
+        const res = await fetch(faultUrl(port, nodeName, 'fix'), { method: 'POST' });
         const data = await res.json();
         if (res.ok) {
             alert(`Node fixed successfully: ${data.message}`);
@@ -0,0 +1,179 @@
+import math
+from collections import defaultdict
+from typing import Dict, FrozenSet, Hashable, Optional, Set, Tuple
+from node_registry import NodeInfo
+import schemas
+
+# Size of the grid cells used to index subscriber bounding boxes
+BBOX_CELL_DEG = 1.0
+# Boxes spanning more cells than this are checked directly instead of being indexed
+BBOX_MAX_CELLS = 4096
+
+class Subscription:
+    """Normalized, hashable form of a schemas.EventSubscription filter."""
+    __slots__ = ("topology_prefix", "node_types", "bbox")
+
+    def __init__(self, topology_prefix: Optional[str] = None, node_types: Optional[FrozenSet[str]] = None,
+                 bbox: Optional[Tuple[float, float, float, float]] = None):
+        self.topology_prefix = topology_prefix
+        self.node_types = node_types
+        self.bbox = bbox
+
+    @classmethod
+    def from_schema(cls, sub: schemas.EventSubscription) -> "Subscription":
+        if sub.action == "unsubscribe":
+            return cls()
+        prefix = sub.topology_prefix.strip(".") if sub.topology_prefix else None
+        node_types = frozenset(t.value for t in sub.node_types) if sub.node_types else None
+        bbox = None
+        if sub.bbox:
+            min_lon, min_lat, max_lon, max_lat = sub.bbox
+            bbox = (min(min_lon, max_lon), min(min_lat, max_lat), max(min_lon, max_lon), max(min_lat, max_lat))
+        return cls(prefix or None, node_types, bbox)
+
+    @property
+    def key(self) -> Hashable:
+        return (self.topology_prefix, self.node_types, self.bbox)
+
+    @property
+    def dimensions(self) -> int:
+        return sum(1 for part in (self.topology_prefix, self.node_types, self.bbox) if part)
+
+    def to_dict(self):
+        return {
+            "topology_prefix": self.topology_prefix,
+            "node_types": sorted(self.node_types) if self.node_types else None,
+            "bbox": list(self.bbox) if self.bbox else None,
+        }
+
+class TopologyTrie:
+    """Prefix trie over dot separated topology labels. Subscribers hang on the node of their prefix."""
+
+    def __init__(self):
+        self.children: Dict[str, "TopologyTrie"] = {}
+        self.subscribers: Set[Hashable] = set()
+
+    def add(self, prefix: str, subscriber: Hashable):
+        node = self
+        for label in prefix.split("."):
+            node = node.children.setdefault(label, TopologyTrie())
+        node.subscribers.add(subscriber)
+
+    def remove(self, prefix: str, subscriber: Hashable):
+        path = [self]
+        for label in prefix.split("."):
+            child = path[-1].children.get(label)
+            if child is None:
+                return
+            path.append(child)
+        path[-1].subscribers.discard(subscriber)
+
+        labels = prefix.split(".")
+        for depth in range(len(labels), 0, -1):
+            node = path[depth]
+            if node.subscribers or node.children:
+                break
+            del path[depth - 1].children[labels[depth - 1]]
+
+    def match(self, topology_path: str):
+        """Yields subscribers of every prefix of the path, one trie level per label."""
+        node = self
+        for label in topology_path.split("."):
+            node = node.children.get(label)
+            if node is None:
+                return
+            yield from node.subscribers
+
+def _bbox_cells(bbox: Tuple[float, float, float, float]):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    for x in range(math.floor(min_lon / BBOX_CELL_DEG), math.floor(max_lon / BBOX_CELL_DEG) + 1):
+        for y in range(math.floor(min_lat / BBOX_CELL_DEG), math.floor(max_lat / BBOX_CELL_DEG) + 1):
+            yield (x, y)
+
+def _bbox_cell_count(bbox: Tuple[float, float, float, float]) -> int:
+    min_lon, min_lat, max_lon, max_lat = bbox
+    width = math.floor(max_lon / BBOX_CELL_DEG) - math.floor(min_lon / BBOX_CELL_DEG) + 1
+    height = math.floor(max_lat / BBOX_CELL_DEG) - math.floor(min_lat / BBOX_CELL_DEG) + 1
+    return width * height
+
+def _in_bbox(bbox: Tuple[float, float, float, float], lon: float, lat: float) -> bool:
+    return bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]
+
+class SubscriptionIndex:
+    """
+    Routes an event to the subscribers whose filter matches the node, using a topology
+    trie, a set per node type and a coarse grid for bounding boxes. The cost of a lookup
+    depends on the number of matching subscribers, not on the number of subscribers.
+    """
+
+    def __init__(self):
+        self.subscriptions: Dict[Hashable, Subscription] = {}
+        self.wildcard: Set[Hashable] = set()
+        self.topology = TopologyTrie()
+        self.by_type: Dict[str, Set[Hashable]] = defaultdict(set)
+        self.by_cell: Dict[Tuple[int, int], Set[Hashable]] = defaultdict(set)
+        self.large_bboxes: Set[Hashable] = set()
+
+    def add(self, subscriber: Hashable, sub: Subscription):
+        self.subscriptions[subscriber] = sub
+        if not sub.dimensions:
+            self.wildcard.add(subscriber)
+            return
+        if sub.topology_prefix:
+            self.topology.add(sub.topology_prefix, subscriber)
+        if sub.node_types:
+            for node_type in sub.node_types:
+                self.by_type[node_type].add(subscriber)
+        if sub.bbox:
+            if _bbox_cell_count(sub.bbox) > BBOX_MAX_CELLS:
+                self.large_bboxes.add(subscriber)
+            else:
+                for cell in _bbox_cells(sub.bbox):
+                    self.by_cell[cell].add(subscriber)
+
+    def remove(self, subscriber: Hashable):
+        sub = self.subscriptions.pop(subscriber, None)
+        if sub is None:
+            return
+        self.wildcard.discard(subscriber)
+        if sub.topology_prefix:
+            self.topology.remove(sub.topology_prefix, subscriber)
+        if sub.node_types:
+            for node_type in sub.node_types:
+                self.by_type[node_type].discard(subscriber)
+                if not self.by_type[node_type]:
+                    del self.by_type[node_type]
+        if sub.bbox:
+            if subscriber in self.large_bboxes:
+                self.large_bboxes.discard(subscriber)
+                return
+            for cell in _bbox_cells(sub.bbox):
+                cell_subs = self.by_cell.get(cell)
+                if cell_subs is not None:
+                    cell_subs.discard(subscriber)
+                    if not cell_subs:
+                        del self.by_cell[cell]
+
+    def match(self, info: Optional[NodeInfo]) -> Set[Hashable]:
+        """Returns the subscribers interested in events of the given node."""
+        if info is None:
+            # Nodes the registry does not know yet can only be routed to unfiltered clients
+            return set(self.wildcard)
+
+        hits: Dict[Hashable, int] = defaultdict(int)
+        for subscriber in self.topology.match(info.topology_path):
+            hits[subscriber] += 1
+        for subscriber in self.by_type.get(info.node_type, ()):
+            hits[subscriber] += 1
+
+        cell = (math.floor(info.longitude / BBOX_CELL_DEG), math.floor(info.latitude / BBOX_CELL_DEG))
+        for subscriber in self.by_cell.get(cell, ()):
+            if _in_bbox(self.subscriptions[subscriber].bbox, info.longitude, info.latitude):
+                hits[subscriber] += 1
+        for subscriber in self.large_bboxes:
+            if _in_bbox(self.subscriptions[subscriber].bbox, info.longitude, info.latitude):
+                hits[subscriber] += 1
+
+        matched = set(self.wildcard)
+        matched.update(s for s, count in hits.items() if count == self.subscriptions[s].dimensions)
+        return matched
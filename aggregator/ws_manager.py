@@ -1,27 +1,262 @@
-import json
-from typing import List, Dict, Any
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Any, Optional
 from fastapi import WebSocket
+from node_registry import node_registry, NodeInfo
+from fleet_state import fleet_state
+from subscriptions import Subscription, SubscriptionIndex
+from codec import dumps
+from metrics import ws_publish_seconds, ws_send_seconds, ws_send_failures
+
+logger = logging.getLogger("ws_manager")
+
+WS_CLIENT_QUEUE_SIZE = int(os.getenv("WS_CLIENT_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT_SEC = float(os.getenv("WS_SEND_TIMEOUT_SEC", "5"))
+WS_MIN_TICK_MS = int(os.getenv("WS_MIN_TICK_MS", "100"))
+WS_MAX_TICK_MS = int(os.getenv("WS_MAX_TICK_MS", "10000"))
+
+_event_publish = ws_publish_seconds.labels("event")
+_log_publish = ws_publish_seconds.labels("new_log")
+_delta_publish = ws_publish_seconds.labels("log_delta")
+
+class ClientConnection:
+    """
+    A dashboard socket with its own bounded outbound queue, drained by a dedicated
+    writer task. When the client cannot keep up the oldest queued frame is dropped.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int, tick_ms: int = 0):
+        self.websocket = websocket
+        self.tick_ms = tick_ms
+        self.channel: Optional["Channel"] = None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.writer = None
+
+    def enqueue(self, message: str) -> bool:
+        """Queues a frame without waiting. Returns False if an older frame had to be dropped."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.dropped += 1
+            return False
+
+class Channel:
+    """
+    Clients sharing one tick rate and one subscription filter, so every frame is routed
+    and encoded once per channel. With tick_ms > 0 the channel keeps the latest reading
+    of every node that changed since the previous tick and sends them as a single
+    log_delta frame per tick. Each node's metadata is included in the first entry of that
+    node after a client joined, so frames stay compact once every client knows the node.
+    """
+
+    def __init__(self, tick_ms: int, subscription: Subscription):
+        self.tick_ms = tick_ms
+        self.subscription = subscription
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.pending_readings = 0
+        self.introduced = set()
+        self.task = None
+
+    @property
+    def key(self):
+        return (self.tick_ms, self.subscription.key)
+
+    def add_log(self, node_id: str, log: Dict[str, Any]):
+        self.pending[node_id] = log
+        self.pending_readings += 1
+
+    def take_frame(self):
+        if not self.pending:
+            return None
+        logs = []
+        for node_id, log in self.pending.items():
+            entry = {"node_id": node_id, "log": log}
+            # Metadata goes out once per node until the next client joins
+            if node_id not in self.introduced:
+                node = node_registry.get(node_id)
+                if node is not None:
+                    entry["node"] = node.meta
+                    self.introduced.add(node_id)
+            logs.append(entry)
+        frame = dumps({"type": "log_delta", "readings": self.pending_readings, "logs": logs})
+        self.pending = {}
+        self.pending_readings = 0
+        return frame
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, max_queue: int = WS_CLIENT_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT_SEC):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        self.channels: Dict[Any, Channel] = {}
+        self.index = SubscriptionIndex()
+        # (fleet_state.version, encoded fleet_snapshot frame)
+        self.snapshot_cache = (None, None)
+
+        self.messages_total = 0
+        self.dropped_total = 0
+        self.evicted_total = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, tick_ms: int = 0):
+        """
+        Accepts a dashboard. With tick_ms > 0 its readings are coalesced into one
+        log_delta frame per tick; alarms are always delivered immediately.
+        New clients first get a fleet_snapshot frame with the latest reading of every node,
+        then receive events of the whole fleet until they subscribe to a filter.
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
+        tick_ms = min(max(tick_ms, WS_MIN_TICK_MS), WS_MAX_TICK_MS) if tick_ms > 0 else 0
+
+        client = ClientConnection(websocket, self.max_queue, tick_ms)
+        client.writer = asyncio.create_task(self._writer(client))
+        self.active_connections[websocket] = client
+        self._join(client, Subscription())
+        client.enqueue(self._snapshot_frame())
+
+    def _snapshot_frame(self) -> str:
+        version, frame = self.snapshot_cache
+        if version != fleet_state.version:
+            frame = dumps({"type": "fleet_snapshot", "nodes": len(fleet_state), "columns": fleet_state.columnar()})
+            self.snapshot_cache = (fleet_state.version, frame)
+        return frame
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        self._leave(client)
+        if client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    def subscribe(self, websocket: WebSocket, subscription: Subscription):
+        """Replaces the filter of a connected client."""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        self._leave(client)
+        self._join(client, subscription)
+        self.send_personal_json(websocket, {"type": "subscribed", "filter": subscription.to_dict()})
+
+    def send_personal_json(self, websocket: WebSocket, data: Dict[str, Any]):
+        """Queues a frame for a single client, e.g. a reply to its own request."""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.enqueue(dumps(data))
+
+    def _join(self, client: ClientConnection, subscription: Subscription):
+        key = (client.tick_ms, subscription.key)
+        channel = self.channels.get(key)
+        if channel is None:
+            channel = Channel(client.tick_ms, subscription)
+            if channel.tick_ms > 0:
+                channel.task = asyncio.create_task(self._ticker(channel))
+            self.channels[key] = channel
+            self.index.add(key, subscription)
+        channel.clients[client.websocket] = client
+        channel.introduced.clear()
+        client.channel = channel
+
+    def _leave(self, client: ClientConnection):
+        channel = client.channel
+        if channel is None:
+            return
+        client.channel = None
+        channel.clients.pop(client.websocket, None)
+        if not channel.clients:
+            del self.channels[channel.key]
+            self.index.remove(channel.key)
+            if channel.task:
+                channel.task.cancel()
+
+    async def _ticker(self, channel: Channel):
+        while True:
+            await asyncio.sleep(channel.tick_ms / 1000.0)
+            start = time.perf_counter()
+            frame = channel.take_frame()
+            if frame is not None:
+                self._send_to(channel.clients, frame)
+                _delta_publish.observe(time.perf_counter() - start)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
+    async def _writer(self, client: ClientConnection):
+        try:
+            while True:
+                message = await client.queue.get()
+                start = time.perf_counter()
+                await asyncio.wait_for(client.websocket.send_text(message), timeout=self.send_timeout)
+                ws_send_seconds.observe(time.perf_counter() - start)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            ws_send_failures.inc(labels=("timeout" if isinstance(e, asyncio.TimeoutError) else "error",))
+            logger.info(f"Evicting WebSocket client after failed send: {e!r}")
+            self.evicted_total += 1
+            self.disconnect(client.websocket)
             try:
-                await connection.send_text(message)
+                await client.websocket.close()
             except Exception:
                 pass
 
-    async def broadcast_json(self, data: Dict[str, Any]):
-        await self.broadcast(json.dumps(data, default=str))
+    def _send_to(self, clients: Dict[WebSocket, ClientConnection], message: str):
+        self.messages_total += 1
+        for client in list(clients.values()):
+            if not client.enqueue(message):
+                self.dropped_total += 1
+
+    def _route(self, node: Optional[NodeInfo]):
+        return [self.channels[key] for key in self.index.match(node)]
+
+    def broadcast(self, message: str):
+        """Queues an already encoded frame for every client. Never waits on network I/O."""
+        self._send_to(self.active_connections, message)
+
+    def broadcast_json(self, data: Dict[str, Any]):
+        self.broadcast(dumps(data))
+
+    def publish_event(self, node_id: str, data: Dict[str, Any]):
+        """Sends a node event, with the node's metadata, immediately to the channels whose filter matches the node."""
+        start = time.perf_counter()
+        node = node_registry.get(node_id)
+        channels = self._route(node)
+        if channels:
+            message = dumps({**data, "node": node.meta} if node is not None else data)
+            for channel in channels:
+                self._send_to(channel.clients, message)
+        _event_publish.observe(time.perf_counter() - start)
+
+    def publish_log(self, node_id: str, log: Dict[str, Any]):
+        """Sends a reading as new_log to matching raw channels and stages it for matching coalescing channels."""
+        start = time.perf_counter()
+        node = node_registry.get(node_id)
+        message = None
+        for channel in self._route(node):
+            if channel.tick_ms > 0:
+                channel.add_log(node_id, log)
+                continue
+            if message is None:
+                message = dumps({"type": "new_log", "node_id": node_id, "node": node.meta if node is not None else None, "log": log})
+            self._send_to(channel.clients, message)
+        _log_publish.observe(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [client.queue.qsize() for client in self.active_connections.values()]
+        return {
+            "connections": len(self.active_connections),
+            "channels": len(self.channels),
+            "filtered_channels": sum(1 for channel in self.channels.values() if channel.subscription.dimensions),
+            "coalescing_channels": sum(1 for channel in self.channels.values() if channel.tick_ms > 0),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_capacity": self.max_queue,
+            "messages_total": self.messages_total,
+            "dropped_total": self.dropped_total,
+            "evicted_total": self.evicted_total,
+        }
 
 manager = ConnectionManager()
@@ -0,0 +1,93 @@
+"""
+Readings generated per second by the simulator telemetry model: the per-node
+Python random walk with a pydantic payload per reading against FleetModel, which
+steps the whole fleet with NumPy and encodes payloads straight from its arrays,
+as JSON or as binary records.
+
+Run from the bts_simulator/ directory:
+    python -m benchmarks.telemetry_model --nodes 1000,10000,100000
+"""
+import argparse
+import json
+import random
+import time
+from uuid import UUID
+import numpy as np
+from schemas import NodeTelemetryPayload
+from fleet_model import FleetModel
+
+class ScalarNode:
+    """Per-node reference implementation (the random walk FleetModel replaces)."""
+    __slots__ = ("cooling_failed", "base_temp", "current_temp", "connected_users", "max_throughput")
+
+    def __init__(self):
+        self.cooling_failed = False
+        self.base_temp = 45.0
+        self.current_temp = 45.0
+        self.connected_users = 100
+        self.max_throughput = 1000.0
+
+    def generate_metrics(self) -> NodeTelemetryPayload:
+        self.connected_users = max(0, self.connected_users + random.randint(-10, 15))
+        throughput = min(self.max_throughput, self.connected_users * random.uniform(2.0, 5.0))
+        if self.cooling_failed:
+            self.current_temp = min(95.0, self.current_temp + random.uniform(2.0, 6.0))
+        else:
+            self.current_temp = self.base_temp + random.uniform(-2.0, 2.0)
+        return NodeTelemetryPayload(
+            is_online=True,
+            cpu_temperature_c=round(self.current_temp, 2),
+            connected_users=self.connected_users,
+            current_throughput_mbps=round(throughput, 2)
+        )
+
+def bench_scalar(size: int, rounds: int) -> float:
+    nodes = [ScalarNode() for _ in range(size)]
+    node_ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(size)]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        readings = [{"node_id": node_id, **node.generate_metrics().model_dump()} for node_id, node in zip(node_ids, nodes)]
+        json.dumps({"readings": readings})
+    return size * rounds / (time.perf_counter() - start)
+
+def bench_vectorized(size: int, rounds: int) -> float:
+    model = FleetModel(size, seed=1)
+    node_ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(size)]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        model.step()
+        '{"readings":[' + ",".join(model.reading_json(node_ids)) + "]}"
+    return size * rounds / (time.perf_counter() - start)
+
+def bench_binary(size: int, rounds: int) -> float:
+    model = FleetModel(size, seed=1)
+    id_bytes = np.array([UUID(int=i).bytes for i in range(size)], dtype="S16")
+    start = time.perf_counter()
+    for _ in range(rounds):
+        model.step()
+        model.reading_records(id_bytes)
+    return size * rounds / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", default="1000,10000,100000", help="comma separated fleet sizes")
+    parser.add_argument("--readings", type=int, default=500000, help="readings generated per measurement")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'scalar/s':>12} {'numpy/s':>12} {'numpy binary/s':>15} {'numpy step only/s':>18} {'speedup':>8}")
+    for size in (int(n) for n in args.nodes.split(",")):
+        rounds = max(1, args.readings // size)
+        scalar = bench_scalar(size, rounds)
+        vectorized = bench_vectorized(size, rounds)
+        binary = bench_binary(size, rounds)
+
+        model = FleetModel(size, seed=1)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            model.step()
+        step_only = size * rounds / (time.perf_counter() - start)
+
+        print(f"{size:>8} {scalar:>12.0f} {vectorized:>12.0f} {binary:>15.0f} {step_only:>18.0f} {vectorized / scalar:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,56 @@
 import asyncio
 import httpx
 import logging
+from typing import List, Optional
 from config import settings
-from schemas import NetworkNodeRegistration, NodeTelemetryPayload
+from schemas import NetworkNodeRegistration, ComponentType, ComponentStatus
+from fleet_model import BATCH_RECORD, TELEMETRY_CONTENT_TYPE
 
 logger = logging.getLogger("aggregator_client")
 logger.setLevel(logging.INFO)
 
+# Largest batch accepted by POST /api/nodes/bulk
+REGISTER_BATCH_SIZE = 10000
+# Largest batch accepted by POST /api/components/status
+COMPONENT_BATCH_SIZE = 10000
+
 class AggregatorClient:
+    """One pooled HTTP client shared by every node hosted in the process."""
+
     def __init__(self):
         self.base_url = settings.aggregator_url
         self.node_id = None
-        self.client = httpx.AsyncClient(base_url=self.base_url)
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_connections
+        )
+        self.client = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=30.0)
 
     async def register(self, payload: NetworkNodeRegistration):
+        node_ids = await self.register_many([payload])
+        self.node_id = node_ids[0] if node_ids else None
+        return self.node_id
+
+    async def register_many(self, payloads: List[NetworkNodeRegistration]) -> Optional[List[str]]:
+        """Registers nodes through the bulk endpoint. Registration is an upsert, so retries are safe."""
         max_retries = 10
         retry_delay = 3
-        
+
         for attempt in range(max_retries):
             try:
-                logger.info(f"Registration in Aggregator (attempt {attempt+1}/{max_retries}): {self.base_url}")
-                response = await self.client.post("/api/nodes/", json=payload.model_dump())
-                response.raise_for_status()
-                
-                data = response.json()
-                self.node_id = data["node_id"]
-                logger.info(f"Successfully registered! Received ID: {self.node_id}")
-                return self.node_id
+                logger.info(f"Registration of {len(payloads)} nodes in Aggregator (attempt {attempt+1}/{max_retries}): {self.base_url}")
+                node_ids = []
+                for start in range(0, len(payloads), REGISTER_BATCH_SIZE):
+                    chunk = payloads[start:start + REGISTER_BATCH_SIZE]
+                    response = await self.client.post(
+                        "/api/nodes/bulk",
+                        json={"nodes": [p.model_dump(mode="json") for p in chunk]}
+                    )
+                    response.raise_for_status()
+                    node_ids.extend(response.json()["node_ids"])
+
+                logger.info(f"Successfully registered {len(node_ids)} nodes!")
+                return node_ids
             except (httpx.ConnectError, httpx.HTTPStatusError, Exception) as e:
                 logger.warning(f"Error registering in Aggregator: {e}")
                 if attempt < max_retries - 1:
@@ -36,16 +60,62 @@ class AggregatorClient:
                     logger.error("Max retries reached. Could not register.")
                     return None
 
-    async def send_telemetry(self, payload: NodeTelemetryPayload):
-        if not self.node_id:
-            return
-        try:
-            await self.client.post(f"/api/nodes/{self.node_id}/logs", json=payload.model_dump())
-            logger.debug(f"Telemetry sent. Temp: {payload.cpu_temperature_c}°C")
-        except Exception as e:
-            logger.error(f"Error sending telemetry: {e}")
+    async def send_batch(self, readings: List[str]) -> int:
+        """
+        Sends readings of many nodes through /api/logs/batch. Readings come already encoded
+        as JSON objects (FleetModel.reading_json), so no models are built per reading.
+        Returns the number accepted.
+        """
+        batch_size = settings.telemetry_batch_size
+        bodies = ('{"readings":[' + ",".join(readings[start:start + batch_size]) + "]}"
+                  for start in range(0, len(readings), batch_size))
+        return await self._post_batches(bodies, "application/json")
+
+    async def send_records(self, records: bytes) -> int:
+        """
+        Sends binary readings (FleetModel.reading_records) through /api/logs/batch,
+        about a quarter of the JSON size and decoded by the aggregator without validation.
+        Returns the number accepted.
+        """
+        chunk = settings.telemetry_batch_size * BATCH_RECORD.itemsize
+        bodies = (records[start:start + chunk] for start in range(0, len(records), chunk))
+        return await self._post_batches(bodies, TELEMETRY_CONTENT_TYPE)
+
+    async def _post_batches(self, bodies, content_type: str) -> int:
+        accepted = 0
+        for body in bodies:
+            try:
+                response = await self.client.post(
+                    "/api/logs/batch",
+                    content=body.encode() if isinstance(body, str) else body,
+                    headers={"Content-Type": content_type}
+                )
+                response.raise_for_status()
+                accepted += response.json()["accepted"]
+            except Exception as e:
+                logger.error(f"Error sending telemetry batch: {e}")
+        return accepted
+
+    async def send_component_status(self, node_ids: List[str], component_type: ComponentType, status: ComponentStatus) -> int:
+        """
+        Reports the same component status for many nodes. The aggregator only writes actual
+        changes, so the whole fleet can be reported again safely. Returns the number changed.
+        """
+        changed = 0
+        for start in range(0, len(node_ids), COMPONENT_BATCH_SIZE):
+            chunk = node_ids[start:start + COMPONENT_BATCH_SIZE]
+            try:
+                response = await self.client.post("/api/components/status", json={"components": [
+                    {"node_id": node_id, "component_type": component_type.value, "status": status.value}
+                    for node_id in chunk
+                ]})
+                response.raise_for_status()
+                changed += response.json()["changed"]
+            except Exception as e:
+                logger.error(f"Error sending component status: {e}")
+        return changed
 
     async def close(self):
         await self.client.aclose()
 
-aggregator_client = AggregatorClient()
\ No newline at end of file
+aggregator_client = AggregatorClient()
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     aggregator_url: str = Field(default="http://network_aggregator:8000")
@@ -15,6 +16,23 @@ class Settings(BaseSettings):
     
     heartbeat_interval_sec: int = Field(default=5)
 
+    # Extra virtual nodes hosted by this process next to the primary node above
+    fleet_size: int = Field(default=0)
+    fleet_name_prefix: str = Field(default="SIM_FLEET")
+    fleet_topology_prefix: str = Field(default="PL.SIM_FLEET")
+    fleet_spread_deg: float = Field(default=2.0)
+    # Seed of the telemetry random walk, unset for a different run every start
+    simulation_seed: Optional[int] = Field(default=None)
+    # Readings of all nodes are sent by one scheduler, one slice of the fleet per tick
+    scheduler_tick_sec: float = Field(default=0.5)
+    telemetry_batch_size: int = Field(default=5000)
+    # Binary telemetry is smaller and cheaper for the aggregator to parse; json for aggregators without it
+    telemetry_encoding: Literal["binary", "json"] = Field(default="binary")
+    # One pooled HTTP client is shared by every hosted node
+    http_max_connections: int = Field(default=20)
+    # Startup fails if the per-node state of the fleet takes more than this per 10k nodes
+    memory_budget_mb_per_10k: float = Field(default=8.0)
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,14 +1,49 @@
+"""
+Open-loop load generator for the aggregator.
+
+Registers a fleet of virtual nodes, then sends telemetry at a fixed aggregate rate
+spread over worker processes. Requests are fired on a precomputed schedule and not
+after the previous response, and latency is measured from the scheduled send time,
+so a slow aggregator shows up as latency instead of silently lowering the load
+(no coordinated omission). Prints latency percentiles, errors and the achieved
+throughput as JSON.
+
+    python fleet_generator.py --nodes 5000 --rate 2000 --duration 60 --workers 4
+    python fleet_generator.py --local --nodes 1000 --rate 500 --duration 20 --output result.json
+
+--local starts the aggregator from ../aggregator as a uvicorn subprocess rather than in this
+process: both packages have top-level `main` and `schemas` modules. It still needs PostgreSQL
+with PostGIS and TimescaleDB at the aggregator's DATABASE_URL; in CI start only the db service
+(docker compose up -d db) or use the loadtest compose service.
+"""
+import argparse
 import asyncio
-import random
-import httpx
+import json
 import logging
+import math
+import multiprocessing
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
 from uuid import UUID
-from schemas import NetworkNodeRegistration, NodeTelemetryPayload, NodeType
+import httpx
+from schemas import NetworkNodeRegistration, NodeType
+from fleet_model import FleetModel, TELEMETRY_CONTENT_TYPE
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 
 AGGREGATOR_URL = "http://localhost:8000"
-NUM_STATIONS = 50
+AGGREGATOR_DIR = Path(__file__).resolve().parent.parent / "aggregator"
+# Largest batch accepted by POST /api/nodes/bulk
+REGISTER_BATCH_SIZE = 10000
+# Time after the end of the run for workers to finish in-flight requests and report
+WORKER_RESULT_GRACE_SEC = 60.0
 
 class VirtualNode:
     def __init__(self, index: int):
@@ -17,65 +52,317 @@ class VirtualNode:
         self.lat = 51.0 + random.uniform(-2.0, 2.0)
         self.lon = 19.0 + random.uniform(-2.0, 2.0)
         self.node_id: UUID | None = None
-        
+
         self.connected_users = random.randint(10, 500)
         self.temp = random.uniform(35.0, 55.0)
 
-    def generate_metrics(self) -> NodeTelemetryPayload:
-        self.connected_users = max(0, self.connected_users + random.randint(-5, 5))
-        self.temp = self.temp + random.uniform(-1.0, 1.0)
-        throughput = min(10000.0, self.connected_users * random.uniform(1.5, 3.5))
-        
-        return NodeTelemetryPayload(
-            is_online=True,
-            cpu_temperature_c=round(self.temp, 2),
-            connected_users=self.connected_users,
-            current_throughput_mbps=round(throughput, 2)
+    @property
+    def max_throughput(self) -> int:
+        return 10000 if self.type == NodeType.gNodeB else 1000
+
+    def registration(self) -> NetworkNodeRegistration:
+        return NetworkNodeRegistration(
+            node_name=self.name,
+            topology_path=f"PL.REGION_{random.randint(1,5)}.{self.type.value}.{self.name}",
+            node_type=self.type,
+            ip_address=f"10.0.{random.randint(1,255)}.{random.randint(1,255)}",
+            max_throughput_mbps=self.max_throughput,
+            latitude=self.lat,
+            longitude=self.lon
         )
 
-async def simulate_node(node: VirtualNode, client: httpx.AsyncClient):
-    reg_data = NetworkNodeRegistration(
-        node_name=node.name,
-        topology_path=f"PL.REGION_{random.randint(1,5)}.{node.type.value}.{node.name}",
-        node_type=node.type,
-        ip_address=f"10.0.{random.randint(1,255)}.{random.randint(1,255)}",
-        max_throughput_mbps=10000 if node.type == NodeType.gNodeB else 1000,
-        latitude=node.lat,
-        longitude=node.lon
+class LatencyHistogram:
+    """
+    HDR-style histogram of microsecond values: log buckets split into 128 linear
+    sub-buckets, so every recorded value is kept within 1% at constant memory.
+    Histograms of different processes are merged by adding counts.
+    """
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def _key(self, value_us: int) -> int:
+        shift = max(0, value_us.bit_length() - self.SUB_BUCKET_BITS)
+        return (shift << 32) | (value_us >> shift)
+
+    @staticmethod
+    def _upper_bound(key: int) -> int:
+        shift, sub = key >> 32, key & 0xFFFFFFFF
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value_us = max(0, int(seconds * 1_000_000))
+        key = self._key(value_us)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        self.sum_us += value_us
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other: "LatencyHistogram"):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, pct: float) -> float:
+        """Returns the value at the given percentile in milliseconds."""
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100.0 * self.total))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return min(self._upper_bound(key), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self) -> Dict[str, float]:
+        result = {f"p{pct:g}": round(self.percentile(pct), 3) for pct in (50, 75, 90, 99, 99.9, 99.99)}
+        result["mean"] = round(self.sum_us / self.total / 1000.0, 3) if self.total else 0.0
+        result["max"] = round(self.max_us / 1000.0, 3)
+        return result
+
+    def to_dict(self) -> dict:
+        return {"counts": list(self.counts.items()), "total": self.total, "sum_us": self.sum_us, "max_us": self.max_us}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = dict(data["counts"])
+        histogram.total = data["total"]
+        histogram.sum_us = data["sum_us"]
+        histogram.max_us = data["max_us"]
+        return histogram
+
+async def register_fleet(client: httpx.AsyncClient, nodes: List[VirtualNode]):
+    """Registers the fleet through the bulk endpoint. Safe to repeat, names are upserted."""
+    for start in range(0, len(nodes), REGISTER_BATCH_SIZE):
+        chunk = nodes[start:start + REGISTER_BATCH_SIZE]
+        response = await client.post("/api/nodes/bulk", json={
+            "nodes": [node.registration().model_dump(mode="json") for node in chunk]
+        })
+        response.raise_for_status()
+        for node, node_id in zip(chunk, response.json()["node_ids"]):
+            node.node_id = node_id
+    logging.info(f"[+] Registered {len(nodes)} nodes")
+
+async def run_schedule(url: str, nodes: List[VirtualNode], rate: float, duration: float,
+                       concurrency: int, start_at: float, seed: Optional[int] = None,
+                       encoding: str = "binary") -> dict:
+    """
+    Sends rate * duration readings, the i-th one scheduled at start_at + i / rate.
+    Nodes report round-robin; the whole worker fleet is stepped at once at the start of every round.
+    """
+    model = FleetModel(
+        len(nodes),
+        seed=seed,
+        base_temp=[node.temp for node in nodes],
+        initial_users=[node.connected_users for node in nodes],
+        max_throughput=[node.max_throughput for node in nodes]
     )
-    
-    try:
-        response = await client.post("/api/nodes/", json=reg_data.model_dump())
-        if response.status_code == 201:
-            node.node_id = response.json()["node_id"]
-            logging.info(f"[+] Registered {node.name} ({node.type.value})")
-    except Exception as e:
-        logging.error(f"[-] Registration error for {node.name}: {e}")
-        return
-
-    while True:
-        await asyncio.sleep(random.uniform(4.0, 6.0)) 
-        
-        if node.node_id:
-            metrics = node.generate_metrics()
-            try:
-                await client.post(f"/api/nodes/{node.node_id}/logs", json=metrics.model_dump())
-                logging.debug(f"[{node.name}] Telemetry logs sent.")
-            except Exception:
-                pass
-
-async def main():
-    logging.info(f"Starting load generator for {NUM_STATIONS} base stations...")
-    
-    nodes = [VirtualNode(i) for i in range(1, NUM_STATIONS + 1)]
-    
-    limits = httpx.Limits(max_keepalive_connections=100, max_connections=200)
-    async with httpx.AsyncClient(base_url=AGGREGATOR_URL, limits=limits, timeout=10.0) as client:
-        
-        tasks = [simulate_node(node, client) for node in nodes]
-        
+    node_ids = [node.node_id for node in nodes]
+    bodies: List = []
+    binary = encoding == "binary"
+    headers = {"Content-Type": TELEMETRY_CONTENT_TYPE if binary else "application/json"}
+    histogram = LatencyHistogram()
+    errors: Dict[str, int] = {}
+    in_flight = asyncio.Semaphore(concurrency)
+    total = int(rate * duration)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+
+        async def send(node_id: str, body, scheduled: float):
+            async with in_flight:
+                try:
+                    response = await client.post(f"/api/nodes/{node_id}/logs", content=body, headers=headers)
+                    if response.status_code >= 400:
+                        errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                        return
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    return
+            # Measured from the scheduled time, time spent waiting to be sent counts as latency
+            histogram.record(time.time() - scheduled)
+
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        tasks = set()
+        for i in range(total):
+            scheduled = start_at + i / rate
+            # sleep(0) still yields when behind schedule, so sends in flight keep progressing
+            await asyncio.sleep(max(0.0, scheduled - time.time()))
+            position = i % len(nodes)
+            if position == 0:
+                model.step()
+                # Encoded straight from the model arrays; the node_id field of JSON bodies is ignored by this endpoint
+                bodies = model.reading_bodies() if binary else model.reading_json(node_ids)
+            task = asyncio.create_task(send(node_ids[position], bodies[position], scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
         await asyncio.gather(*tasks)
+        elapsed = time.time() - start_at
+
+    return {"sent": total, "elapsed": elapsed, "errors": errors, "histogram": histogram.to_dict()}
+
+def worker_main(url: str, nodes: List[VirtualNode], rate: float, duration: float, concurrency: int,
+                start_at: float, seed: Optional[int], encoding: str, results: multiprocessing.Queue):
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    results.put(asyncio.run(run_schedule(url, nodes, rate, duration, concurrency, start_at, seed, encoding)))
+
+def collect_results(results: multiprocessing.Queue, processes: List[multiprocessing.Process], deadline: float) -> List[dict]:
+    """
+    Waits for one result per worker. Fails instead of waiting forever when a worker exits
+    without reporting (an unhandled exception, an OOM kill) or the deadline passes.
+    """
+    outcomes = []
+    while len(outcomes) < len(processes):
+        try:
+            outcomes.append(results.get(timeout=1.0))
+            continue
+        except queue.Empty:
+            pass
+        crashed = [process for process in processes if process.exitcode not in (None, 0)]
+        if crashed:
+            codes = ", ".join(f"{process.name} exit code {process.exitcode}" for process in crashed)
+            raise RuntimeError(f"Load generator worker failed: {codes}")
+        if time.time() > deadline:
+            raise RuntimeError(f"Only {len(outcomes)} of {len(processes)} workers reported by the deadline")
+    return outcomes
+
+def run_workers(args, nodes: List[VirtualNode]) -> dict:
+    workers = max(1, min(args.workers, len(nodes)))
+    results = multiprocessing.Queue()
+    # All workers start on the same wall clock instant, after every process is up
+    start_at = time.time() + 1.0 + 0.2 * workers
+
+    processes = [
+        multiprocessing.Process(
+            target=worker_main,
+            args=(args.url, nodes[w::workers], args.rate / workers, args.duration, args.concurrency, start_at,
+                  None if args.seed is None else args.seed + w + 1, args.encoding, results)
+        )
+        for w in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        outcomes = collect_results(results, processes, start_at + args.duration + WORKER_RESULT_GRACE_SEC)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    histogram = LatencyHistogram()
+    errors: Dict[str, int] = {}
+    for outcome in outcomes:
+        histogram.merge(LatencyHistogram.from_dict(outcome["histogram"]))
+        for kind, count in outcome["errors"].items():
+            errors[kind] = errors.get(kind, 0) + count
+
+    sent = sum(outcome["sent"] for outcome in outcomes)
+    elapsed = max(outcome["elapsed"] for outcome in outcomes)
+    return {
+        "url": args.url,
+        "nodes": len(nodes),
+        "workers": workers,
+        "duration_sec": args.duration,
+        "target_rate": args.rate,
+        "encoding": args.encoding,
+        "sent": sent,
+        "ok": histogram.total,
+        "errors": errors,
+        "error_count": sum(errors.values()),
+        "achieved_rate": round(histogram.total / elapsed, 1) if elapsed else 0.0,
+        "elapsed_sec": round(elapsed, 3),
+        "latency_ms": histogram.summary(),
+    }
+
+def start_local_aggregator(port: int) -> subprocess.Popen:
+    """
+    Starts the aggregator from ../aggregator on a free port and waits until it answers.
+    It runs as its own interpreter because both packages have top-level `main` and
+    `schemas` modules. The database comes from the aggregator's DATABASE_URL.
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=AGGREGATOR_DIR
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Local aggregator exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/ingest/stats", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Local aggregator did not start within 60 s")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=AGGREGATOR_URL)
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=None, help="aggregate readings/s (default: one per node every 5 s)")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="worker processes")
+    parser.add_argument("--concurrency", type=int, default=256, help="max requests in flight per worker")
+    parser.add_argument("--encoding", choices=["binary", "json"], default="binary", help="telemetry body format")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the fleet layout and metrics")
+    parser.add_argument("--output", default="-", help="JSON result file, '-' for stdout")
+    parser.add_argument("--local", action="store_true",
+                        help="start the aggregator as a local subprocess and run against it (needs its DATABASE_URL)")
+    args = parser.parse_args(argv)
+    if args.rate is None:
+        args.rate = args.nodes / 5.0
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+
+    local = None
+    if args.local:
+        port = free_port()
+        local = start_local_aggregator(port)
+        args.url = f"http://127.0.0.1:{port}"
+
+    try:
+        logging.info(f"Starting load generator: {args.nodes} nodes, {args.rate:g} readings/s for {args.duration:g} s")
+        nodes = [VirtualNode(i) for i in range(1, args.nodes + 1)]
+
+        async def register():
+            async with httpx.AsyncClient(base_url=args.url, timeout=120.0) as client:
+                await register_fleet(client, nodes)
+        asyncio.run(register())
+
+        report = run_workers(args, nodes)
+    finally:
+        if local is not None:
+            local.terminate()
+            local.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        Path(args.output).write_text(output)
+        logging.info(f"Result written to {args.output}")
 
 if __name__ == "__main__":
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    asyncio.run(main())
\ No newline at end of file
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    main()
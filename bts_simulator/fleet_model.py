@@ -0,0 +1,109 @@
+from typing import List, Optional, Sequence, Union
+import numpy as np
+
+# Cooling failure heats a node by 2-6 °C per reading up to this limit
+MAX_TEMP_C = 95.0
+
+Selection = Union[int, slice, np.ndarray]
+PerNode = Union[float, Sequence[float]]
+
+# Compact telemetry encoding of the aggregator (aggregator/codec.py), little-endian and packed.
+# Temperature and throughput are sent in hundredths.
+TELEMETRY_CONTENT_TYPE = "application/x-telemetry"
+# Body of POST /api/nodes/{node_id}/logs
+READING_RECORD = np.dtype([
+    ("is_online", "?"), ("cpu_temperature_c", "<i2"), ("connected_users", "<u4"), ("current_throughput_mbps", "<u4")
+])
+# One record of POST /api/logs/batch; a zero timestamp lets the aggregator stamp the reading
+BATCH_RECORD = np.dtype([("node_id", "S16"), ("timestamp", "<f8")] + READING_RECORD.descr)
+
+READING_JSON = '{"node_id":"%s","is_online":%s,"cpu_temperature_c":%.2f,"connected_users":%d,"current_throughput_mbps":%.2f}'
+JSON_BOOL = ("false", "true")
+
+def _per_node(value: PerNode, size: int, dtype) -> np.ndarray:
+    return np.broadcast_to(np.asarray(value, dtype=dtype), (size,)).copy()
+
+class FleetModel:
+    """
+    Telemetry model of a whole fleet kept in NumPy arrays, one element per node.
+    step() advances every selected node in a few vectorized operations and payloads
+    are serialized straight from the arrays. The RNG is seeded, so runs are reproducible.
+    """
+
+    def __init__(self, size: int, seed: Optional[int] = None, base_temp: PerNode = 45.0,
+                 initial_users: PerNode = 100, max_throughput: PerNode = 1000.0):
+        """Per-node parameters take either one value for the whole fleet or one value per node."""
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.is_online = np.ones(size, dtype=bool)
+        self.cooling_failed = np.zeros(size, dtype=bool)
+        self.base_temp = _per_node(base_temp, size, np.float64)
+        self.current_temp = self.base_temp.copy()
+        self.connected_users = _per_node(initial_users, size, np.int64)
+        self.max_throughput = _per_node(max_throughput, size, np.float64)
+        self.throughput = np.zeros(size)
+
+    def step(self, sel: Selection = slice(None)):
+        """Generates the next reading of the selected nodes."""
+        users = self.connected_users[sel]
+        n = users.shape[0]
+
+        users = np.maximum(0, users + self.rng.integers(-10, 16, n))
+        self.connected_users[sel] = users
+        self.throughput[sel] = np.minimum(self.max_throughput[sel], users * self.rng.uniform(2.0, 5.0, n))
+
+        heating = np.minimum(MAX_TEMP_C, self.current_temp[sel] + self.rng.uniform(2.0, 6.0, n))
+        normal = self.base_temp[sel] + self.rng.uniform(-2.0, 2.0, n)
+        self.current_temp[sel] = np.where(self.cooling_failed[sel], heating, normal)
+
+    def inject_cooling_fault(self, sel: Selection):
+        self.cooling_failed[sel] = True
+
+    def fix(self, sel: Selection):
+        self.cooling_failed[sel] = False
+        self.current_temp[sel] = self.base_temp[sel]
+
+    def _columns(self, node_ids: Sequence[Optional[str]], sel: Selection):
+        ids = node_ids[sel] if isinstance(sel, slice) else [node_ids[i] for i in sel]
+        return zip(
+            ids,
+            self.is_online[sel].tolist(),
+            self.current_temp[sel].tolist(),
+            self.connected_users[sel].tolist(),
+            self.throughput[sel].tolist(),
+        )
+
+    def _fill(self, records: np.ndarray, sel: Selection):
+        records["is_online"] = self.is_online[sel]
+        records["cpu_temperature_c"] = np.rint(self.current_temp[sel] * 100)
+        records["connected_users"] = self.connected_users[sel]
+        records["current_throughput_mbps"] = np.rint(self.throughput[sel] * 100)
+
+    def reading_records(self, node_ids: np.ndarray, sel: Selection = slice(None)) -> bytes:
+        """
+        Current readings of the selected nodes as one binary /api/logs/batch body, built from
+        the arrays without a Python object per reading. node_ids holds the 16 UUID bytes of
+        every node (numpy "S16"), empty for nodes without an id, which are skipped.
+        """
+        ids = node_ids[sel]
+        records = np.empty(ids.shape[0], dtype=BATCH_RECORD)
+        records["node_id"] = ids
+        records["timestamp"] = 0.0
+        self._fill(records, sel)
+        return records[ids != b""].tobytes()
+
+    def reading_bodies(self, sel: Selection = slice(None)) -> List[bytes]:
+        """Current reading of each selected node as a binary POST /api/nodes/{node_id}/logs body."""
+        records = np.empty(self.is_online[sel].shape[0], dtype=READING_RECORD)
+        self._fill(records, sel)
+        data = records.tobytes()
+        size = READING_RECORD.itemsize
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def reading_json(self, node_ids: Sequence[Optional[str]], sel: Selection = slice(None)) -> List[str]:
+        """Same as readings(), already encoded as one JSON object per node."""
+        return [
+            READING_JSON % (node_id, JSON_BOOL[online], temp, users, throughput)
+            for node_id, online, temp, users, throughput in self._columns(node_ids, sel)
+            if node_id is not None
+        ]
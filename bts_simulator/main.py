@@ -1,29 +1,26 @@
 import asyncio
 import logging
-from fastapi import FastAPI
+import random
+import tracemalloc
+import numpy as np
+from typing import List
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from config import settings
-from schemas import NetworkNodeRegistration
-from state import current_state
+from schemas import NetworkNodeRegistration, NodeType, FaultScope, ComponentType, ComponentStatus
+from state import fleet, SimulatedFleet
 from client import aggregator_client
 
 logging.basicConfig(level=logging.INFO)
 
-async def telemetry_loop():
-    """Background: infinite loop generating metrics every X seconds."""
-    while True:
-        await asyncio.sleep(settings.heartbeat_interval_sec)
-        
-        if aggregator_client.node_id:
-            metrics = current_state.generate_metrics()
-            await aggregator_client.send_telemetry(metrics)
-            logging.info(f"Telemetry sent | Users: {metrics.connected_users} | Temp: {metrics.cpu_temperature_c}°C")
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    registration_data = NetworkNodeRegistration(
+def build_fleet() -> List[NetworkNodeRegistration]:
+    """
+    Creates the primary node and settings.fleet_size hosted nodes and returns their registrations.
+    The layout is seeded by the fleet name, so a restarted simulator registers the same nodes again.
+    """
+    registrations = [NetworkNodeRegistration(
         node_name=settings.simulator_name,
         topology_path=settings.topology_path,
         node_type=settings.node_type,
@@ -32,14 +29,106 @@ async def lifespan(app: FastAPI):
         latitude=settings.latitude,
         longitude=settings.longitude,
         vendor_config={"fault_port": settings.fault_port}
-    )
-    
-    await aggregator_client.register(registration_data)
-    
+    )]
+
+    rng = random.Random(settings.fleet_name_prefix)
+    node_types = list(NodeType)
+    for i in range(settings.fleet_size):
+        name = f"{settings.fleet_name_prefix}_{i:05d}"
+        node_type = node_types[i % len(node_types)]
+        registrations.append(NetworkNodeRegistration(
+            node_name=name,
+            topology_path=f"{settings.fleet_topology_prefix}.REGION_{i % 5 + 1}.{node_type.value}.{name}",
+            node_type=node_type,
+            ip_address=f"10.{100 + i // 65536 % 156}.{i // 256 % 256}.{i % 256}",
+            max_throughput_mbps=10000 if node_type == NodeType.gNodeB else 1000,
+            latitude=settings.latitude + rng.uniform(-settings.fleet_spread_deg, settings.fleet_spread_deg),
+            longitude=settings.longitude + rng.uniform(-settings.fleet_spread_deg, settings.fleet_spread_deg),
+            vendor_config={"fault_port": settings.fault_port, "fault_node": name}
+        ))
+
+    # The first model pays NumPy's one-time RNG setup, and every fleet a fixed cost for its
+    # generator, array headers and containers. Both are measured on an empty fleet and left
+    # out, so only the per-node state is held against the budget.
+    SimulatedFleet().build(seed=settings.simulation_seed)
+    tracemalloc.start()
+    empty = SimulatedFleet()
+    empty.build(seed=settings.simulation_seed)
+    fixed_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del empty
+
+    tracemalloc.start()
+    for registration in registrations:
+        fleet.add(registration.node_name, registration.topology_path, float(registration.max_throughput_mbps))
+    fleet.build(seed=settings.simulation_seed)
+    fleet.memory_bytes = max(0, tracemalloc.get_traced_memory()[0] - fixed_bytes)
+    tracemalloc.stop()
+
+    budget = settings.memory_budget_mb_per_10k * 1024 * 1024 * max(1, len(fleet)) / 10000
+    if fleet.memory_bytes > budget:
+        raise RuntimeError(
+            f"Fleet of {len(fleet)} nodes uses {fleet.memory_bytes / 1024 / 1024:.1f} MB, "
+            f"over the budget of {settings.memory_budget_mb_per_10k} MB per 10k nodes"
+        )
+    logging.info(f"Hosting {len(fleet)} nodes, {fleet.memory_bytes / max(1, len(fleet)):.0f} bytes of state per node")
+    return registrations
+
+async def telemetry_loop():
+    """
+    Background: one scheduler for the whole fleet. The heartbeat interval is split into ticks
+    and every tick sends one slice of the fleet as a single batch, so load is spread evenly.
+    """
+    loop = asyncio.get_running_loop()
+    ticks = max(1, round(settings.heartbeat_interval_sec / settings.scheduler_tick_sec))
+    slices = fleet.slices(ticks)
+    tick = 0
+    sent = 0
+    next_at = loop.time()
+
+    while True:
+        next_at += settings.heartbeat_interval_sec / ticks
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+        fleet.model.step(slices[tick])
+        if settings.telemetry_encoding == "binary":
+            records = fleet.model.reading_records(fleet.id_bytes, slices[tick])
+            if records:
+                sent += await aggregator_client.send_records(records)
+        else:
+            readings = fleet.model.reading_json(fleet.node_ids, slices[tick])
+            if readings:
+                sent += await aggregator_client.send_batch(readings)
+
+        tick = (tick + 1) % ticks
+        if tick == 0:
+            model = fleet.model
+            logging.info(f"Telemetry sent | {sent} readings | {fleet.names[0]} Users: {model.connected_users[0]} | Temp: {model.current_temp[0]:.2f}°C")
+            sent = 0
+
+async def report_cooling_fans(indexes, status: ComponentStatus) -> int:
+    """Reports the COOLING_FAN status of hosted nodes, so an injected cooling fault shows up as a failed fan."""
+    node_ids = [fleet.node_ids[i] for i in np.atleast_1d(indexes) if fleet.node_ids[i]]
+    if not node_ids:
+        return 0
+    return await aggregator_client.send_component_status(node_ids, ComponentType.COOLING_FAN, status)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registrations = build_fleet()
+
+    node_ids = await aggregator_client.register_many(registrations)
+    if node_ids:
+        fleet.set_node_ids(node_ids)
+        aggregator_client.node_id = fleet.node_ids[0]
+        # Fans of a restarted simulator work again
+        await report_cooling_fans(np.arange(len(fleet)), ComponentStatus.OK)
+    del registrations
+
     task = asyncio.create_task(telemetry_loop())
-    
+
     yield
-    
+
     task.cancel()
     await aggregator_client.close()
 
@@ -54,15 +143,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def get_node_or_404(name: str) -> int:
+    index = fleet.get(name)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"Node '{name}' is not hosted by this simulator.")
+    return index
+
 @app.post("/api/fault/cooling")
 async def inject_cooling_fault():
-    """Injects cooling fault. Temperature will start rising drastically."""
-    current_state.cooling_failed = True
+    """Injects cooling fault into the primary node. Temperature will start rising drastically."""
+    fleet.model.inject_cooling_fault(0)
+    await report_cooling_fans(0, ComponentStatus.FAILED)
     return {"status": "fault_injected", "message": "Fan broken! Temperature is rising."}
 
 @app.post("/api/fault/fix")
 async def fix_faults():
-    """Fixes the node. Parameters return to normal."""
-    current_state.cooling_failed = False
-    current_state.current_temp = current_state.base_temp
-    return {"status": "fixed", "message": "Node fixed. Parameters are returning to normal."}
\ No newline at end of file
+    """Fixes the primary node. Parameters return to normal."""
+    fleet.model.fix(0)
+    await report_cooling_fans(0, ComponentStatus.OK)
+    return {"status": "fixed", "message": "Node fixed. Parameters are returning to normal."}
+
+@app.post("/api/nodes/{name}/fault/cooling")
+async def inject_node_cooling_fault(name: str):
+    """Injects cooling fault into one hosted node."""
+    index = get_node_or_404(name)
+    fleet.model.inject_cooling_fault(index)
+    await report_cooling_fans(index, ComponentStatus.FAILED)
+    return {"status": "fault_injected", "message": f"Fan of {name} broken! Temperature is rising."}
+
+@app.post("/api/nodes/{name}/fault/fix")
+async def fix_node_faults(name: str):
+    """Fixes one hosted node."""
+    index = get_node_or_404(name)
+    fleet.model.fix(index)
+    await report_cooling_fans(index, ComponentStatus.OK)
+    return {"status": "fixed", "message": f"Node {name} fixed. Parameters are returning to normal."}
+
+@app.post("/api/faults/cooling")
+async def inject_bulk_cooling_fault(scope: FaultScope):
+    """Injects cooling fault into every hosted node at or below a topology prefix."""
+    indexes = fleet.under_prefix(scope.topology_prefix)
+    fleet.model.inject_cooling_fault(indexes)
+    await report_cooling_fans(indexes, ComponentStatus.FAILED)
+    count = len(indexes)
+    return {"status": "fault_injected", "nodes": count, "message": f"Fans broken on {count} nodes under {scope.topology_prefix}."}
+
+@app.post("/api/faults/fix")
+async def fix_bulk_faults(scope: FaultScope):
+    """Fixes every hosted node at or below a topology prefix."""
+    indexes = fleet.under_prefix(scope.topology_prefix)
+    fleet.model.fix(indexes)
+    await report_cooling_fans(indexes, ComponentStatus.OK)
+    count = len(indexes)
+    return {"status": "fixed", "nodes": count, "message": f"Fixed {count} nodes under {scope.topology_prefix}."}
+
+@app.get("/api/fleet/stats")
+async def fleet_stats():
+    """Returns the number of hosted, registered and failing nodes and the memory used by their state."""
+    return {
+        "nodes": len(fleet),
+        "registered": sum(1 for node_id in fleet.node_ids if node_id),
+        "cooling_failed": int(fleet.model.cooling_failed.sum()),
+        "state_bytes": fleet.memory_bytes,
+        "state_bytes_per_node": fleet.memory_bytes // max(1, len(fleet)),
+        "memory_budget_mb_per_10k": settings.memory_budget_mb_per_10k,
+    }
@@ -15,6 +15,17 @@ class AlarmSeverity(str, Enum):
     MAJOR = "MAJOR"
     CRITICAL = "CRITICAL"
 
+class ComponentType(str, Enum):
+    ANTENNA = "ANTENNA"
+    TRANSCEIVER = "TRANSCEIVER"
+    COOLING_FAN = "COOLING_FAN"
+    POWER_SUPPLY = "POWER_SUPPLY"
+
+class ComponentStatus(str, Enum):
+    OK = "OK"
+    DEGRADED = "DEGRADED"
+    FAILED = "FAILED"
+
 class NetworkNodeRegistration(BaseModel):
     node_name: str
     topology_path: str
@@ -34,4 +45,7 @@ class NodeTelemetryPayload(BaseModel):
 class ActiveAlarmPayload(BaseModel):
     severity: AlarmSeverity
     description: str
-    component_id: Optional[str] = None
\ No newline at end of file
+    component_id: Optional[str] = None
+
+class FaultScope(BaseModel):
+    topology_prefix: str
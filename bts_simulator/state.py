@@ -1,30 +1,62 @@
-import random
-from schemas import NodeTelemetryPayload
+from typing import Dict, List, Optional
+from uuid import UUID
+import numpy as np
+from fleet_model import FleetModel
+
+class SimulatedFleet:
+    """
+    Every node hosted by this process. Names, topology paths and aggregator ids are kept
+    in lists and the telemetry state of all nodes in one FleetModel, so each node is an
+    index into the arrays. The first node added is the primary one (index 0).
+    """
 
-class NodeState:
     def __init__(self):
-        self.is_online = True
-        self.cooling_failed = False
-        self.base_temp = 45.0
-        self.current_temp = 45.0
-        self.connected_users = 100
-        self.max_throughput = 1000.0
-
-    def generate_metrics(self) -> NodeTelemetryPayload:
-        self.connected_users = max(0, self.connected_users + random.randint(-10, 15))
-        
-        throughput = min(self.max_throughput, self.connected_users * random.uniform(2.0, 5.0))
-        
-        if self.cooling_failed:
-            self.current_temp = min(95.0, self.current_temp + random.uniform(2.0, 6.0))
-        else:
-            self.current_temp = self.base_temp + random.uniform(-2.0, 2.0)
-
-        return NodeTelemetryPayload(
-            is_online=self.is_online,
-            cpu_temperature_c=round(self.current_temp, 2),
-            connected_users=self.connected_users,
-            current_throughput_mbps=round(throughput, 2)
+        self.names: List[str] = []
+        self.topology_paths: List[str] = []
+        self.node_ids: List[Optional[str]] = []
+        # The same ids as 16 raw bytes for binary telemetry, empty until registered
+        self.id_bytes = np.zeros(0, dtype="S16")
+        self.index: Dict[str, int] = {}
+        self.model: Optional[FleetModel] = None
+        self._max_throughput: List[float] = []
+        # Bytes allocated while the fleet was built, measured at startup
+        self.memory_bytes = 0
+
+    def add(self, name: str, topology_path: str, max_throughput: float):
+        self.index[name] = len(self.names)
+        self.names.append(name)
+        self.topology_paths.append(topology_path)
+        self.node_ids.append(None)
+        self._max_throughput.append(max_throughput)
+
+    def build(self, seed: Optional[int] = None):
+        """Creates the telemetry model once every node has been added."""
+        self.model = FleetModel(len(self.names), seed=seed, max_throughput=self._max_throughput)
+        self.id_bytes = np.zeros(len(self.names), dtype="S16")
+        self._max_throughput = []
+
+    def set_node_ids(self, node_ids: List[str]):
+        """Stores the ids assigned by the aggregator, in the order the nodes were added."""
+        self.node_ids = list(node_ids)
+        self.id_bytes = np.array([UUID(node_id).bytes for node_id in node_ids], dtype="S16")
+
+    def get(self, name: str) -> Optional[int]:
+        return self.index.get(name)
+
+    def under_prefix(self, topology_prefix: str) -> np.ndarray:
+        """Indexes of nodes whose topology path equals the prefix or lies below it, label by label."""
+        prefix = topology_prefix.strip(".")
+        below = prefix + "."
+        return np.fromiter(
+            (i for i, path in enumerate(self.topology_paths) if path == prefix or path.startswith(below)),
+            dtype=np.int64
         )
 
-current_state = NodeState()
\ No newline at end of file
+    def slices(self, count: int) -> List[slice]:
+        """Splits the fleet into `count` groups, one per scheduler tick of the heartbeat interval."""
+        return [slice(i, None, count) for i in range(count)]
+
+    def __len__(self):
+        return len(self.names)
+
+fleet = SimulatedFleet()
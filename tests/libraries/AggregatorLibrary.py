@@ -15,28 +15,29 @@ class AggregatorLibrary:
         Returns the ID of the found node.
         """
         endpoint = f"{aggregator_url}/api/nodes/"
-        response = self.session.get(endpoint, timeout=5)
-        
+        # Filtered on the server, so the check costs the same for any fleet size
+        params = {"node_name": expected_node_name, "fields": "node_id,node_name", "limit": 1}
+        response = self.session.get(endpoint, params=params, timeout=5)
+
         if response.status_code != 200:
             raise AssertionError(f"Failed to retrieve node list. Status: {response.status_code}")
 
         nodes = response.json()
-        
-        for node in nodes:
-            if node.get("node_name") == expected_node_name:
-                logging.info(f"Found base station {expected_node_name} (ID: {node.get('node_id')})")
-                return node.get("node_id")
-                
+
+        if nodes:
+            logging.info(f"Found base station {expected_node_name} (ID: {nodes[0]['node_id']})")
+            return nodes[0]["node_id"]
+
         raise AssertionError(f"Base station '{expected_node_name}' NOT FOUND in Aggregator!")
 
     def get_total_registered_nodes(self, aggregator_url: str) -> int:
         """
         Returns the total number of base stations in the network.
         """
-        endpoint = f"{aggregator_url}/api/nodes/"
+        endpoint = f"{aggregator_url}/api/nodes/count"
         response = self.session.get(endpoint, timeout=5)
         response.raise_for_status()
-        
-        count = len(response.json())
+
+        count = response.json()["count"]
         logging.info(f"Aggregator sees {count} base stations.")
-        return count
\ No newline at end of file
+        return count
@@ -0,0 +1,161 @@
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import requests
+import websocket
+
+class PerformanceLibrary:
+    """
+    Robot Framework library for measuring aggregator performance: ingest throughput,
+    end-to-end latency from a telemetry POST to its /ws/events frame, and percentiles.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def measure_ingest_throughput(self, aggregator_url: str, seconds: float = 10, batch_size: int = 1000,
+                                  concurrency: int = 4) -> float:
+        """
+        Posts batches of readings for registered nodes to /api/logs/batch from `concurrency`
+        clients for `seconds` seconds. Returns the accepted readings per second.
+        """
+        response = self.session.get(f"{aggregator_url}/api/nodes/",
+                                    params={"fields": "node_id", "limit": min(batch_size, 5000)}, timeout=10)
+        response.raise_for_status()
+        node_ids = [node["node_id"] for node in response.json()]
+        if not node_ids:
+            raise AssertionError("No registered nodes to send readings for.")
+
+        # Normal readings, so the load does not raise alarms
+        readings = [
+            {"node_id": node_ids[i % len(node_ids)], "is_online": True, "cpu_temperature_c": 42.0,
+             "connected_users": 100, "current_throughput_mbps": 250.0}
+            for i in range(batch_size)
+        ]
+        body = json.dumps({"readings": readings})
+        deadline = time.perf_counter() + seconds
+        lock = threading.Lock()
+        totals = {"accepted": 0, "rejected": 0, "failed": 0}
+
+        def client():
+            session = requests.Session()
+            while time.perf_counter() < deadline:
+                try:
+                    result = session.post(f"{aggregator_url}/api/logs/batch", data=body,
+                                          headers={"Content-Type": "application/json"}, timeout=30)
+                    result.raise_for_status()
+                    outcome = result.json()
+                    with lock:
+                        totals["accepted"] += outcome["accepted"]
+                        totals["rejected"] += outcome["rejected"]
+                except requests.RequestException as e:
+                    logging.warning(f"Batch failed: {e}")
+                    with lock:
+                        totals["failed"] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(client)
+        elapsed = time.perf_counter() - start
+
+        rate = totals["accepted"] / elapsed
+        logging.info(f"Ingest: {totals['accepted']} readings accepted, {totals['rejected']} rejected, "
+                     f"{totals['failed']} batches failed in {elapsed:.1f} s ({rate:.0f} readings/s)")
+        return rate
+
+    def measure_end_to_end_latency(self, aggregator_url: str, samples: int = 100, interval_ms: int = 50,
+                                   probe_name: str = "PERF_PROBE", timeout: float = 5) -> List[float]:
+        """
+        Registers a probe node and posts readings for it as a simulator does. Each reading
+        carries a unique throughput as its marker, a metric no alarm rule watches. The time
+        until its new_log frame arrives on a /ws/events connection subscribed to the probe's
+        topology path is its latency. Returns the latencies in ms. The probe gets a name of its
+        own for every run and is deleted afterwards, so the fleet under test is left as it was.
+        """
+        probe_name = f"{probe_name}_{uuid.uuid4().hex[:8].upper()}"
+        probe = {
+            "node_name": probe_name,
+            "topology_path": f"PERF.{probe_name}",
+            "node_type": "gNodeB",
+            "ip_address": "10.255.255.254",
+            "max_throughput_mbps": 1000,
+            "latitude": 51.1,
+            "longitude": 17.03,
+        }
+        response = self.session.post(f"{aggregator_url}/api/nodes/", json=probe, timeout=5)
+        response.raise_for_status()
+        node_id = response.json()["node_id"]
+
+        ws_url = aggregator_url.replace("https://", "wss://").replace("http://", "ws://") + "/ws/events"
+        ws = None
+        try:
+            ws = websocket.create_connection(ws_url, timeout=timeout)
+            ws.send(json.dumps({"action": "subscribe", "topology_prefix": probe["topology_path"]}))
+            self._wait_for(ws, lambda frame: frame.get("type") == "subscribed", timeout)
+
+            latencies = []
+            for i in range(samples):
+                marker = float(i)
+                reading = {"is_online": True, "cpu_temperature_c": 42.0, "connected_users": 100,
+                           "current_throughput_mbps": marker}
+                sent = time.perf_counter()
+                self.session.post(f"{aggregator_url}/api/nodes/{node_id}/logs", json=reading, timeout=5).raise_for_status()
+                self._wait_for(ws, lambda frame: frame.get("type") == "new_log" and frame.get("node_id") == node_id
+                               and frame["log"]["current_throughput_mbps"] == marker, timeout)
+                latencies.append((time.perf_counter() - sent) * 1000)
+                time.sleep(interval_ms / 1000)
+        finally:
+            if ws is not None:
+                ws.close()
+            self._delete_node(aggregator_url, node_id)
+
+        logging.info(f"End-to-end latency over {samples} readings: p50 {self.get_percentile(latencies, 50):.1f} ms, "
+                     f"p99 {self.get_percentile(latencies, 99):.1f} ms")
+        return latencies
+
+    def measure_request_latency(self, url: str, samples: int = 100) -> List[float]:
+        """GETs `url` `samples` times and returns the response times in ms."""
+        latencies = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            self.session.get(url, timeout=5).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    def get_percentile(self, values: List[float], percentile: float) -> float:
+        """Nearest-rank percentile of the values."""
+        if not values:
+            raise AssertionError("No values to compute a percentile of.")
+        ordered = sorted(float(v) for v in values)
+        rank = max(1, math.ceil(float(percentile) / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def percentile_should_be_below(self, values: List[float], percentile: float, budget_ms: float):
+        """Fails when the given percentile of the latencies exceeds the budget."""
+        value = self.get_percentile(values, percentile)
+        if value > float(budget_ms):
+            raise AssertionError(f"p{percentile} {value:.1f} ms is over the budget of {budget_ms} ms")
+        logging.info(f"p{percentile} {value:.1f} ms is within the budget of {budget_ms} ms")
+
+    def _delete_node(self, aggregator_url: str, node_id: str):
+        response = self.session.delete(f"{aggregator_url}/api/nodes/{node_id}", timeout=5)
+        if response.status_code not in (202, 404):
+            logging.warning(f"Could not delete probe node {node_id}: {response.status_code}")
+
+    def _wait_for(self, ws, match, timeout: float) -> dict:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            ws.settimeout(max(0.01, deadline - time.perf_counter()))
+            try:
+                frame = json.loads(ws.recv())
+            except websocket.WebSocketTimeoutException:
+                break
+            if match(frame):
+                return frame
+        raise AssertionError(f"No matching /ws/events frame within {timeout} s")